@@ -25,10 +25,109 @@ class Settings(BaseSettings):
     
     # FASHN API for Virtual Try-On
     FASHN_API_KEY: Optional[str] = None
-    
+    FASHN_MAX_CONNECTIONS: int = 200  # Upper bound on open sockets to api.fashn.ai per worker
+    FASHN_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    FASHN_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle pooled connection is kept
+    FASHN_CONNECT_TIMEOUT: float = 5.0
+    FASHN_POOL_TIMEOUT: float = 10.0  # Max wait for a free pooled connection
+    FASHN_RUN_TIMEOUT: float = 30.0
+    FASHN_STATUS_TIMEOUT: float = 15.0
+    # Per-worker cap on in-flight FASHN runs; extra submissions queue, premium first
+    FASHN_MAX_CONCURRENT_RUNS: int = 10
+    FASHN_QUEUE_MAX_SIZE: int = 100  # Submissions beyond this get a 503 with Retry-After
+    FASHN_QUEUE_MAX_WAIT_SECONDS: float = 20.0
+    # Circuit breaker over FASHN calls: opens on a high error rate or slow p95
+    FASHN_BREAKER_WINDOW_SECONDS: float = 60.0
+    FASHN_BREAKER_MIN_CALLS: int = 10  # Calls in the window before it can trip
+    FASHN_BREAKER_ERROR_RATE: float = 0.5
+    FASHN_BREAKER_P95_LATENCY_SECONDS: float = 20.0
+    FASHN_BREAKER_OPEN_SECONDS: float = 30.0  # Fail fast this long before trial calls
+    FASHN_BREAKER_HALF_OPEN_CALLS: int = 2
+    # Status checks have their own circuit, tripped by a much lower p95
+    FASHN_STATUS_BREAKER_P95_LATENCY_SECONDS: float = 5.0
+
+    # Background poller that refreshes pending try-on predictions
+    PREDICTION_POLL_INTERVAL: float = 1.0  # Seconds between poller passes
+    PREDICTION_POLL_MIN_DELAY: float = 2.0  # Shortest gap between checks of one prediction
+    PREDICTION_POLL_MAX_DELAY: float = 30.0  # Longest gap between checks of one prediction
+    PREDICTION_POLL_CONCURRENCY: int = 20
+    PREDICTION_POLL_LEASE_SECONDS: int = 30
+    PREDICTION_POLL_BATCH_SIZE: int = 200  # Most predictions leased by one poller pass
+    PREDICTION_POLL_TIMEOUT_MINUTES: int = 15  # Mark predictions failed after this long
+    PREDICTION_WAIT_MAX_SECONDS: int = 30  # Cap on the long-poll `wait` parameter
+    PREDICTION_WAIT_RECHECK_SECONDS: float = 5.0  # Re-read MongoDB this often while long-polling
+
+    # Predictions older than this move to monthly archive collections; archived
+    # ones stay for the grace period before the TTL index removes them
+    TRYON_PREDICTION_RETENTION_DAYS: int = 30
+    TRYON_ARCHIVE_GRACE_HOURS: int = 24
+
+    # ETAs and Retry-After hints from recent FASHN completion times, per mode/category
+    TRYON_LATENCY_WINDOW_HOURS: int = 24
+    TRYON_LATENCY_SAMPLE_SIZE: int = 2000  # Most recent completions the model is built from
+    TRYON_LATENCY_MIN_SAMPLES: int = 20  # Fewer than this falls back to a broader group
+    TRYON_LATENCY_REFRESH_SECONDS: float = 60.0
+
+    # Reuse completed results when the same images and options are resubmitted
+    TRYON_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    TRYON_CACHE_MAX_ENTRIES: int = 5000  # In-process entries per worker
+
+    # Uploaded images are read in chunks and capped; bigger request bodies are refused with a 413
+    TRYON_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024  # Per image
+    TRYON_UPLOAD_CHUNK_BYTES: int = 1024 * 1024
+
+    # Uploads are downsized and re-encoded before being sent to FASHN
+    TRYON_IMAGE_MAX_PIXELS: int = 1_000_000  # FASHN v1.5 works at roughly 1MP
+    TRYON_IMAGE_FORMAT: str = "JPEG"  # JPEG or WEBP
+    TRYON_IMAGE_QUALITY: int = 90
+    MODEL_PHOTO_TTL_DAYS: int = 90  # Stored model photos are deleted after this long unused
+
+    # Completed try-on outputs are copied out of FASHN into our own storage
+    TRYON_OUTPUT_STORAGE: str = "local"  # "local", "cloudinary" or "none"
+    TRYON_OUTPUT_DIR: str = "tryon_outputs"  # Root of the local backend
+    # Public base URL of this API (e.g. https://api.example.com); the local
+    # backend is only used when it is set, since stored URLs must be reachable
+    TRYON_OUTPUT_PUBLIC_URL: Optional[str] = None
+    TRYON_OUTPUT_THUMBNAIL_SIZE: int = 320  # Longest thumbnail edge in pixels
+    TRYON_OUTPUT_CACHE_SECONDS: int = 365 * 24 * 60 * 60
+    TRYON_OUTPUT_MIRROR_INTERVAL: float = 5.0
+    TRYON_OUTPUT_MIRROR_BATCH_SIZE: int = 20
+    TRYON_OUTPUT_MIRROR_MAX_ATTEMPTS: int = 5
+
+    # Batch try-ons: one model photo against several catalog garments
+    TRYON_BATCH_MAX_ITEMS: int = 10
+
+    # Per-worker cache of try-on usage counts for the device/user check endpoints
+    QUOTA_CACHE_TTL_SECONDS: int = 30
+    QUOTA_CACHE_MAX_ENTRIES: int = 50000
+    QUOTA_FLUSH_INTERVAL_SECONDS: float = 2.0  # Write-behind interval for buffered increments
+    # "strong" charges try-ons atomically in MongoDB; "eventual" charges against
+    # the cache and writes the increments behind (limits are then per worker)
+    QUOTA_CONSISTENCY: str = "strong"
+
+    # Idempotency-Key handling for try-on submissions
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 60 * 60  # How long a key replays its first response
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # An in-flight claim older than this is taken over
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # How long a duplicate waits on the first request
+    IDEMPOTENCY_RECHECK_SECONDS: float = 0.5
+
+    # In-process tier of serialized catalog pages in front of the stored catalog
+    CATALOG_MEMORY_CACHE_MAX_PAGES: int = 2000
+    CATALOG_MEMORY_CACHE_TTL_SECONDS: float = 300.0
+
+    # Category refreshes prefetch the whole category from ASOS, page by page
+    CATALOG_PREFETCH_PAGE_SIZE: int = 48
+    CATALOG_PREFETCH_MAX_PAGES: int = 20
+    CATALOG_PREFETCH_PAGE_DELAY_SECONDS: float = 0.5
+    # A category whose refresh failed is not fetched from ASOS again for this long
+    CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS: int = 15 * 60
+    # Deepest rank /products/search pages reach; bounds the database's top-k sort
+    CATALOG_SEARCH_MAX_CANDIDATES: int = 500
+
     # ASOS API for Product Search (RapidAPI)
     ASOS_API_KEY: Optional[str] = None
     ASOS_API_HOST: Optional[str] = "asos-api6.p.rapidapi.com"
+    ASOS_API_TIMEOUT_SECONDS: float = 10.0
     
     # Cloudinary Configuration for temporary image storage
     CLOUDINARY_CLOUD_NAME: Optional[str] = None
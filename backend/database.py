@@ -2,6 +2,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
 import logging
 from datetime import datetime
+from utils.quota import consume_quota
+from utils.db_indexes import ensure_indexes
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,6 +24,12 @@ async def connect_to_mongodb():
         logger.error(f"Could not connect to MongoDB: {e}")
         raise
 
+    # Declare the indexes the hot queries rely on; existing ones are left alone
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Failed to create database indexes: {e}")
+
 async def close_mongodb_connection():
     """Close MongoDB connection"""
     global client
@@ -71,63 +79,19 @@ def get_user_engagement_collection():
 async def track_tryon_usage(user_id: str, db = None):
     """
     Track tryon API usage for a user.
-    - Increments daily count
-    - Increments total count
+    - Resets the daily/monthly counts when a new period starts
+    - Increments daily, monthly and total counts
     - Updates last_used timestamp
-    Returns the updated usage counts.
+    All in a single atomic round trip. Returns the updated usage counts.
     """
     if db is None:
         logger.warning("Database connection not initialized. Cannot track tryon usage.")
         return {"daily_count": 0, "total_count": 0}
     
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Get the tryon_usage collection
-    tryon_usage_collection = db.tryon_usage
-    
-    # Find existing record for the user
-    usage_record = await tryon_usage_collection.find_one({"user_id": user_id})
-    
-    if usage_record:
-        # Check if we need to reset the daily count (new day)
-        last_reset = usage_record.get("last_reset", now)
-        if last_reset < today_start:
-            # It's a new day, reset the daily count
-            daily_count = 1
-            await tryon_usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {
-                    "daily_count": daily_count,
-                    "last_reset": now,
-                    "last_used": now
-                },
-                "$inc": {"total_count": 1}}
-            )
-        else:
-            # Same day, increment both counts
-            daily_count = usage_record.get("daily_count", 0) + 1
-            await tryon_usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {
-                    "daily_count": daily_count,
-                    "last_used": now
-                },
-                "$inc": {"total_count": 1}}
-            )
-        
-        total_count = usage_record.get("total_count", 0) + 1
-    else:
-        # First time usage, create a new record
-        daily_count = 1
-        total_count = 1
-        await tryon_usage_collection.insert_one({
-            "user_id": user_id,
-            "daily_count": daily_count,
-            "total_count": total_count,
-            "last_reset": now,
-            "last_used": now
-        })
+    # No limits here - this only records that a try-on happened
+    quota = await consume_quota(db.tryon_usage, {"user_id": user_id}, None, None)
+    daily_count = quota["daily_count"] + 1
+    total_count = quota["total_count"] + 1
     
     # Log the updated values
     logger.info(f"User {user_id} try-on count updated: daily={daily_count}, total={total_count}")
@@ -135,7 +99,7 @@ async def track_tryon_usage(user_id: str, db = None):
     return {
         "daily_count": daily_count,
         "total_count": total_count,
-        "last_used": now
+        "last_used": datetime.utcnow()
     }
 
 async def initialize_tryon_usage_for_user(user_id: str, db = None):
@@ -80,7 +80,7 @@ def virtual_tryon(person_image, garment_id, device_id=""):
         
         # Create the multipart form data
         files = {
-            'file': ('person.jpg', img_byte_arr, 'image/jpeg')
+            'model_image': ('person.jpg', img_byte_arr, 'image/jpeg')
         }
         
         # Add the device ID to the request
@@ -88,23 +88,35 @@ def virtual_tryon(person_image, garment_id, device_id=""):
             'device_id': device_id
         }
         
-        # Add the garment ID if it's provided
+        # Send the catalog product ID - the backend forwards the garment image URL to FASHN
         if garment_id:
-            # IMPORTANT: Ensure garment_id format from new API is compatible
-            data['garment_id'] = str(garment_id) 
+            data['product_id'] = str(garment_id) 
             
         # Make the API request
-        response = requests.post(f"{API_BASE_URL}/tryon", files=files, data=data)
+        response = requests.post(f"{API_BASE_URL}/virtual-tryon/test", files=files, data=data)
         response.raise_for_status()
         result = response.json()
         
+        # Long-poll the status endpoint until the try-on finishes
+        while result.get('status') not in ('completed', 'failed'):
+            response = requests.get(
+                f"{API_BASE_URL}/virtual-tryon/test-status/{result['id']}",
+                params={'wait': 30}
+            )
+            response.raise_for_status()
+            result = response.json()
+        
         # Process the response
-        if 'image' in result:
-            img_data = base64.b64decode(result['image'])
-            result_img = Image.open(io.BytesIO(img_data))
+        result_url = result.get('result_url')
+        if isinstance(result_url, list):
+            result_url = result_url[0] if result_url else None
+        if result.get('status') == 'completed' and result_url:
+            img_response = requests.get(result_url)
+            img_response.raise_for_status()
+            result_img = Image.open(io.BytesIO(img_response.content))
             return result_img, f"Try-on successful! Device ID: {device_id}"
         
-        return None, f"Error: Try-on failed - {result.get('message', 'Unknown error')}"
+        return None, f"Error: Try-on failed - {result.get('error', 'Unknown error')}"
         
     except Exception as e:
         print(f"Error during virtual try-on: {str(e)}")
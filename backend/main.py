@@ -17,6 +17,11 @@ import routes.webhooks
 import routes.notifications
 from routes.virtual_tryon import tryon_router
 from routes.products import router as products_router
+from utils.fashn_client import close_fashn_client
+from utils.prediction_poller import start_prediction_poller, stop_prediction_poller
+from utils.quota_cache import start_quota_flusher, stop_quota_flusher
+from utils.tryon_outputs import start_output_mirror, stop_output_mirror
+from utils.uploads import UploadSizeLimitMiddleware, MULTIPART_OVERHEAD_BYTES
 
 # Create FastAPI app instance
 app = FastAPI(title="VELRA API", 
@@ -65,6 +70,13 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Refuse try-on uploads bigger than a model and a garment image before parsing them
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_bytes=2 * settings.TRYON_UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES,
+    path_prefix="/virtual-tryon"
+)
+
 # Include routers
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(tryon_router, tags=["Virtual Try-On"])
@@ -82,6 +94,12 @@ async def startup_db_client():
     await connect_to_mongodb()
     # Set up scheduler after database connection is established
     setup_scheduler()
+    # Keep pending try-on predictions refreshed from FASHN
+    start_prediction_poller()
+    # Write buffered try-on usage increments behind to MongoDB
+    start_quota_flusher()
+    # Copy completed try-on outputs into our own storage
+    start_output_mirror()
 
     # Set up DNS caching for external APIs
     try:
@@ -92,6 +110,10 @@ async def startup_db_client():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await stop_prediction_poller()
+    await stop_output_mirror()
+    await stop_quota_flusher()
+    await close_fashn_client()
     await close_mongodb_connection()
 
 @app.get("/")
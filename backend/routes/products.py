@@ -1,18 +1,25 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional, Any, Dict
-import requests
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.encoders import jsonable_encoder
+from typing import List, Optional, Any, Dict, Tuple
+import asyncio
+import httpx
 import logging
+import json
 from pydantic import BaseModel, Field
 from config import settings
 import datetime
 from database import get_mongodb_connection # Import the MongoDB connection utility
+from utils.catalog_cache import catalog_page_cache
+from utils.catalog_store import (
+    PRODUCTS_COLLECTION, clear_refresh_failure, get_listing, read_category_slice, record_refresh_failure,
+    refresh_backed_off, search_products, store_category
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Define the cache collection name
-PRODUCTS_CACHE_COLLECTION = "products_cache"
 CACHE_DURATION_DAYS = 7 # Cache products for 7 days
+CACHE_MAX_STALE_DAYS = 30 # Serve expired entries this long while they are refreshed
 
 # Create router
 router = APIRouter(
@@ -52,11 +59,12 @@ class CategoryProductList(BaseModel):
 ASOS_API_HOST = settings.ASOS_API_HOST
 ASOS_API_KEY = settings.ASOS_API_KEY
 
-# Calculate cache expiry threshold - one week
-CACHE_EXPIRY_THRESHOLD = datetime.datetime.utcnow() - datetime.timedelta(days=CACHE_DURATION_DAYS)
-
 logger.info(f"Loaded ASOS_API_HOST for Category Search: {ASOS_API_HOST}")
 
+def cache_expiry_threshold() -> datetime.datetime:
+    """Entries updated before this are stale; computed per request"""
+    return datetime.datetime.utcnow() - datetime.timedelta(days=CACHE_DURATION_DAYS)
+
 def ensure_https_prefix(url):
     """Ensure URL starts with https://"""
     if url and isinstance(url, str) and not url.startswith(('http://', 'https://')):
@@ -89,6 +97,273 @@ def process_product_images(product_data):
     
     return processed
 
+async def find_catalog_image_url(product_id: Optional[str] = None, image_url: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve a garment to an image URL from the cached ASOS catalog.
+
+    Looks the product up by ID when one is given, otherwise checks that the
+    image URL belongs to a cached product. Returns None for anything that
+    is not in the catalog, so arbitrary URLs are never forwarded.
+    """
+    db = await get_mongodb_connection()
+    products_collection = db[PRODUCTS_COLLECTION]
+
+    if product_id:
+        # ASOS IDs are numeric but may have been cached as strings
+        candidate_ids = [product_id]
+        if str(product_id).isdigit():
+            candidate_ids.append(int(product_id))
+        product = await products_collection.find_one({"_id": {"$in": candidate_ids}}, {"imageUrl": 1})
+        if not product:
+            return None
+        return ensure_https_prefix(product.get("imageUrl"))
+
+    if image_url:
+        image_url = ensure_https_prefix(image_url)
+        product = await products_collection.find_one({"imageUrl": image_url}, {"_id": 1})
+        return image_url if product else None
+
+    return None
+
+def serialize_product_page(products: List[Dict[str, Any]]) -> bytes:
+    """Validate one page of cached products and render the response body once"""
+    processed_products = [process_product_images(product) for product in products]
+    try:
+        payload = [SimpleProduct(**product).dict() for product in processed_products]
+    except Exception as parse_err:
+        logger.warning(f"Error parsing cached product data: {parse_err}. Falling back to returning raw data.")
+        payload = processed_products
+    return json.dumps(jsonable_encoder(payload)).encode("utf-8")
+
+async def read_cached_page(db, cache_key: str, page: int, perPage: int) -> Tuple[Optional[bytes], bool]:
+    """
+    Serialized page of a category listing and whether the listing is still fresh.
+
+    The in-process tier answers hot pages without a database read. On a
+    miss the page is one ranked range read over the listing's stored
+    products, and a fresh page is kept until the listing goes stale.
+    Expired listings are still returned (as not fresh) for up to
+    CACHE_MAX_STALE_DAYS so they can be served while a refresh runs;
+    (None, False) otherwise.
+    """
+    page_key = (cache_key, page, perPage)
+    body = catalog_page_cache.get(page_key)
+    if body is not None:
+        return body, True
+
+    listing = await get_listing(db, cache_key)
+    # Listings still embedding their products predate normalization; refetch them
+    if not listing or not listing.get("generation"):
+        return None, False
+    last_updated = listing.get("last_updated")
+    now = datetime.datetime.utcnow()
+    if not last_updated or last_updated <= now - datetime.timedelta(days=CACHE_MAX_STALE_DAYS):
+        return None, False
+
+    products = await read_category_slice(db, listing, (page - 1) * perPage, perPage)
+    # A partial listing (e.g. an interrupted prefetch) cannot tell a short
+    # page from one it never fetched, so it only answers full pages
+    if len(products) < perPage and not listing.get("complete"):
+        return None, False
+
+    body = serialize_product_page(products)
+    threshold = cache_expiry_threshold()
+    fresh = last_updated > threshold
+    if fresh:
+        catalog_page_cache.put(page_key, body, ttl_seconds=(last_updated - threshold).total_seconds())
+    return body, fresh
+
+async def fetch_category_page(categoryId: str, page: int, perPage: int, currency: str, countryISO: str) -> List[Dict[str, Any]]:
+    """Fetch one page of a category from ASOS; raises when the response cannot be read"""
+    # Construct the new API URL
+    url = f"https://{ASOS_API_HOST}/product/bycategory" 
+    
+    # Prepare headers (same as before)
+    headers = {
+        "X-RapidAPI-Key": ASOS_API_KEY,
+        "X-RapidAPI-Host": ASOS_API_HOST
+    }
+    
+    # Prepare query parameters for the new endpoint
+    params = {
+        "categoryId": categoryId,
+        "page": str(page), # API expects string
+        "perPage": str(perPage), # API expects string
+        "currency": currency,
+        "countryISO": countryISO,
+    }
+    
+    # Make the API request
+    logger.info(f"Calling ASOS Category API URL: {url}")
+    logger.info(f"Calling ASOS Category API Params: {params}")
+    async with httpx.AsyncClient(timeout=settings.ASOS_API_TIMEOUT_SECONDS) as client:
+        response = await client.get(url, headers=headers, params=params)
+    
+    logger.info(f"ASOS Category API Response Status Code: {response.status_code}")
+    
+    # Handle specific errors
+    if response.status_code == 429:
+        logger.error("ASOS API rate limit exceeded.")
+        raise Exception("API rate limit exceeded. Falling back to cache.")
+    elif response.status_code == 403:
+        logger.error("ASOS API access forbidden.")
+        raise Exception("API access forbidden. Falling back to cache.")
+    
+    response.raise_for_status() # Raise for other errors
+    
+    api_response_data = response.json()
+    logger.debug(f"ASOS Category API Raw Response (first 500 chars): {str(api_response_data)[:500]}")
+
+    # --- Response Parsing Adjustment --- 
+    # Per documentation, response should be in format: { message, data, error }
+    api_response = ASOSResponseWrapper(**api_response_data)
+    
+    # Check for API-level errors
+    if api_response.error:
+        logger.error(f"ASOS API returned an error: {api_response.error} - {api_response.message}")
+        raise Exception(f"ASOS API error: {api_response.message}. Falling back to cache.")
+    
+    # The data is an object, not a list directly
+    if not api_response.data:
+        logger.error("ASOS API returned no data")
+        raise Exception("No data in ASOS API response. Falling back to cache.")
+    
+    # Log the data structure to understand it
+    logger.debug(f"ASOS API data structure keys: {api_response.data.keys() if isinstance(api_response.data, dict) else 'not a dict'}")
+    
+    # Try to find products in the data object - it could be under various keys
+    products_list = []
+    
+    if isinstance(api_response.data, dict):
+        # Check for common keys that might contain the products list
+        if "products" in api_response.data and isinstance(api_response.data["products"], list):
+            products_list = api_response.data["products"]
+        elif "items" in api_response.data and isinstance(api_response.data["items"], list):
+            products_list = api_response.data["items"]
+        elif "results" in api_response.data and isinstance(api_response.data["results"], list):
+            products_list = api_response.data["results"]
+        else:
+            # If we can't find a list of products, log the structure and FALLBACK
+            logger.error(f"Could not find products list in data structure: {str(api_response.data)[:500]}")
+            raise Exception("Could not locate products list in API response. Falling back to cache.")
+    else:
+        # Handle unlikely case where data is not a dict
+        logger.error(f"Unexpected ASOS data type: {type(api_response.data)}")
+        raise Exception(f"Unexpected API response data type: {type(api_response.data)}. Falling back to cache.")
+    
+    logger.info(f"Found {len(products_list)} products in the response")
+    
+    return products_list
+
+class CategoryPrefetch:
+    """
+    One background fetch of a whole category from ASOS, page by page.
+
+    Products are appended as each ASOS page arrives, so a request that
+    missed the cache waits only until its own slice is available rather
+    than for the whole category.
+    """
+
+    def __init__(self, cache_key: str):
+        self.cache_key = cache_key
+        self.products: List[Dict[str, Any]] = []
+        self.finished = False
+        self.error: Optional[Exception] = None
+        self.task: Optional[asyncio.Task] = None
+        self._progress = asyncio.Condition()
+
+    async def add_page(self, products: List[Dict[str, Any]]):
+        async with self._progress:
+            self.products.extend(products)
+            self._progress.notify_all()
+
+    async def finish(self, error: Optional[Exception] = None):
+        async with self._progress:
+            self.finished = True
+            self.error = error
+            self._progress.notify_all()
+
+    async def wait_for_slice(self, start_idx: int, end_idx: int) -> List[Dict[str, Any]]:
+        """Products [start_idx, end_idx) once fetched; fewer at the end of the category"""
+        async with self._progress:
+            await self._progress.wait_for(lambda: self.finished or len(self.products) >= end_idx)
+        if self.error is not None and not self.products:
+            raise self.error
+        return self.products[start_idx:end_idx]
+
+async def prefetch_category(db, prefetch: CategoryPrefetch, categoryId: str, currency: str, countryISO: str):
+    """
+    Fetch a category from ASOS as a sequence of CATALOG_PREFETCH_PAGE_SIZE pages.
+
+    Stops at the first short page or after CATALOG_PREFETCH_MAX_PAGES, then
+    stores the whole list, so scrolling the category is served locally
+    instead of costing one ASOS call per page. A prefetch that fails or
+    stops early is recorded, which holds off further refreshes of the
+    category for CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS.
+    """
+    page_size = settings.CATALOG_PREFETCH_PAGE_SIZE
+    complete = False
+    error = None
+    try:
+        for page in range(1, settings.CATALOG_PREFETCH_MAX_PAGES + 1):
+            if page > 1:
+                await asyncio.sleep(settings.CATALOG_PREFETCH_PAGE_DELAY_SECONDS)
+            products_list = await fetch_category_page(categoryId, page, page_size, currency, countryISO)
+            if page == 1 and not products_list:
+                logger.warning(f"No products found in response for category {categoryId}")
+                raise Exception("No products found in API response.")
+            # Process all products to ensure proper image URLs before caching
+            await prefetch.add_page([process_product_images(product) for product in products_list])
+            if len(products_list) < page_size:
+                break
+        complete = True
+    except Exception as e:
+        error = e
+        logger.error(f"Prefetch of category {categoryId} stopped after {len(prefetch.products)} products: {str(e)}")
+    finally:
+        if prefetch.products:
+            metadata = {"categoryId": categoryId, "currency": currency, "countryISO": countryISO, "complete": complete}
+            try:
+                # An interrupted prefetch never replaces an existing (if stale) full listing
+                if await store_category(db, prefetch.cache_key, prefetch.products, metadata, replace=complete):
+                    catalog_page_cache.invalidate(prefetch.cache_key)
+                    logger.info(f"Updated cache for category {categoryId} with {len(prefetch.products)} products")
+            except Exception as db_err:
+                logger.error(f"Failed to update MongoDB cache for category {categoryId}: {db_err}")
+                # Don't fail the request if caching fails, just log it.
+        try:
+            if complete:
+                await clear_refresh_failure(db, prefetch.cache_key)
+            else:
+                await record_refresh_failure(db, prefetch.cache_key, error)
+        except Exception as db_err:
+            logger.error(f"Failed to record refresh outcome for category {categoryId}: {db_err}")
+        await prefetch.finish(error)
+
+# In-flight category prefetches, so concurrent requests for a category share one
+_inflight_prefetches: Dict[str, CategoryPrefetch] = {}
+
+def start_category_prefetch(db, cache_key: str, categoryId: str, currency: str, countryISO: str) -> CategoryPrefetch:
+    """
+    Return the running prefetch for this category, starting one if there is none.
+
+    The prefetch runs as its own task, so it completes (and updates the
+    cache) even when the request that started it goes away.
+    """
+    prefetch = _inflight_prefetches.get(cache_key)
+    if prefetch is None:
+        prefetch = CategoryPrefetch(cache_key)
+        prefetch.task = asyncio.create_task(prefetch_category(db, prefetch, categoryId, currency, countryISO))
+        _inflight_prefetches[cache_key] = prefetch
+        prefetch.task.add_done_callback(lambda _: _inflight_prefetches.pop(cache_key, None))
+    return prefetch
+
+async def category_refresh_allowed(db, cache_key: str) -> bool:
+    """A running prefetch can always be joined; otherwise honour the failure backoff"""
+    if cache_key in _inflight_prefetches:
+        return True
+    return not await refresh_backed_off(db, cache_key)
+
 # Changed endpoint path and response model
 @router.get("/by_category", response_model=List[SimpleProduct]) 
 async def get_products_by_category(
@@ -104,193 +379,69 @@ async def get_products_by_category(
 ):
     """
     Search for products from ASOS based on a Category ID.
-    Checks MongoDB cache first. If cache is valid, returns cached data.
-    Otherwise, fetches from ASOS API, updates cache, and returns data.
+    Checks the cache first; an expired entry is returned while the category
+    is refetched in the background. On a miss the whole category is
+    prefetched from ASOS and the request returns as soon as its page is in.
     """
     db = await get_mongodb_connection()
-    cache_collection = db[PRODUCTS_CACHE_COLLECTION]
 
     # --- Check Cache ---
     cache_key = f"{categoryId}_{currency}_{countryISO}" # Create a unique key for cache
-    cached_data = await cache_collection.find_one({"_id": cache_key})
-
-    if cached_data:
-        last_updated = cached_data.get("last_updated")
-        if last_updated and last_updated > CACHE_EXPIRY_THRESHOLD:
-            logger.info(f"Cache hit for category {categoryId}. Returning cached data.")
-            # Process and return cached products
-            products_list = cached_data.get("products", [])
-            
-            # Apply pagination to cached data
-            start_idx = (page - 1) * perPage
-            end_idx = start_idx + perPage
-            paginated_products = products_list[start_idx:end_idx] if products_list else []
-            
-            # Process all product images to ensure HTTPS
-            processed_products = [process_product_images(product) for product in paginated_products]
-            
-            # Return as SimpleProduct model instances
-            try:
-                return [SimpleProduct(**product) for product in processed_products]
-            except Exception as parse_err:
-                logger.warning(f"Error parsing cached product data for {categoryId}: {parse_err}. Falling back to returning raw data.")
-                # Return the processed raw data if model conversion fails
-                return processed_products
-        else:
-            logger.info(f"Cache expired for category {categoryId}. Fetching fresh data.")
-    else:
-        logger.info(f"Cache miss for category {categoryId}. Fetching fresh data.")
+    cached_page, fresh = await read_cached_page(db, cache_key, page, perPage)
+    if cached_page is not None:
+        if fresh:
+            logger.debug(f"Cache hit for category {categoryId} page {page}.")
+        elif ASOS_API_KEY and ASOS_API_HOST and await category_refresh_allowed(db, cache_key):
+            # Stale-while-revalidate: answer now, refresh in the background
+            logger.info(f"Cache expired for category {categoryId}. Serving stale data while refreshing.")
+            start_category_prefetch(db, cache_key, categoryId, currency, countryISO)
+        return Response(content=cached_page, media_type="application/json")
+    logger.info(f"Cache miss for category {categoryId}. Fetching fresh data.")
 
-    # --- Fetch from API (if cache miss or expired) ---
+    # --- Fetch from API (if cache miss) ---
     logger.debug(f"Using ASOS Host: {ASOS_API_HOST}")
     if not ASOS_API_KEY or not ASOS_API_HOST:
         logger.error("ASOS API Key or Host not configured.")
         raise HTTPException(status_code=500, detail="ASOS API not configured.")
+    if not await category_refresh_allowed(db, cache_key):
+        logger.warning(f"Not fetching category {categoryId}: its last refresh failed recently")
+        return []
         
+    prefetch = start_category_prefetch(db, cache_key, categoryId, currency, countryISO)
+    start_idx = (page - 1) * perPage
     try:
-        # Construct the new API URL
-        url = f"https://{ASOS_API_HOST}/product/bycategory" 
-        
-        # Prepare headers (same as before)
-        headers = {
-            "X-RapidAPI-Key": ASOS_API_KEY,
-            "X-RapidAPI-Host": ASOS_API_HOST
-        }
-        
-        # Prepare query parameters for the new endpoint
-        params = {
-            "categoryId": categoryId,
-            "page": str(page), # API expects string
-            "perPage": str(perPage), # API expects string
-            "currency": currency,
-            "countryISO": countryISO,
-        }
-        
-        # Make the API request
-        logger.info(f"Calling ASOS Category API URL: {url}")
-        logger.info(f"Calling ASOS Category API Headers: {headers}")
-        logger.info(f"Calling ASOS Category API Params: {params}")
-        response = requests.get(url, headers=headers, params=params)
-        
-        logger.info(f"ASOS Category API Response Status Code: {response.status_code}")
-        
-        # Handle specific errors
-        if response.status_code == 429:
-            logger.error("ASOS API rate limit exceeded.")
-            # FALLBACK: Try to load from cache instead of raising
-            raise Exception("API rate limit exceeded. Falling back to cache.")
-        elif response.status_code == 403:
-            logger.error("ASOS API access forbidden.")
-            # FALLBACK: Try to load from cache instead of raising
-            raise Exception("API access forbidden. Falling back to cache.")
-        
-        response.raise_for_status() # Raise for other errors
-        
-        api_response_data = response.json()
-        logger.debug(f"ASOS Category API Raw Response (first 500 chars): {str(api_response_data)[:500]}")
-
-        # --- Response Parsing Adjustment --- 
-        # Per documentation, response should be in format: { message, data, error }
-        api_response = ASOSResponseWrapper(**api_response_data)
-        
-        # Check for API-level errors
-        if api_response.error:
-            logger.error(f"ASOS API returned an error: {api_response.error} - {api_response.message}")
-            # FALLBACK: Try to load from cache instead of raising
-            raise Exception(f"ASOS API error: {api_response.message}. Falling back to cache.")
-        
-        # The data is an object, not a list directly
-        if not api_response.data:
-            logger.error(f"ASOS API returned no data")
-            # FALLBACK: Try to load from cache instead of raising
-            raise Exception("No data in ASOS API response. Falling back to cache.")
-        
-        # Log the data structure to understand it
-        logger.debug(f"ASOS API data structure keys: {api_response.data.keys() if isinstance(api_response.data, dict) else 'not a dict'}")
-        
-        # Try to find products in the data object - it could be under various keys
-        products_list = []
-        
-        if isinstance(api_response.data, dict):
-            # Check for common keys that might contain the products list
-            if "products" in api_response.data and isinstance(api_response.data["products"], list):
-                products_list = api_response.data["products"]
-            elif "items" in api_response.data and isinstance(api_response.data["items"], list):
-                products_list = api_response.data["items"]
-            elif "results" in api_response.data and isinstance(api_response.data["results"], list):
-                products_list = api_response.data["results"]
-            else:
-                # If we can't find a list of products, log the structure and FALLBACK
-                logger.error(f"Could not find products list in data structure: {str(api_response.data)[:500]}")
-                raise Exception("Could not locate products list in API response. Falling back to cache.")
-        else:
-            # Handle unlikely case where data is not a dict
-            logger.error(f"Unexpected ASOS data type: {type(api_response.data)}")
-            raise Exception(f"Unexpected API response data type: {type(api_response.data)}. Falling back to cache.")
-        
-        logger.info(f"Found {len(products_list)} products in the response")
-        
-        # Check if we found any products
-        if not products_list:
-            logger.warning(f"No products found in response for category {categoryId}")
-            # FALLBACK: Try to load from cache instead of returning empty
-            raise Exception("No products found in API response. Falling back to cache.")
-        
-        # Process all products to ensure proper image URLs before caching
-        processed_products_for_cache = [process_product_images(product) for product in products_list]
-        
-        # --- Update Cache ---
-        if processed_products_for_cache: # Only cache if we successfully processed some products
-            cache_document = {
-                "_id": cache_key, # Use the same key
-                "categoryId": categoryId,
-                "currency": currency,
-                "countryISO": countryISO,
-                "products": processed_products_for_cache, # Cache the processed data
-                "last_updated": datetime.datetime.utcnow()
-            }
-            try:
-                await cache_collection.update_one(
-                    {"_id": cache_key},
-                    {"$set": cache_document},
-                    upsert=True
-                )
-                logger.info(f"Updated cache for category {categoryId}")
-            except Exception as db_err:
-                logger.error(f"Failed to update MongoDB cache for category {categoryId}: {db_err}")
-                # Don't fail the request if caching fails, just log it.
-        
-        # Validate and return processed products using the SimpleProduct model
-        try:
-            return [SimpleProduct(**product) for product in processed_products_for_cache]
-        except Exception as parse_err:
-            logger.warning(f"Error converting to SimpleProduct models: {parse_err}. Returning raw processed data.")
-            return processed_products_for_cache
-        
+        products = await prefetch.wait_for_slice(start_idx, start_idx + perPage)
+        return Response(content=serialize_product_page(products), media_type="application/json")
     except Exception as e:
-        logger.error(f"API fetch failed or error encountered: {str(e)}. Attempting to load from cache.")
-        # FALLBACK: Try to load from cache
-        cached_data = await cache_collection.find_one({"_id": cache_key})
-        if cached_data:
-            last_updated = cached_data.get("last_updated")
-            if last_updated and last_updated > CACHE_EXPIRY_THRESHOLD:
-                logger.info(f"Fallback cache hit for category {categoryId}. Returning cached data.")
-                products_list = cached_data.get("products", [])
-                start_idx = (page - 1) * perPage
-                end_idx = start_idx + perPage
-                paginated_products = products_list[start_idx:end_idx] if products_list else []
-                processed_products = [process_product_images(product) for product in paginated_products]
-                try:
-                    return [SimpleProduct(**product) for product in processed_products]
-                except Exception as parse_err:
-                    logger.warning(f"Error parsing cached product data for {categoryId} in fallback: {parse_err}. Returning raw data.")
-                    return processed_products
-            else:
-                logger.warning(f"No valid cache available for category {categoryId} during fallback.")
-        # If no cache, return empty list or error
+        # Nothing servable was cached, not even a stale copy
+        logger.error(f"API fetch failed or error encountered for category {categoryId}: {str(e)}")
         return []
 
 
+@router.get("/search", response_model=List[SimpleProduct])
+async def search_cached_products(
+    query: str = Query(..., min_length=1, description="Words of a product name or brand; the last may be partly typed"),
+    perPage: int = Query(24, ge=1, le=100, description="Products per page"),
+    page: int = Query(1, ge=1, description="Page number"),
+    currency: str = Query("USD", description="Currency code"),
+    countryISO: str = Query("US", description="Country ISO code")
+):
+    """
+    Search the locally stored catalog by product name and brand.
+
+    Served entirely from the products collection, whose search terms are
+    rebuilt whenever a category is refreshed from ASOS, so typing never
+    costs ASOS calls. Only products from categories already fetched for
+    this currency and country are found.
+    """
+    db = await get_mongodb_connection()
+    try:
+        products = await search_products(db, query, currency, countryISO, (page - 1) * perPage, perPage)
+    except Exception as e:
+        logger.error(f"Product search for '{query}' failed: {str(e)}")
+        raise HTTPException(status_code=500, detail="Product search failed")
+    return Response(content=serialize_product_page(products), media_type="application/json")
+
 # Add the test endpoint
 @router.get("/test", response_model=Dict[str, Any])
 async def test_products_api():
@@ -301,6 +452,11 @@ async def test_products_api():
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
 
+@router.get("/cache-stats", response_model=Dict[str, Any])
+async def get_catalog_cache_stats():
+    """Hit, miss and eviction counts of this worker's in-process catalog page cache"""
+    return catalog_page_cache.stats()
+
 # Add the debug endpoint
 @router.get("/debug_category", response_model=Dict[str, Any])
 async def debug_category_response(
@@ -329,7 +485,8 @@ async def debug_category_response(
         }
         
         logger.info(f"[DEBUG] Calling ASOS API: {url}")
-        response = requests.get(url, headers=headers, params=params)
+        async with httpx.AsyncClient(timeout=settings.ASOS_API_TIMEOUT_SECONDS) as client:
+            response = await client.get(url, headers=headers, params=params)
         response.raise_for_status()
         
         # Return the raw response json
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Form, Request
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Form, Request, Response, Query, Header
+from fastapi.responses import FileResponse
 from fastapi.security import OAuth2PasswordBearer
 from typing import Optional, Dict, Any, List, Union
 from pydantic import BaseModel
@@ -7,14 +8,32 @@ import logging
 import time
 from datetime import datetime
 import aiofiles
-import os
 import tempfile
-import requests
 import math
+import asyncio
+import uuid
+import os
+import base64
 
 from config import settings
 from database import get_database
 from models import TryonUsage, DeviceBasedRequest
+from utils import fashn_client
+from utils.prediction_poller import get_predictions_collection, initial_poll_time, TERMINAL_STATUSES
+from utils.prediction_events import wait_for_prediction
+from utils.tryon_cache import compute_tryon_cache_key, lookup_cached_result
+from utils.image_utils import normalize_image, convert_to_data_uri
+from utils.model_photos import store_model_photo, load_model_photo
+from utils.quota import user_limits, device_limits, DEVICE_MONTHLY_LIMIT
+from utils.quota_cache import quota_cache
+from utils.idempotency import IdempotentRequest, begin_idempotent_request, request_fingerprint
+from utils.fashn_scheduler import FashnQueueFullError, fashn_scheduler
+from utils.circuit_breaker import CircuitOpenError
+from utils.fashn_payloads import submit_prediction
+from utils.tryon_outputs import local_output_path, output_cache_control
+from utils.uploads import read_upload
+from utils.latency_model import INPUT_PROJECTION, latency_model
+from routes.products import find_catalog_image_url
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -28,8 +47,14 @@ class TryOnResponse(BaseModel):
     status: str
     eta: Optional[int] = None
     result_url: Optional[Union[str, List[str]]] = None
+    thumbnail_url: Optional[Union[str, List[str]]] = None
     error: Optional[str] = None
 
+class ModelPhotoResponse(BaseModel):
+    id: str
+    mime_type: str
+    size: int
+
 class TryOnCountsModel(BaseModel):
     daily_count: int = 0
     monthly_count: int = 0
@@ -43,6 +68,84 @@ class TryOnUsageResponse(BaseModel):
     monthly_limit: int = 40  # Default limit, can be overridden for premium users
     counts: Optional[TryOnCountsModel] = None
 
+class BatchTryOnItem(BaseModel):
+    index: int
+    garment_url: Optional[str] = None
+    product_id: Optional[str] = None
+    id: Optional[str] = None  # Prediction ID, once FASHN accepted the run
+    status: str
+    eta: Optional[int] = None
+    result_url: Optional[Union[str, List[str]]] = None
+    thumbnail_url: Optional[Union[str, List[str]]] = None
+    error: Optional[str] = None
+
+class BatchTryOnResponse(BaseModel):
+    batch_id: str
+    items: List[BatchTryOnItem]
+
+class TryOnHistoryItem(BaseModel):
+    id: str
+    status: str
+    created_at: datetime
+    result_url: Optional[Union[str, List[str]]] = None
+    thumbnail_url: Optional[Union[str, List[str]]] = None
+
+class TryOnHistoryResponse(BaseModel):
+    items: List[TryOnHistoryItem]
+    next_cursor: Optional[str] = None  # Pass back as `cursor` for the next page; None on the last page
+
+# Only the fields the status endpoints return
+PREDICTION_STATUS_PROJECTION = {
+    "_id": 0, "id": 1, "user_id": 1, "status": 1, "eta": 1, "result_url": 1, "output_urls": 1, "error": 1,
+    # Inputs to the ETA and Retry-After estimates
+    "created_at": 1, "next_poll_at": 1, **INPUT_PROJECTION
+}
+
+def prediction_status_response(prediction_id: str, prediction: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build a TryOnResponse payload from a stored prediction document.
+
+    Once the output has been mirrored into our storage, its copies are
+    returned instead of the provider's URL. The ETA of a pending prediction
+    comes from the latency model of recent completions.
+    """
+    status = prediction.get("status", "pending")
+    output_urls = prediction.get("output_urls") or {}
+    completed = status == "completed"
+    return {
+        "id": prediction_id,
+        "status": status,
+        "eta": latency_model.remaining_seconds(prediction) if status not in TERMINAL_STATUSES else None,
+        "result_url": (output_urls.get("full") or prediction.get("result_url")) if completed else None,
+        "thumbnail_url": output_urls.get("thumbnail") if completed else None,
+        "error": prediction.get("error") if status == "failed" else None
+    }
+
+def set_retry_after(response: Response, predictions: List[Dict[str, Any]]):
+    """Tell the client when polling again is worthwhile, while anything is still pending"""
+    pending = [prediction for prediction in predictions if prediction.get("status") not in TERMINAL_STATUSES]
+    if pending:
+        response.headers["Retry-After"] = str(min(latency_model.retry_after(prediction) for prediction in pending))
+
+async def wait_for_terminal_status(predictions_collection, prediction_id: str, prediction: Dict[str, Any], wait: int) -> Dict[str, Any]:
+    """
+    Hold a status request open until the prediction completes or fails.
+
+    Waits on the in-process notification from the status poller and
+    re-reads the stored document every PREDICTION_WAIT_RECHECK_SECONDS in
+    case another worker refreshed it. Returns the latest known document.
+    """
+    deadline = time.monotonic() + min(wait, settings.PREDICTION_WAIT_MAX_SECONDS)
+    while prediction.get("status") not in TERMINAL_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        published = await wait_for_prediction(prediction_id, min(remaining, settings.PREDICTION_WAIT_RECHECK_SECONDS))
+        if published is not None:
+            return published
+        prediction = await predictions_collection.find_one({"id": prediction_id}, PREDICTION_STATUS_PROJECTION) or prediction
+    return prediction
+
 # Helper function to get user ID from token
 async def get_user_id(token: str = Depends(oauth2_scheme), db=Depends(get_database)):
     try:
@@ -65,118 +168,32 @@ async def get_user_id(token: str = Depends(oauth2_scheme), db=Depends(get_databa
         raise HTTPException(status_code=401, detail="Could not validate credentials")
 
 # Helper function to track try-on usage
-async def track_tryon_usage(user_id: str, is_subscribed: bool = False, db=Depends(get_database)):
-    """Track user's virtual try-on usage with simplified logic"""
-    try:
-        # Get the current usage record or create a new one
-        usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"user_id": user_id})
-        
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        if not usage:
-            # Create a new usage record
-            usage = {
-                "user_id": user_id,
-                "daily_count": 1,
-                "monthly_count": 1,
-                "total_count": 1,
-                "last_reset_daily": today,
-                "last_reset_monthly": first_of_month,
-                "last_used": now,
-                "is_subscribed": is_subscribed
-            }
-            await usage_collection.insert_one(usage)
-            
-            # Also create user engagement record
-            engagement_collection = db[settings.DB_NAME]["user_engagement"]
-            await engagement_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"last_tryon": now},
-                 "$inc": {"tryons_count": 1}},
-                upsert=True
-            )
-            
-            return usage
-        
-        # CRITICAL CHECK: Make sure we're not exceeding limits
-        # Get current counts
-        daily_count = usage.get("daily_count", 0)
-        monthly_count = usage.get("monthly_count", 0)
-        
-        # Reset counters if needed
-        update_fields = {"last_used": now, "is_subscribed": is_subscribed}
-        needs_update = False
-        
-        # Reset daily count if it's a new day
-        last_reset_daily = usage.get("last_reset_daily", today)
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            daily_count = 0
-            update_fields["daily_count"] = 0
-            update_fields["last_reset_daily"] = today
-            needs_update = True
-        
-        # Reset monthly count if it's a new month
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            monthly_count = 0
-            update_fields["monthly_count"] = 0
-            update_fields["last_reset_monthly"] = first_of_month
-            needs_update = True
-            
-        # Update resets if needed
-        if needs_update:
-            await usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": update_fields}
-            )
-        
-        # Our simplified business logic:
-        # 1. For non-subscribers: Only 1 try-on per day
-        # 2. Both subscribers and non-subscribers: Max 40 try-ons per month
-        
-        # Check monthly limit (applies to all users)
-        if monthly_count >= 40:
-            logger.warning(f"User {user_id} has reached monthly limit: {monthly_count}/40")
-            return usage  # Don't increment
-            
-        # Check daily limit for free users
-        if not is_subscribed and daily_count >= 1:
-            logger.warning(f"Non-subscribed user {user_id} has reached daily limit: {daily_count}/1")
-            return usage  # Don't increment
-        
-        # If we get here, increment the counters
-        increment = {
-            "daily_count": 1,
-            "monthly_count": 1,
-            "total_count": 1
-        }
-        
-        await usage_collection.update_one(
-            {"user_id": user_id},
-            {"$inc": increment}
-        )
-        
+async def track_tryon_usage(user_id: str, is_subscribed: bool = False, db=Depends(get_database), count: int = 1):
+    """Charge `count` try-ons to the user if their limits allow all of them, in a single database round trip"""
+    daily_limit, monthly_limit = user_limits(is_subscribed)
+    usage_collection = db[settings.DB_NAME]["tryon_usage"]
+    quota = await quota_cache.charge(
+        usage_collection,
+        {"user_id": user_id},
+        daily_limit,
+        monthly_limit,
+        fields={"is_subscribed": is_subscribed},
+        count=count
+    )
+    
+    if quota["consumed"]:
         # Also update the user engagement record
         engagement_collection = db[settings.DB_NAME]["user_engagement"]
         await engagement_collection.update_one(
             {"user_id": user_id},
-            {"$set": {"last_tryon": now},
-             "$inc": {"tryons_count": 1}},
+            {"$set": {"last_tryon": datetime.utcnow()},
+             "$inc": {"tryons_count": count}},
             upsert=True
         )
-        
-        # Get the updated usage record
-        updated_usage = await usage_collection.find_one({"user_id": user_id})
-        logger.info(f"Updated usage for user {user_id}: daily={updated_usage.get('daily_count', 0)}, monthly={updated_usage.get('monthly_count', 0)}/40")
-        return updated_usage
-        
-    except Exception as e:
-        logger.error(f"Error tracking try-on usage: {str(e)}", exc_info=True)
-        # Continue anyway - don't block the try-on due to usage tracking error
-        return None
+    else:
+        logger.warning(f"User {user_id} has reached a try-on limit: {quota['reason']}")
+    
+    return quota
 
 # Helper function to check if user has remaining try-ons
 async def check_tryon_limit(user_id: str, db=Depends(get_database)):
@@ -187,69 +204,131 @@ async def check_tryon_limit(user_id: str, db=Depends(get_database)):
         user = await users_collection.find_one({"_id": user_id})
         is_premium = user.get("isPremium", False) if user else False
         
-        # Set limits based on user type
-        if is_premium:
-            daily_limit = float('inf')   # no daily limit for subscribers
-            monthly_limit = 30          # subscribers get 30 per month
-        else:
-            daily_limit = 1             # free users get 1 per day
-            monthly_limit = float('inf') # no monthly limit for free users
-        
-        # Get current usage
+        daily_limit, monthly_limit = user_limits(is_premium)
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"user_id": user_id})
-        
-        if not usage:
-            # No usage record means they haven't used any try-ons today
-            return True, daily_limit, monthly_limit, 0, 0, None
-            
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Check if we need to reset the daily count
-        last_reset_daily = usage.get("last_reset_daily", usage.get("last_reset", now))
-        daily_count = usage.get("daily_count", 0)
-        
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            # It's a new day, so reset the count
-            daily_count = 0
-            await usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"daily_count": 0, "last_reset_daily": today}}
-            )
-            
-        # Check if we need to reset the monthly count    
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        monthly_count = usage.get("monthly_count", 0)
-        
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            # It's a new month, so reset the count
-            monthly_count = 0
-            await usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"monthly_count": 0, "last_reset_monthly": first_of_month}}
-            )
-            
-        # Check if they've reached their daily limit (only for free users)
-        if not is_premium and daily_count >= daily_limit:
-            return False, daily_limit, monthly_limit, daily_count, monthly_count, "DAILY_LIMIT_REACHED"
-            
-        # Check if they've reached their monthly limit (for all users)
-        if is_premium and monthly_count >= monthly_limit:
-            return False, daily_limit, monthly_limit, daily_count, monthly_count, "MONTHLY_LIMIT_REACHED"
-            
-        return True, daily_limit, monthly_limit, daily_count, monthly_count, None
+        quota = await quota_cache.read(usage_collection, {"user_id": user_id}, daily_limit, monthly_limit)
+        
+        return (
+            quota["allowed"],
+            daily_limit if daily_limit is not None else float('inf'),
+            monthly_limit if monthly_limit is not None else float('inf'),
+            quota["daily_count"],
+            quota["monthly_count"],
+            quota["reason"]
+        )
         
     except Exception as e:
         logger.error(f"Error checking try-on limit: {str(e)}")
         # If there's an error, allow the try-on to proceed
         return True, 40, 40, 0, 0, None
 
+def raise_for_user_limit(quota: Dict[str, Any]):
+    """Turn a refused quota charge into the 429/402 the app expects"""
+    if quota["reason"] == "MONTHLY_LIMIT_REACHED":
+        raise HTTPException(
+            status_code=429, 
+            detail=f"Monthly limit reached: {quota['monthly_count']}/{quota['monthly_limit']}. Please wait until the end of the month."
+        )
+    raise HTTPException(
+        status_code=402, 
+        detail=f"Daily limit reached: {quota['daily_count']}/{quota['daily_limit']}. Please subscribe for more try-ons."
+    )
+
+async def read_model_image(
+    db,
+    model_image: Optional[UploadFile],
+    model_photo_id: Optional[str],
+    user_id: Optional[str] = None,
+    device_id: Optional[str] = None
+) -> bytes:
+    """Return the model photo bytes from a stored handle or the uploaded file"""
+    if model_photo_id:
+        stored_photo = await load_model_photo(db, model_photo_id, user_id=user_id, device_id=device_id)
+        if not stored_photo:
+            raise HTTPException(status_code=404, detail="Model photo not found")
+        return stored_photo[0]
+    if model_image is None:
+        raise HTTPException(status_code=400, detail="Either model_image or model_photo_id is required")
+    return await read_upload(model_image)
+
+async def resolve_garment_url(
+    garment_image: Optional[UploadFile],
+    garment_url: Optional[str],
+    product_id: Optional[str]
+) -> Optional[str]:
+    """
+    Return the catalog image URL to forward to FASHN, or None when the
+    garment was uploaded as a file.
+    """
+    if not garment_url and not product_id:
+        if garment_image is None:
+            raise HTTPException(status_code=400, detail="One of garment_image, garment_url or product_id is required")
+        return None
+    
+    image_url = await find_catalog_image_url(product_id=product_id, image_url=garment_url)
+    if not image_url:
+        raise HTTPException(status_code=400, detail="Garment is not in the product catalog")
+    return image_url
+
+def fashn_error_detail(fashn_response) -> str:
+    """Extract a readable error message from a failed FASHN run response"""
+    error_detail = "Failed to start virtual try-on"
+    try:
+        error_json = fashn_response.json()
+        if isinstance(error_json, dict) and 'error' in error_json:
+            error_detail = error_json['error']
+        elif isinstance(error_json, dict) and 'message' in error_json:
+            error_detail = error_json['message']
+    except:
+        pass
+    return error_detail
+
+@tryon_router.post("/model-photo", response_model=ModelPhotoResponse)
+async def upload_model_photo(
+    model_image: UploadFile = File(...),
+    user_id: str = Depends(get_user_id),
+    db = Depends(get_database)
+):
+    """Store the user's model photo once and return a handle to use with /try-async"""
+    try:
+        contents = await read_upload(model_image)
+        return await store_model_photo(db, contents, user_id=user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error storing model photo: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to store model photo: {str(e)}")
+
+@tryon_router.post("/device-model-photo", response_model=ModelPhotoResponse)
+async def upload_device_model_photo(
+    request: Request,
+    model_image: UploadFile = File(...),
+    device_id: Optional[str] = Form(None),
+    db = Depends(get_database)
+):
+    """Store a device's model photo once and return a handle to use with /test and /try-device"""
+    try:
+        device_id_value = device_id or request.headers.get('X-Device-Id')
+        if not device_id_value:
+            raise HTTPException(status_code=400, detail="device_id is required")
+        
+        contents = await read_upload(model_image)
+        return await store_model_photo(db, contents, device_id=device_id_value)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error storing device model photo: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to store model photo: {str(e)}")
+
 @tryon_router.post("/try-async", response_model=TryOnResponse)
 async def start_virtual_try_on(
-    model_image: UploadFile = File(...),
-    garment_image: UploadFile = File(...),
+    model_image: Optional[UploadFile] = File(None),
+    garment_image: Optional[UploadFile] = File(None),
+    # Handle from /model-photo, used instead of uploading model_image again
+    model_photo_id: Optional[str] = Form(None),
+    # Catalog garment, used instead of uploading garment_image
+    garment_url: Optional[str] = Form(None),
+    product_id: Optional[str] = Form(None),
     category: str = Form("auto"),
     mode: str = Form("balanced"),
     moderation_level: str = Form("permissive"),
@@ -262,38 +341,63 @@ async def start_virtual_try_on(
     # Add new parameter with default value
     segmentation_free: str = Form("false"),
     background_tasks: BackgroundTasks = BackgroundTasks(),
+    # Retries with the same key replay the first response instead of starting another run
+    idempotency_key: Optional[str] = Header(None),
     user_id: str = Depends(get_user_id),
     db = Depends(get_database)
 ):
     """Start a virtual try-on and return a prediction ID to check status"""
     
-    # Check permissions
-    can_try_on, daily_limit, monthly_limit, daily_count, monthly_count, limit_reason = await check_tryon_limit(user_id, db)
-    if not can_try_on:
-        if limit_reason == "MONTHLY_LIMIT_REACHED":
-            raise HTTPException(
-                status_code=429, 
-                detail=f"Monthly limit reached: {monthly_count}/{monthly_limit}. Please wait until the end of the month."
-            )
-        else:  # DAILY_LIMIT_REACHED
-            raise HTTPException(
-                status_code=402, 
-                detail=f"Daily limit reached: {daily_count}/{daily_limit}. Please subscribe for more try-ons."
-            )
+    # Set once the try-on is charged and cleared again once FASHN accepts it
+    refund_on_error = False
+    idempotency = IdempotentRequest()
     
     try:
         # Process uploaded files
-        model_data = await model_image.read()
-        garment_data = await garment_image.read()
-        
-        # Check image sizes and dimensions (simplified example)
-        if len(model_data) > 10 * 1024 * 1024 or len(garment_data) > 10 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="Image size exceeds 10MB limit")
+        model_data = await read_model_image(db, model_image, model_photo_id, user_id=user_id)
+        garment_source_url = await resolve_garment_url(garment_image, garment_url, product_id)
+        garment_data = garment_source_url.encode("utf-8") if garment_source_url else await read_upload(garment_image)
         
-        # Convert to API-compatible format
-        from utils.image_utils import convert_to_data_uri
-        model_uri = convert_to_data_uri(model_data)
-        garment_uri = convert_to_data_uri(garment_data)
+        idempotency = await begin_idempotent_request(
+            db, f"try-async:{user_id}", idempotency_key,
+            request_fingerprint(model_data, garment_data, category, mode, moderation_level, segmentation_free)
+        )
+        if idempotency.response is not None:
+            return idempotency.response
+        
+        # Return the earlier result if these exact inputs were already tried on
+        predictions_collection = get_predictions_collection(db)
+        cache_key = compute_tryon_cache_key(f"user:{user_id}", model_data, garment_data, category, mode, segmentation_free)
+        cached = await lookup_cached_result(predictions_collection, cache_key)
+        if cached:
+            return await idempotency.complete({
+                "id": cached["id"],
+                "status": "completed",
+                "result_url": cached["result_url"],
+                "thumbnail_url": cached["thumbnail_url"]
+            })
+
+        # Get user data to check premium status
+        users_collection = db[settings.DB_NAME]["users"]
+        user = await users_collection.find_one({"_id": user_id})
+        is_premium = user.get("isPremium", False) if user else False
+
+        # Check the limits and charge the try-on in one atomic step
+        quota = await track_tryon_usage(user_id, is_premium, db)
+        if not quota["consumed"]:
+            raise_for_user_limit(quota)
+        refund_on_error = True
+
+        # Downsize and re-encode off the event loop.
+        # Catalog garments are passed to FASHN by URL and never pass through here.
+        if garment_source_url:
+            model_input = await asyncio.to_thread(normalize_image, model_data)
+            garment_input = garment_source_url
+        else:
+            model_input, garment_input = await asyncio.gather(
+                asyncio.to_thread(normalize_image, model_data),
+                asyncio.to_thread(normalize_image, garment_data)
+            )
         
         # Make API call to FASHN
         # First, validate API key
@@ -305,79 +409,20 @@ async def start_virtual_try_on(
             
         logger.info(f"FASHN API KEY: {settings.FASHN_API_KEY[:5]}...")
         
-        # Prepare the API request
-        segmentation_free_bool = segmentation_free.lower() == "true"
-        
-        # Get user data to check premium status
-        users_collection = db[settings.DB_NAME]["users"]
-        user = await users_collection.find_one({"_id": user_id})
-        is_premium = user.get("isPremium", False) if user else False
-        
-        # Track usage in the background
-        background_tasks.add_task(track_tryon_usage, user_id, is_premium, db)
-        
-        # Try multiple approaches to find the one that works with the FASHN API
-        # Approach 1: With stringified booleans
+        # Send the request in the payload format FASHN is known to accept
         try:
-            import requests
-            
-            fashn_response = requests.post(
-                "https://api.fashn.ai/v1/run",
-                json={
-                    'model_image': model_uri,
-                    'garment_image': garment_uri,
+            fashn_response = await submit_prediction(
+                model_input,
+                garment_input,
+                {
                     'category': category,
                     'mode': mode,
                     'moderation_level': moderation_level,
-                    'segmentation_free': str(segmentation_free_bool).lower()
+                    'segmentation_free': segmentation_free
                 },
-                headers={
-                    "Authorization": f"Bearer {settings.FASHN_API_KEY}"
-                },
-                timeout=30
+                premium=is_premium
             )
             
-            if fashn_response.status_code == 400:
-                # Approach 2: With actual boolean values (not stringified)
-                logger.info("First attempt failed, trying with actual boolean values")
-                
-                fashn_response = requests.post(
-                    "https://api.fashn.ai/v1/run",
-                    json={
-                        'model_image': model_uri,
-                        'garment_image': garment_uri,
-                        'category': category,
-                        'mode': mode,
-                        'moderation_level': moderation_level,
-                        'segmentation_free': segmentation_free_bool
-                    },
-                    headers={
-                        "Authorization": f"Bearer {settings.FASHN_API_KEY}",
-                        "Content-Type": "application/json"
-                    },
-                    timeout=30
-                )
-                
-                if fashn_response.status_code == 400:
-                    # Approach 3: Use string parameter names as shown in docs
-                    logger.info("Second attempt failed, trying with image field names")
-                    
-                    fashn_response = requests.post(
-                        "https://api.fashn.ai/v1/run",
-                        json={
-                            'model_image': model_uri,
-                            'garment_image': garment_uri,
-                            'category': category,
-                            'mode': mode,
-                            'moderation_level': moderation_level,
-                            'segmentation_free': str(segmentation_free_bool).lower()
-                        },
-                        headers={
-                            "Authorization": f"Bearer {settings.FASHN_API_KEY}"
-                        },
-                        timeout=30
-                    )
-            
             # Process the response
             logger.info(f"FASHN API response status: {fashn_response.status_code}")
             logger.info(f"FASHN API response headers: {fashn_response.headers}")
@@ -398,50 +443,64 @@ async def start_virtual_try_on(
             
             # Parse successful response
             result = fashn_response.json()
+            refund_on_error = False
             
             # Save prediction details to database for status checking
-            predictions_collection = db[settings.DB_NAME]["tryon_predictions"]
+            created_at = datetime.utcnow()
             await predictions_collection.insert_one({
+                "id": result["id"],
                 "prediction_id": result["id"],
                 "user_id": user_id,
-                "created_at": datetime.utcnow(),
+                "cache_key": cache_key,
+                "created_at": created_at,
                 "status": result["status"],
+                "eta": result.get("eta"),
+                "next_poll_at": initial_poll_time(created_at, result.get("eta")),
                 "request_data": {
                     "category": category,
                     "mode": mode,
                     "moderation_level": moderation_level,
-                    "segmentation_free": segmentation_free
+                    "segmentation_free": segmentation_free,
+                    "garment_url": garment_source_url
                 }
             })
             
-            return {
+            return await idempotency.complete({
                 "id": result["id"],
                 "status": result["status"],
                 "eta": result.get("eta"),
                 "result_url": result.get("output")
-            }
+            })
             
+        except (FashnQueueFullError, CircuitOpenError):
+            raise
         except Exception as e:
             logger.error(f"Error calling FASHN API: {str(e)}", exc_info=True)
             raise HTTPException(status_code=500, detail=f"Error processing virtual try-on request: {str(e)}")
     
-    except HTTPException:
-        raise
     except Exception as e:
+        await idempotency.abandon()
+        if refund_on_error:
+            # The try-on never started, so don't count it against the user
+            await quota_cache.release(db[settings.DB_NAME]["tryon_usage"], {"user_id": user_id})
+        if isinstance(e, HTTPException):
+            raise
         logger.error(f"Error in virtual try-on: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing virtual try-on request: {str(e)}")
 
 @tryon_router.get("/status/{prediction_id}", response_model=TryOnResponse)
 async def check_try_on_status(
     prediction_id: str,
+    response: Response,
+    wait: int = Query(0, ge=0, le=60, description="Seconds to hold the request until the try-on completes or fails"),
     user_id: str = Depends(get_user_id),
     db = Depends(get_database)
 ):
-    """Check the status of a try-on prediction"""
+    """Check the status of a try-on prediction, optionally long-polling until it finishes"""
     try:
         # First, check if we have the prediction in our database
-        predictions_collection = db[settings.DB_NAME]["tryon_predictions"]
-        prediction = await predictions_collection.find_one({"id": prediction_id})
+        predictions_collection = get_predictions_collection(db)
+        prediction = await predictions_collection.find_one({"id": prediction_id}, PREDICTION_STATUS_PROJECTION)
         
         if not prediction:
             raise HTTPException(
@@ -456,107 +515,11 @@ async def check_try_on_status(
                 detail="You do not have permission to access this prediction"
             )
             
-        # If the prediction is already completed or failed, return from our database
-        if prediction.get("status") in ["completed", "failed"]:
-            return {
-                "id": prediction_id,
-                "status": prediction.get("status"),
-                "result_url": prediction.get("result_url"),
-                "error": prediction.get("error")
-            }
-            
-        # Otherwise, check the status from the FASHN API using requests library
-        try:
-            import requests
-            
-            logger.info(f"Checking status from FASHN API for prediction: {prediction_id}")
-            
-            response = requests.get(
-                f"https://api.fashn.ai/v1/status/{prediction_id}",
-                headers={
-                    "Authorization": f"Bearer {settings.FASHN_API_KEY}"
-                },
-                timeout=15
-            )
-            
-            # Log the raw response for debugging
-            logger.info(f"FASHN API status response: {response.status_code}, {response.text[:200]}...")
-            
-            if response.status_code != 200:
-                logger.error(f"FASHN API status check error: {response.status_code}, {response.text}")
-                # If we can't check status, don't fail - just return the stored status
-                return {
-                    "id": prediction_id,
-                    "status": prediction.get("status", "pending"),
-                    "eta": prediction.get("eta", 10)
-                }
-        
-            # Parse the response
-            result = response.json()
-            
-        except Exception as e:
-            logger.error(f"Error making request to FASHN API: {str(e)}")
-            # Return the last known status if API request fails
-            return {
-                "id": prediction_id,
-                "status": prediction.get("status", "pending"),
-                "eta": prediction.get("eta", 10)
-            }
-            
-        # Get status from the response
-        status = result.get("status", "pending")
-        
-        # Handle error object - convert to string if it's an object
-        error = result.get("error")
-        if error:
-            if isinstance(error, dict):
-                error_msg = error.get("message", "Unknown error")
-                if "name" in error:
-                    error_msg = f"{error['name']}: {error_msg}"
-                error = error_msg
-            # Ensure error is a string
-            error = str(error)
-        
-        # Get the result URL
-        result_url = None
-        if status == "completed":
-            result_url = result.get("output")
-            if not result_url:
-                logger.warning(f"Completed status but no output URL provided: {result}")
-            # Log the result URL
-            logger.info(f"Result URL from FASHN API: {result_url}")
-        
-        # Update our database with the latest status
-        update_data = {
-            "status": status,
-            "updated_at": datetime.utcnow()
-        }
-        
-        if status == "completed" and result_url:
-            update_data["result_url"] = result_url
-        elif status == "failed" and error:
-            update_data["error"] = error
-            
-        # Update the database (use try/except to prevent DB errors from breaking status check)
-        try:
-            await predictions_collection.update_one(
-                {"id": prediction_id},
-                {"$set": update_data}
-            )
-        except Exception as db_error:
-            logger.error(f"Error updating prediction in database: {str(db_error)}")
-        
-        # Create the response object
-        response_data = {
-            "id": prediction_id,
-            "status": status,
-            "result_url": result_url,
-            "error": error if status == "failed" else None,
-            "eta": result.get("eta")
-        }
-        
-        logger.info(f"Returning status response: {response_data}")
-        return response_data
+        # The status poller keeps the stored document current, so no FASHN call is needed
+        if wait:
+            prediction = await wait_for_terminal_status(predictions_collection, prediction_id, prediction, wait)
+        set_retry_after(response, [prediction])
+        return prediction_status_response(prediction_id, prediction)
         
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -568,331 +531,403 @@ async def check_try_on_status(
             detail=f"Failed to check try-on status: {str(e)}"
         )
 
-@tryon_router.get("/usage", response_model=TryOnUsageResponse)
-async def get_try_on_usage(
+def get_batches_collection(db):
+    """Return the collection recording batch try-on submissions"""
+    return db[settings.DB_NAME]["tryon_batches"]
+
+async def submit_batch_item(model_input: str, garment_url: str, options: Dict[str, Any], premium: bool) -> Dict[str, Any]:
+    """Start one FASHN run of a batch and return its parsed response"""
+    fashn_response = await submit_prediction(model_input, garment_url, options, premium=premium)
+    if fashn_response.status_code != 200:
+        logger.error(f"FASHN API error: {fashn_response.status_code}, {fashn_response.text}")
+        raise HTTPException(status_code=500, detail=fashn_error_detail(fashn_response))
+    return fashn_response.json()
+
+@tryon_router.post("/batch", response_model=BatchTryOnResponse)
+async def start_batch_try_on(
+    model_image: Optional[UploadFile] = File(None),
+    model_photo_id: Optional[str] = Form(None),
+    # Catalog garments to try on; repeat the field once per garment
+    garment_urls: List[str] = Form([]),
+    product_ids: List[str] = Form([]),
+    category: str = Form("auto"),
+    mode: str = Form("balanced"),
+    moderation_level: str = Form("permissive"),
+    segmentation_free: str = Form("false"),
     user_id: str = Depends(get_user_id),
     db = Depends(get_database)
 ):
-    """Get the user's virtual try-on usage statistics"""
+    """
+    Try one model photo on several catalog garments at once.
+
+    Garments already tried on with this photo are answered from the result
+    cache. The rest are charged together, so either every new try-on fits
+    in the user's limits or none is started, and are then submitted to
+    FASHN concurrently under the per-worker run cap. Try-ons that FASHN
+    refuses are given back. Poll /batch/{batch_id} for progress.
+    """
+    # Set to the number of try-ons charged, cleared once they are accounted for
+    charged = 0
+    
     try:
-        # Get user data to check if they're premium
-        users_collection = db[settings.DB_NAME]["users"]
-        user = await users_collection.find_one({"_id": user_id})
-        is_premium = user.get("isPremium", False) if user else False
-        
-        # Set limits based on user type
-        if is_premium:
-            daily_limit = float('inf')   # no daily limit for subscribers
-            monthly_limit = 30          # subscribers get 30 per month
-        else:
-            daily_limit = 1             # free users get 1 per day
-            monthly_limit = float('inf') # no monthly limit for free users
-        
-        # Get usage data
-        usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"user_id": user_id})
-        
-        if not usage:
-            # No usage record yet
-            # Handle potential float('inf') for Pydantic model
-            safe_daily_limit = daily_limit if daily_limit != float('inf') else 999999
-            safe_monthly_limit = monthly_limit if monthly_limit != float('inf') else 999999
-            return {
-                "daily_count": 0,
-                "monthly_count": 0,
-                "total_count": 0,
-                "daily_limit": safe_daily_limit,
-                "monthly_limit": safe_monthly_limit
-            }
+        garments = [{"garment_url": url} for url in garment_urls if url] + \
+                   [{"product_id": product_id} for product_id in product_ids if product_id]
+        if not garments:
+            raise HTTPException(status_code=400, detail="At least one garment_urls or product_ids entry is required")
+        if len(garments) > settings.TRYON_BATCH_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"A batch can hold at most {settings.TRYON_BATCH_MAX_ITEMS} garments")
+        
+        model_data = await read_model_image(db, model_image, model_photo_id, user_id=user_id)
+        
+        image_urls = await asyncio.gather(*(
+            find_catalog_image_url(product_id=garment.get("product_id"), image_url=garment.get("garment_url"))
+            for garment in garments
+        ))
+        
+        # Answer repeats from the result cache; only the rest are charged and sent to FASHN
+        predictions_collection = get_predictions_collection(db)
+        items = []
+        for index, (garment, image_url) in enumerate(zip(garments, image_urls)):
+            item = {"index": index, "garment_url": image_url, "product_id": garment.get("product_id")}
+            if not image_url:
+                item.update({"status": "failed", "error": "Garment is not in the product catalog"})
+            else:
+                item["cache_key"] = compute_tryon_cache_key(
+                    f"user:{user_id}", model_data, image_url.encode("utf-8"), category, mode, segmentation_free
+                )
+                cached = await lookup_cached_result(predictions_collection, item["cache_key"])
+                if cached:
+                    item.update({
+                        "id": cached["id"],
+                        "status": "completed",
+                        "result_url": cached["result_url"],
+                        "thumbnail_url": cached["thumbnail_url"]
+                    })
+            items.append(item)
+        pending = [item for item in items if "status" not in item]
+        
+        results = []
+        if pending:
+            users_collection = db[settings.DB_NAME]["users"]
+            user = await users_collection.find_one({"_id": user_id})
+            is_premium = user.get("isPremium", False) if user else False
+            
+            # Charge the whole batch in one atomic step
+            quota = await track_tryon_usage(user_id, is_premium, db, count=len(pending))
+            if not quota["consumed"]:
+                raise_for_user_limit(quota)
+            charged = len(pending)
+            
+            if not settings.FASHN_API_KEY:
+                raise HTTPException(
+                    status_code=500,
+                    detail="FASHN API key is not configured. Please contact support."
+                )
             
-        # Check if we need to reset the daily count
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        last_reset_daily = usage.get("last_reset_daily", usage.get("last_reset", now))
-        monthly_count = usage.get("monthly_count", 0)
-        
-        # Update schema if old format is found (backward compatibility)
-        if "last_reset_daily" not in usage and "last_reset" in usage:
-            await usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"last_reset_daily": usage["last_reset"]}}
-            )
-        
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            # It's a new day, so reset the count
-            daily_count = 0
-            await usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"daily_count": 0, "last_reset_daily": today}}
-            )
-            # Handle potential float('inf') for Pydantic model
-            safe_daily_limit = daily_limit if daily_limit != float('inf') else 999999
-            safe_monthly_limit = monthly_limit if monthly_limit != float('inf') else 999999
-            return {
-                "daily_count": 0,
-                "monthly_count": monthly_count,
-                "total_count": usage.get("total_count", 0),
-                "daily_limit": safe_daily_limit,
-                "monthly_limit": safe_monthly_limit
+            # Normalize and encode the model photo once for every run in the batch
+            model_bytes, model_mime = await asyncio.to_thread(normalize_image, model_data)
+            model_input = await asyncio.to_thread(convert_to_data_uri, model_bytes, model_mime)
+            options = {
+                'category': category,
+                'mode': mode,
+                'moderation_level': moderation_level,
+                'segmentation_free': segmentation_free
             }
+            results = await asyncio.gather(
+                *(submit_batch_item(model_input, item["garment_url"], options, is_premium) for item in pending),
+                return_exceptions=True
+            )
         
-        # Check if we need to reset the monthly count
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        monthly_count = usage.get("monthly_count", 0)
+        batch_id = uuid.uuid4().hex
+        created_at = datetime.utcnow()
+        prediction_docs = []
+        for item, result in zip(pending, results):
+            if isinstance(result, BaseException):
+                error = result.detail if isinstance(result, HTTPException) else str(result)
+                logger.error(f"Batch {batch_id} item {item['index']} failed to start: {error}")
+                item.update({"status": "failed", "error": error})
+                continue
+            item.update({
+                "id": result["id"],
+                "status": result["status"],
+                "eta": result.get("eta"),
+                "result_url": result.get("output")
+            })
+            prediction_docs.append({
+                "id": result["id"],
+                "prediction_id": result["id"],
+                "user_id": user_id,
+                "batch_id": batch_id,
+                "cache_key": item["cache_key"],
+                "created_at": created_at,
+                "status": result["status"],
+                "eta": result.get("eta"),
+                "next_poll_at": initial_poll_time(created_at, result.get("eta")),
+                "request_data": {
+                    "category": category,
+                    "mode": mode,
+                    "moderation_level": moderation_level,
+                    "segmentation_free": segmentation_free,
+                    "garment_url": item["garment_url"]
+                }
+            })
         
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            # It's a new month, so reset the count
-            monthly_count = 0
-            await usage_collection.update_one(
-                {"user_id": user_id},
-                {"$set": {"monthly_count": 0, "last_reset_monthly": first_of_month}}
-            )
-            
-        # Handle potential float('inf') for Pydantic model
-        safe_daily_limit = daily_limit if daily_limit != float('inf') else 999999
-        safe_monthly_limit = monthly_limit if monthly_limit != float('inf') else 999999
-        return {
-            "daily_count": usage.get("daily_count", 0),
-            "monthly_count": monthly_count,
-            "total_count": usage.get("total_count", 0),
-            "daily_limit": safe_daily_limit,
-            "monthly_limit": safe_monthly_limit
-        }
+        # Give back the try-ons that never started
+        refunds = sum(1 for item in pending if item["status"] == "failed")
+        charged = 0
+        if refunds:
+            await quota_cache.release(db[settings.DB_NAME]["tryon_usage"], {"user_id": user_id}, count=refunds)
+        
+        if prediction_docs:
+            await predictions_collection.insert_many(prediction_docs)
+        
+        for item in items:
+            item.pop("cache_key", None)
+        await get_batches_collection(db).insert_one({
+            "_id": batch_id,
+            "user_id": user_id,
+            "created_at": created_at,
+            "items": items
+        })
         
+        return {"batch_id": batch_id, "items": items}
+    
     except Exception as e:
-        logger.error(f"Error getting try-on usage: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to get try-on usage: {str(e)}"
-        )
+        if charged:
+            await quota_cache.release(db[settings.DB_NAME]["tryon_usage"], {"user_id": user_id}, count=charged)
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Error in batch try-on: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error processing batch try-on request: {str(e)}")
 
-@tryon_router.post("/device-usage", response_model=TryOnUsageResponse)
-async def track_device_try_on_usage(
-    device_data: DeviceBasedRequest,
+@tryon_router.get("/batch/{batch_id}", response_model=BatchTryOnResponse)
+async def check_batch_status(
+    batch_id: str,
+    response: Response,
+    user_id: str = Depends(get_user_id),
     db = Depends(get_database)
 ):
-    """Track and get try-on usage for a specific device without requiring authentication"""
+    """Check every try-on of a batch with one predictions query"""
     try:
-        # Get device information
-        device_id = device_data.device_id
-        check_only = device_data.check_only
-        is_subscribed = device_data.is_subscribed
+        batch = await get_batches_collection(db).find_one({"_id": batch_id})
+        if not batch:
+            raise HTTPException(status_code=404, detail="Batch not found")
+        if batch.get("user_id") != user_id:
+            raise HTTPException(status_code=403, detail="You do not have permission to access this batch")
+        
+        items = batch.get("items", [])
+        prediction_ids = [item["id"] for item in items if item.get("id") and item.get("status") not in TERMINAL_STATUSES]
+        predictions = {}
+        if prediction_ids:
+            cursor = get_predictions_collection(db).find({"id": {"$in": prediction_ids}}, PREDICTION_STATUS_PROJECTION)
+            predictions = {prediction["id"]: prediction async for prediction in cursor}
+        
+        for item in items:
+            prediction = predictions.get(item.get("id"))
+            if prediction:
+                item.update({
+                    key: value
+                    for key, value in prediction_status_response(item["id"], prediction).items()
+                    if key != "id"
+                })
+        set_retry_after(response, list(predictions.values()))
+        
+        return {"batch_id": batch_id, "items": items}
         
-        logger.info(f"Tracking try-on usage for device: {device_id}, check_only: {check_only}, is_subscribed: {is_subscribed}")
-        
-        # Get usage data
-        usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
-        
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # If no usage record exists, create a new one
-        if not usage:
-            logger.info(f"No usage record found for device {device_id} - creating new record")
-            
-            # For check_only mode, don't create a record yet
-            if check_only:
-                logger.info("Check-only mode - not creating record")
-                return {
-                    "daily_count": 0,
-                    "monthly_count": 0,
-                    "total_count": 0,
-                    "daily_limit": 1 if not is_subscribed else float('inf'),
-                    "monthly_limit": 40,  # Same monthly cap (40) for everyone
-                    "counts": {
-                        "daily_count": 0,
-                        "monthly_count": 0,
-                        "total_count": 0
-                    }
-                }
-            
-            # Create a new usage record with counts of 1
-            new_usage = {
-                "device_id": device_id,
-                "user_id": None,  # Anonymous user
-                "daily_count": 1,
-                "monthly_count": 1,
-                "total_count": 1,
-                "last_reset_daily": today,
-                "last_reset_monthly": first_of_month,
-                "last_used": now,
-                "app_version": device_data.app_version,
-                "device_model": device_data.device_model,
-                "os_version": device_data.os_version
-            }
-            await usage_collection.insert_one(new_usage)
-            logger.info(f"Created new usage record with counts of 1 for device {device_id}")
-            
-            # Set daily limit based on subscription status
-            daily_limit = 1 if not is_subscribed else float('inf')
-            monthly_limit = 40  # Same monthly cap (40) for everyone
-            
-            return {
-                "daily_count": 1,
-                "monthly_count": 1,
-                "total_count": 1,
-                "daily_limit": daily_limit,
-                "monthly_limit": monthly_limit,
-                "counts": {
-                    "daily_count": 1,
-                    "monthly_count": 1,
-                    "total_count": 1
-                }
-            }
-            
-        # Get current counts and check if we need to reset based on date
-        daily_count = usage.get("daily_count", 0)
-        monthly_count = usage.get("monthly_count", 0)
-        total_count = usage.get("total_count", 0)
-        
-        # Check if we need to reset daily count (new day)
-        last_reset_daily = usage.get("last_reset_daily", today)
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            logger.info(f"Resetting daily count for device {device_id} (new day)")
-            daily_count = 0
-            await usage_collection.update_one(
-                {"device_id": device_id},
-                {"$set": {"daily_count": 0, "last_reset_daily": today}}
-            )
-        
-        # Check if we need to reset monthly count (new month)
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            logger.info(f"Resetting monthly count for device {device_id} (new month)")
-            monthly_count = 0
-            await usage_collection.update_one(
-                {"device_id": device_id},
-                {"$set": {"monthly_count": 0, "last_reset_monthly": first_of_month}}
-            )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error checking batch status: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to check batch status: {str(e)}")
+
+# Only the fields a history entry shows
+HISTORY_PROJECTION = {"_id": 0, "id": 1, "prediction_id": 1, "status": 1, "created_at": 1, "result_url": 1, "output_urls": 1}
+
+def history_prediction_id(prediction: Dict[str, Any]) -> str:
+    # Old /try-async records have prediction_id only until ensure_indexes backfills id
+    return prediction.get("id") or prediction.get("prediction_id")
+
+def encode_history_cursor(prediction: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just past this prediction in history order"""
+    raw = f"{prediction['created_at'].isoformat()}|{history_prediction_id(prediction)}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_history_cursor(cursor: str) -> Dict[str, Any]:
+    """Query filter for the page after the cursor's prediction"""
+    try:
+        created_at, prediction_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        created_at = datetime.fromisoformat(created_at)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+    # created_at alone is not unique (a batch shares one), so ties are broken by id
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": prediction_id}}
+    ]}
+
+@tryon_router.get("/history", response_model=TryOnHistoryResponse)
+async def get_try_on_history(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_user_id),
+    db = Depends(get_database)
+):
+    """
+    List the caller's try-ons, newest first.
+
+    Pages are read by keyset on (user_id, created_at, id), which the
+    compound index covers, so every page costs the same however deep it is.
+    """
+    try:
+        query = {"user_id": user_id}
+        if cursor:
+            query.update(decode_history_cursor(cursor))
+        
+        predictions = await get_predictions_collection(db).find(
+            query,
+            HISTORY_PROJECTION,
+            sort=[("created_at", -1), ("id", -1)],
+            limit=limit + 1
+        ).to_list(length=limit + 1)
+        
+        items = []
+        for prediction in predictions[:limit]:
+            output_urls = prediction.get("output_urls") or {}
+            completed = prediction.get("status") == "completed"
+            items.append({
+                "id": history_prediction_id(prediction),
+                "status": prediction.get("status", "pending"),
+                "created_at": prediction["created_at"],
+                "result_url": (output_urls.get("full") or prediction.get("result_url")) if completed else None,
+                "thumbnail_url": output_urls.get("thumbnail") if completed else None
+            })
         
-        # Set limits based on subscription status
-        daily_limit = 1 if not is_subscribed else float('inf')
-        monthly_limit = 40  # Same monthly cap (40) for everyone
+        next_cursor = encode_history_cursor(predictions[limit - 1]) if len(predictions) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
         
-        # CRITICAL CHECKS: If check_only is true, just return the current counts without incrementing
-        if check_only:
-            logger.info(f"Check-only mode - returning current counts without incrementing: daily={daily_count}/{daily_limit}, monthly={monthly_count}/{monthly_limit}")
-            return {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": total_count,
-                "daily_limit": daily_limit,
-                "monthly_limit": monthly_limit,
-                "counts": {
-                    "daily_count": daily_count,
-                    "monthly_count": monthly_count,
-                    "total_count": total_count
-                }
-            }
-            
-        # Now we need to check limits and possibly increment
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing try-on history: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Failed to list try-on history: {str(e)}")
+
+@tryon_router.get("/outputs/{prediction_id}/{filename}")
+async def get_try_on_output(prediction_id: str, filename: str):
+    """Serve a try-on output mirrored to local storage, cacheable for a year"""
+    path = local_output_path(prediction_id, filename)
+    if path is None or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Try-on output not found")
+    return FileResponse(path, headers={"Cache-Control": output_cache_control()})
+
+@tryon_router.get("/usage", response_model=TryOnUsageResponse)
+async def get_try_on_usage(
+    user_id: str = Depends(get_user_id),
+    db = Depends(get_database)
+):
+    """Get the user's virtual try-on usage statistics"""
+    try:
+        # Get user data to check if they're premium
+        users_collection = db[settings.DB_NAME]["users"]
+        user = await users_collection.find_one({"_id": user_id})
+        is_premium = user.get("isPremium", False) if user else False
         
-        # First check if they've reached the monthly limit (for both free and pro)
-        if is_subscribed and monthly_count >= monthly_limit:
-            logger.warning(f"Device {device_id} has reached monthly limit: {monthly_count}/{monthly_limit}")
-            return {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": total_count,
-                "daily_limit": daily_limit,
-                "monthly_limit": monthly_limit,
-                "counts": {
-                    "daily_count": daily_count,
-                    "monthly_count": monthly_count,
-                    "total_count": total_count
-                },
-                "error": "MONTHLY_LIMIT_REACHED",
-                "message": "You've reached your monthly limit. Try again next month!"
-            }
-            
-        # Then check daily limit (only for free users)
-        if not is_subscribed and daily_count >= daily_limit:
-            logger.warning(f"Free user device {device_id} has reached daily limit: {daily_count}/{daily_limit}")
-            return {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": total_count,
-                "daily_limit": daily_limit,
-                "monthly_limit": monthly_limit,
-                "counts": {
-                    "daily_count": daily_count,
-                    "monthly_count": monthly_count,
-                    "total_count": total_count
-                },
-                "error": "DAILY_LIMIT_REACHED",
-                "message": "Upgrade to PRO for unlimited daily try-ons!"
-            }
-            
-        # If we get here, we can increment the counts
-        logger.info(f"Incrementing usage counts for device {device_id}")
-        update_fields = {"last_used": now}
-        increment_fields = {
-            "daily_count": 1,
-            "monthly_count": 1,
-            "total_count": 1
-        }
+        # Get usage data, with the daily/monthly resets applied
+        daily_limit, monthly_limit = user_limits(is_premium)
+        usage_collection = db[settings.DB_NAME]["tryon_usage"]
+        quota = await quota_cache.read(usage_collection, {"user_id": user_id}, daily_limit, monthly_limit)
         
-        # Update device info if provided
-        if device_data.app_version:
-            update_fields["app_version"] = device_data.app_version
-        if device_data.device_model:
-            update_fields["device_model"] = device_data.device_model
-        if device_data.os_version:
-            update_fields["os_version"] = device_data.os_version
-            
-        # Update the record
-        await usage_collection.update_one(
-            {"device_id": device_id},
-            {
-                "$set": update_fields,
-                "$inc": increment_fields
-            }
+        # Uncapped periods are reported as 999999 for the Pydantic model
+        return {
+            "daily_count": quota["daily_count"],
+            "monthly_count": quota["monthly_count"],
+            "total_count": quota["total_count"],
+            "daily_limit": daily_limit if daily_limit is not None else 999999,
+            "monthly_limit": monthly_limit if monthly_limit is not None else 999999
+        }
+        
+    except Exception as e:
+        logger.error(f"Error getting try-on usage: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to get try-on usage: {str(e)}"
         )
+
+@tryon_router.post("/device-usage", response_model=TryOnUsageResponse)
+async def track_device_try_on_usage(
+    device_data: DeviceBasedRequest,
+    db = Depends(get_database)
+):
+    """Track and get try-on usage for a specific device without requiring authentication"""
+    try:
+        # Get device information
+        device_id = device_data.device_id
+        check_only = device_data.check_only
+        is_subscribed = device_data.is_subscribed
         
-        # Get the updated record to return accurate counts
-        updated_usage = await usage_collection.find_one({"device_id": device_id})
-        if updated_usage:
-            updated_daily = updated_usage.get("daily_count", daily_count + 1)
-            updated_monthly = updated_usage.get("monthly_count", monthly_count + 1)
-            updated_total = updated_usage.get("total_count", total_count + 1)
-            
-            logger.info(f"Updated counts for device {device_id}: daily={updated_daily}/{daily_limit}, monthly={updated_monthly}/{monthly_limit}")
-            
-            return {
-                "daily_count": updated_daily,
-                "monthly_count": updated_monthly,
-                "total_count": updated_total,
-                "daily_limit": daily_limit,
-                "monthly_limit": monthly_limit,
-                "counts": {
-                    "daily_count": updated_daily,
-                    "monthly_count": updated_monthly,
-                    "total_count": updated_total
-                }
-            }
+        logger.info(f"Tracking try-on usage for device: {device_id}, check_only: {check_only}, is_subscribed: {is_subscribed}")
+        
+        usage_collection = db[settings.DB_NAME]["tryon_usage"]
+        enforced_daily_limit, enforced_monthly_limit = device_limits(is_subscribed)
+        
+        # Reported limits: free devices get 1 per day, everyone shares the monthly cap
+        daily_limit = 1 if not is_subscribed else float('inf')
+        monthly_limit = DEVICE_MONTHLY_LIMIT
         
-        # Fallback if we couldn't get the updated record
-        incremented_daily = daily_count + 1
-        incremented_monthly = monthly_count + 1 
-        incremented_total = total_count + 1
+        if check_only:
+            # Just return the current counts without incrementing or creating a record
+            quota = await quota_cache.read(
+                usage_collection, {"device_id": device_id}, enforced_daily_limit, enforced_monthly_limit
+            )
+            daily_count, monthly_count, total_count = quota["daily_count"], quota["monthly_count"], quota["total_count"]
+            logger.info(f"Check-only mode - returning current counts without incrementing: daily={daily_count}/{daily_limit}, monthly={monthly_count}/{monthly_limit}")
+        else:
+            # Reset, check and increment in one round trip; the record is created on first use
+            device_info = {"user_id": None}  # Anonymous user
+            if device_data.app_version:
+                device_info["app_version"] = device_data.app_version
+            if device_data.device_model:
+                device_info["device_model"] = device_data.device_model
+            if device_data.os_version:
+                device_info["os_version"] = device_data.os_version
             
-        return {
-            "daily_count": incremented_daily,
-            "monthly_count": incremented_monthly,
-            "total_count": incremented_total,
+            quota = await quota_cache.charge(
+                usage_collection,
+                {"device_id": device_id},
+                enforced_daily_limit,
+                enforced_monthly_limit,
+                fields=device_info
+            )
+            charged = 1 if quota["consumed"] else 0
+            daily_count = quota["daily_count"] + charged
+            monthly_count = quota["monthly_count"] + charged
+            total_count = quota["total_count"] + charged
+        
+        response = {
+            "daily_count": daily_count,
+            "monthly_count": monthly_count,
+            "total_count": total_count,
             "daily_limit": daily_limit,
             "monthly_limit": monthly_limit,
             "counts": {
-                "daily_count": incremented_daily,
-                "monthly_count": incremented_monthly,
-                "total_count": incremented_total
+                "daily_count": daily_count,
+                "monthly_count": monthly_count,
+                "total_count": total_count
             }
         }
         
+        if check_only or quota["consumed"]:
+            return response
+        
+        if quota["reason"] == "MONTHLY_LIMIT_REACHED":
+            logger.warning(f"Device {device_id} has reached monthly limit: {monthly_count}/{monthly_limit}")
+            response["error"] = "MONTHLY_LIMIT_REACHED"
+            response["message"] = "You've reached your monthly limit. Try again next month!"
+        else:
+            logger.warning(f"Free user device {device_id} has reached daily limit: {daily_count}/{daily_limit}")
+            response["error"] = "DAILY_LIMIT_REACHED"
+            response["message"] = "Upgrade to PRO for unlimited daily try-ons!"
+        return response
+        
     except Exception as e:
         logger.error(f"Error tracking device try-on usage: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -905,66 +940,27 @@ async def check_device_tryon_limits(device_id: str, is_subscribed: bool, db=None
     """Check if a device has reached its monthly try-on limit directly from the database"""
     try:
         if db is None:
-            db = await get_database()
+            db = get_database()
             
         logger.info(f"CRITICAL DATABASE CHECK: Checking try-on limits for device: {device_id}")
         
-        # Get usage data directly from database
+        # Read the counts with any daily/monthly reset applied, without writing
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
-        
-        # If there's no usage record, this is their first try-on - let them try!
-        if not usage:
-            logger.info(f"No usage record found for device {device_id} - allowing first try")
-            daily_limit = 1 if not is_subscribed else float('inf')
-            monthly_limit = 40  # Same monthly cap (40) for everyone
-            return True, daily_limit, monthly_limit, 0, 0, None
-            
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Check if we need to reset the daily count
-        last_reset_daily = usage.get("last_reset_daily", usage.get("last_reset", now))
-        daily_count = usage.get("daily_count", 0)
-        
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            # It's a new day, so reset the count
-            daily_count = 0
-            await usage_collection.update_one(
-                {"device_id": device_id},
-                {"$set": {"daily_count": 0, "last_reset_daily": today}}
-            )
-            
-        # Check if we need to reset the monthly count    
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        monthly_count = usage.get("monthly_count", 0)
-        
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            # It's a new month, so reset the count
-            monthly_count = 0
-            await usage_collection.update_one(
-                {"device_id": device_id},
-                {"$set": {"monthly_count": 0, "last_reset_monthly": first_of_month}}
-            )
+        enforced_daily_limit, enforced_monthly_limit = device_limits(is_subscribed)
+        quota = await quota_cache.read(
+            usage_collection, {"device_id": device_id}, enforced_daily_limit, enforced_monthly_limit
+        )
         
         # Set limits based on subscription status
         daily_limit = 1 if not is_subscribed else float('inf')
-        monthly_limit = 40  # Same monthly cap (40) for everyone
+        monthly_limit = DEVICE_MONTHLY_LIMIT  # Same monthly cap (40) for everyone
+        daily_count, monthly_count = quota["daily_count"], quota["monthly_count"]
         
         logger.info(f"Device {device_id} usage: daily={daily_count}/{daily_limit}, monthly={monthly_count}/{monthly_limit}")
+        if quota["reason"]:
+            logger.warning(f"Device {device_id} has reached a try-on limit: {quota['reason']}")
         
-        # Check if they've reached their daily limit (only for free users)
-        if not is_subscribed and daily_count >= daily_limit:
-            logger.warning(f"Device {device_id} has reached daily limit: {daily_count}/{daily_limit}")
-            return False, daily_limit, monthly_limit, daily_count, monthly_count, "DAILY_LIMIT_REACHED"
-            
-        # CRITICAL CHECK: Check if they've reached their monthly limit (for all users)
-        if is_subscribed and monthly_count >= monthly_limit:
-            logger.warning(f"Device {device_id} has reached monthly limit: {monthly_count}/{monthly_limit}")
-            return False, daily_limit, monthly_limit, daily_count, monthly_count, "MONTHLY_LIMIT_REACHED"
-            
-        return True, daily_limit, monthly_limit, daily_count, monthly_count, None
+        return quota["allowed"], daily_limit, monthly_limit, daily_count, monthly_count, quota["reason"]
         
     except Exception as e:
         logger.error(f"Error checking device try-on limit: {str(e)}", exc_info=True)
@@ -977,37 +973,15 @@ async def check_device_usage(device_id: str, db = Depends(get_database)):
     try:
         logger.info(f"Direct usage check for device: {device_id}")
         
-        # Get usage data directly from database
+        # Served from the per-worker usage cache, with resets applied
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
-        
-        if not usage:
-            return {"counts": {"daily_count": 0, "monthly_count": 0, "total_count": 0}}
-        
-        # Check if counts need to be reset
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        daily_count = usage.get("daily_count", 0)
-        monthly_count = usage.get("monthly_count", 0)
-        total_count = usage.get("total_count", 0)
-        
-        # Check if daily count needs reset
-        last_reset_daily = usage.get("last_reset_daily", usage.get("last_reset", now))
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            daily_count = 0
-        
-        # Check if monthly count needs reset
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            monthly_count = 0
+        quota = await quota_cache.read(usage_collection, {"device_id": device_id}, None, None)
         
         return {
             "counts": {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": total_count
+                "daily_count": quota["daily_count"],
+                "monthly_count": quota["monthly_count"],
+                "total_count": quota["total_count"]
             }
         }
     except Exception as e:
@@ -1019,69 +993,29 @@ async def check_device_usage(device_id: str, db = Depends(get_database)):
 async def check_device_usage(device_id: str, force_db: bool = False, db = Depends(get_database)):
     """Check a device's virtual try-on usage from the database"""
     try:
-        # Get usage data directly from database
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
+        owner = {"device_id": device_id}
         
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        # force_db skips the per-worker usage cache and re-reads the record
+        if force_db:
+            quota_cache.invalidate(usage_collection, owner)
+        quota = await quota_cache.read(usage_collection, owner, None, None)
         
-        if not usage:
+        if not quota["exists"]:
             # No usage record yet - this is a new user
             logger.info(f"No usage record for device {device_id} - new user")
-            return {
-                "daily_count": 0,
-                "monthly_count": 0,
-                "total_count": 0,
-                "daily_limit": 1,  # Default for free users
-                "monthly_limit": 40,  # Default for free users
-                "counts": {
-                    "daily_count": 0,
-                    "monthly_count": 0,
-                    "total_count": 0
-                }
-            }
-            
-        # Check if we need to reset the daily/monthly counts
-        last_reset_daily = usage.get("last_reset_daily", today)
-        daily_count = usage.get("daily_count", 0)
-        
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            # It's a new day, so the daily count should be reset
-            daily_count = 0
-            # Only update the database if force_db is true
-            if force_db:
-                await usage_collection.update_one(
-                    {"device_id": device_id},
-                    {"$set": {"daily_count": 0, "last_reset_daily": today}}
-                )
-            
-        # Check monthly reset
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        monthly_count = usage.get("monthly_count", 0)
-        
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            # It's a new month, so the monthly count should be reset
-            monthly_count = 0
-            # Only update the database if force_db is true
-            if force_db:
-                await usage_collection.update_one(
-                    {"device_id": device_id},
-                    {"$set": {"monthly_count": 0, "last_reset_monthly": first_of_month}}
-                )
             
         # Include both the root level counts and nested counts that frontend expects
         return {
-            "daily_count": daily_count,
-            "monthly_count": monthly_count,
-            "total_count": usage.get("total_count", 0),
+            "daily_count": quota["daily_count"],
+            "monthly_count": quota["monthly_count"],
+            "total_count": quota["total_count"],
             "daily_limit": 1,  # Default for free users
-            "monthly_limit": 40,  # Default for free users
+            "monthly_limit": DEVICE_MONTHLY_LIMIT,
             "counts": {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": usage.get("total_count", 0)
+                "daily_count": quota["daily_count"],
+                "monthly_count": quota["monthly_count"],
+                "total_count": quota["total_count"]
             }
         }
         
@@ -1095,8 +1029,13 @@ async def check_device_usage(device_id: str, force_db: bool = False, db = Depend
 @tryon_router.post("/test", response_model=TryOnResponse)
 async def test_virtual_try_on(
     request: Request,
-    model_image: UploadFile = File(...),
-    garment_image: UploadFile = File(...),
+    model_image: Optional[UploadFile] = File(None),
+    garment_image: Optional[UploadFile] = File(None),
+    # Handle from /device-model-photo, used instead of uploading model_image again
+    model_photo_id: Optional[str] = Form(None),
+    # Catalog garment, used instead of uploading garment_image
+    garment_url: Optional[str] = Form(None),
+    product_id: Optional[str] = Form(None),
     category: str = Form("auto"),
     mode: str = Form("balanced"),
     moderation_level: str = Form("permissive"),
@@ -1109,6 +1048,11 @@ async def test_virtual_try_on(
 ):
     """Test endpoint for virtual try-on that doesn't require authentication"""
     
+    # Set once the try-on is charged and cleared again once FASHN accepts it
+    refund_on_error = False
+    usage_owner = None
+    idempotency = IdempotentRequest()
+    
     try:
         # Extract device ID from multiple sources
         device_id_value = device_id  # First priority: explicit form parameter
@@ -1133,197 +1077,121 @@ async def test_virtual_try_on(
         skip_tracking = skip_usage_tracking.lower() == 'true'
         logger.info(f"Device ID: {device_id_value}, Is Subscribed: {is_subscribed_value}, Skip tracking: {skip_tracking}")
         
+        # Read file contents into memory
+        model_content = await read_model_image(db, model_image, model_photo_id, device_id=device_id_value)
+        garment_source_url = await resolve_garment_url(garment_image, garment_url, product_id)
+        garment_content = garment_source_url.encode("utf-8") if garment_source_url else await read_upload(garment_image)
+        
+        logger.info(f"Read model image: {len(model_content)} bytes")
+        logger.info(f"Garment: {garment_source_url or f'{len(garment_content)} bytes uploaded'}")
+        
+        # Retries with the same Idempotency-Key replay the first response.
+        # Keys are scoped to the device, so anonymous callers can't share one.
+        idempotency_key = request.headers.get("Idempotency-Key")
+        if idempotency_key and not device_id_value:
+            raise HTTPException(status_code=400, detail="Idempotency-Key requires a device ID")
+        idempotency = await begin_idempotent_request(
+            db, f"test:{device_id_value}", idempotency_key,
+            request_fingerprint(model_content, garment_content, category, mode, moderation_level, segmentation_free)
+        )
+        if idempotency.response is not None:
+            return idempotency.response
+        
         # Only check limits if we have a device ID and aren't skipping tracking
         # This allows the front-end to handle usage tracking separately via the device-usage endpoint
         # But we'll keep the option to track it here for backward compatibility
         if device_id_value and not skip_tracking:
-            # Check if the device has reached its limits
-            has_remaining, daily_limit, monthly_limit, daily_count, monthly_count, error = await check_device_tryon_limits(
-                device_id_value, is_subscribed_value, db
+            # Check the device's limits and charge the try-on in one atomic step
+            usage_owner = {"device_id": device_id_value}
+            daily_limit, monthly_limit = device_limits(is_subscribed_value)
+            quota = await quota_cache.charge(
+                db[settings.DB_NAME]["tryon_usage"],
+                usage_owner,
+                daily_limit,
+                monthly_limit,
+                fields={"user_id": None}  # Anonymous user
             )
             
-            if not has_remaining:
-                if error == "MONTHLY_LIMIT_REACHED":
+            if not quota["consumed"]:
+                if quota["reason"] == "MONTHLY_LIMIT_REACHED":
                     raise HTTPException(
                         status_code=429,
                         detail="You've reached your monthly limit. Try again next month!"
                     )
-                elif error == "DAILY_LIMIT_REACHED":
+                else:
                     raise HTTPException(
                         status_code=402,
                         detail="Upgrade to PRO for unlimited daily try-ons!"
                     )
+            refund_on_error = True
                     
-            logger.info(f"Device {device_id_value} usage: daily={daily_count}/{daily_limit}, monthly={monthly_count}/{monthly_limit}")
+            logger.info(f"Device {device_id_value} usage: daily={quota['daily_count'] + 1}/{daily_limit}, monthly={quota['monthly_count'] + 1}/{monthly_limit}")
         
         # Convert boolean string parameters to booleans
         # Removed deprecated parameters cover_feet, adjust_hands
 
-        # Read file contents into memory
-        model_content = await model_image.read()
-        garment_content = await garment_image.read()
+        # Return the earlier result if these exact inputs were already tried on
+        predictions_collection = get_predictions_collection(db)
+        cache_key = compute_tryon_cache_key(f"device:{device_id_value}", model_content, garment_content, category, mode, segmentation_free)
+        # Without a device ID there is no owner to scope the cached result to
+        cached = await lookup_cached_result(predictions_collection, cache_key) if device_id_value else None
+        if cached:
+            # A repeated try-on is served from the cache and not counted
+            if refund_on_error:
+                await quota_cache.release(db[settings.DB_NAME]["tryon_usage"], usage_owner)
+            return await idempotency.complete({
+                "id": cached["id"],
+                "status": "completed",
+                "result_url": cached["result_url"],
+                "thumbnail_url": cached["thumbnail_url"]
+            })
         
-        logger.info(f"Read model image: {len(model_content)} bytes")
-        logger.info(f"Read garment image: {len(garment_content)} bytes")
+        # Downsize and re-encode off the event loop before anything is sent to FASHN.
+        # Catalog garments go to FASHN by URL, so only the model photo is uploaded.
+        model_input = await asyncio.to_thread(normalize_image, model_content)
+        if garment_source_url:
+            garment_input = garment_source_url
+        else:
+            garment_input = await asyncio.to_thread(normalize_image, garment_content)
         
-        # Create temporary files
-        model_temp_path = f"/tmp/model_{time.time()}.jpg"
-        garment_temp_path = f"/tmp/garment_{time.time()}.jpg"
+        # Send the request in the payload format FASHN is known to accept
+        try:
+            fashn_response = await submit_prediction(
+                model_input,
+                garment_input,
+                {
+                    'category': category,
+                    'mode': mode,
+                    'moderation_level': moderation_level,
+                    'segmentation_free': segmentation_free
+                },
+                premium=is_subscribed_value,
+                timeout=60
+            )
+        except (FashnQueueFullError, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.error(f"Error during API request: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Error communicating with try-on service: {str(e)}"
+            )
         
-        # Make sure the /tmp directory exists
-        os.makedirs("/tmp", exist_ok=True)
+        # Debug response
+        logger.info(f"FASHN API response status: {fashn_response.status_code}")
+        logger.info(f"FASHN API response headers: {fashn_response.headers}")
+        logger.info(f"FASHN API response body: {fashn_response.text[:500]}...")
         
-        # Write the files to disk
-        with open(model_temp_path, "wb") as f:
-            f.write(model_content)
+        # Check response
+        if fashn_response.status_code != 200:
+            logger.error(f"FASHN API error: {fashn_response.status_code}, {fashn_response.text}")
+            raise HTTPException(
+                status_code=500,
+                detail=fashn_error_detail(fashn_response)
+            )
         
-        with open(garment_temp_path, "wb") as f:
-            f.write(garment_content)
-            
-        logger.info(f"Saved temporary files to {model_temp_path} and {garment_temp_path}")
-            
-        try:
-            # Use Python's requests library
-            import requests
-            
-            # First attempt: Using files and data parameters
-            with open(model_temp_path, 'rb') as model_file, open(garment_temp_path, 'rb') as garment_file:
-                try:
-                    logger.info("Attempting API call with multipart/form-data approach")
-                    
-                    # First approach: Standard multipart/form-data
-                    files = {
-                        'model_image': ('model.jpg', model_file, 'image/jpeg'),
-                        'garment_image': ('garment.jpg', garment_file, 'image/jpeg')
-                    }
-                    
-                    # Convert boolean string parameters to booleans
-                    segmentation_free_bool = segmentation_free.lower() == "true"
-                    
-                    # Include deprecated parameters for backward compatibility
-                    # but use the new segmentation_free parameter for the actual API call
-                    data = {
-                        'category': category,
-                        'mode': mode,
-                        'moderation_level': moderation_level,
-                        'segmentation_free': str(segmentation_free_bool).lower()
-                    }
-                    
-                    fashn_response = requests.post(
-                        "https://api.fashn.ai/v1/run",
-                        files=files,
-                        data=data,
-                        headers={
-                            "Authorization": f"Bearer {settings.FASHN_API_KEY}"
-                        },
-                        timeout=60
-                    )
-                    
-                    # If first approach fails with 400, try the second approach
-                    if fashn_response.status_code == 400:
-                        logger.info("First approach failed. Trying with JSON payload and base64 encoded images")
-                        
-                        # Reset file positions
-                        model_file.seek(0)
-                        garment_file.seek(0)
-                        
-                        # Read and encode the files as base64
-                        import base64
-                        model_base64 = base64.b64encode(model_file.read()).decode('utf-8')
-                        garment_file.seek(0)
-                        garment_base64 = base64.b64encode(garment_file.read()).decode('utf-8')
-                        
-                        # Create JSON payload - add data URI prefix for base64 images
-                        json_payload = {
-                            'model_image': f"data:image/jpeg;base64,{model_base64}",
-                            'garment_image': f"data:image/jpeg;base64,{garment_base64}",
-                            'category': category,
-                            'mode': mode,
-                            'moderation_level': moderation_level,
-                            'segmentation_free': segmentation_free_bool
-                        }
-                        
-                        # Make the request with JSON payload
-                        fashn_response = requests.post(
-                            "https://api.fashn.ai/v1/run",
-                            json=json_payload,
-                            headers={
-                                "Authorization": f"Bearer {settings.FASHN_API_KEY}",
-                                "Content-Type": "application/json"
-                            },
-                            timeout=60
-                        )
-                        
-                        # If second approach fails, try a third approach with URL parameters
-                        if fashn_response.status_code == 400:
-                            logger.info("Second approach failed. Trying with URL parameters")
-                            
-                            # Prepare multipart for files only
-                            files = {
-                                'model_image': ('model.jpg', open(model_temp_path, 'rb'), 'image/jpeg'),
-                                'garment_image': ('garment.jpg', open(garment_temp_path, 'rb'), 'image/jpeg')
-                            }
-                            
-                            # Add parameters to the URL
-                            params = {
-                                'category': category,
-                                'mode': mode,
-                                'moderation_level': moderation_level,
-                                'segmentation_free': str(segmentation_free_bool).lower()
-                            }
-                            
-                            fashn_response = requests.post(
-                                "https://api.fashn.ai/v1/run",
-                                files=files,
-                                params=params,
-                                headers={
-                                    "Authorization": f"Bearer {settings.FASHN_API_KEY}"
-                                },
-                                timeout=60
-                            )
-                except Exception as e:
-                    logger.error(f"Error during API request: {str(e)}")
-                    raise HTTPException(
-                        status_code=500,
-                        detail=f"Error communicating with try-on service: {str(e)}"
-                    )
-            
-            # Debug response
-            logger.info(f"FASHN API response status: {fashn_response.status_code}")
-            logger.info(f"FASHN API response headers: {fashn_response.headers}")
-            logger.info(f"FASHN API response body: {fashn_response.text[:500]}...")
-            
-            # Check response
-            if fashn_response.status_code != 200:
-                logger.error(f"FASHN API error: {fashn_response.status_code}, {fashn_response.text}")
-                error_detail = "Failed to start virtual try-on"
-                try:
-                    error_json = fashn_response.json()
-                    if isinstance(error_json, dict) and 'error' in error_json:
-                        error_detail = error_json['error']
-                    elif isinstance(error_json, dict) and 'message' in error_json:
-                        error_detail = error_json['message']
-                except:
-                    pass
-                    
-                raise HTTPException(
-                    status_code=500,
-                    detail=error_detail
-                )
-                
-            # Parse the response
-            result = fashn_response.json()
-            
-        finally:
-            # Clean up temporary files
-            try:
-                if os.path.exists(model_temp_path):
-                    os.remove(model_temp_path)
-                if os.path.exists(garment_temp_path):
-                    os.remove(garment_temp_path)
-                logger.info("Cleaned up temporary files")
-            except Exception as e:
-                logger.error(f"Failed to clean up temporary files: {str(e)}")
+        # Parse the response
+        result = fashn_response.json()
         
         # Get prediction ID from response
         prediction_id = result.get("id")
@@ -1334,123 +1202,44 @@ async def test_virtual_try_on(
                 detail="Invalid response from try-on service"
             )
             
-        # Only track usage if skip_tracking is false and we have a device ID
-        # This logic is now handled by the front-end via the device-usage endpoint
-        # But we'll keep the option to track it here for backward compatibility
-        if device_id_value and not skip_tracking:
-            # Track device usage directly in the database
-            try:
-                # Get current usage data
-                usage_collection = db[settings.DB_NAME]["tryon_usage"]
-                usage = await usage_collection.find_one({"device_id": device_id_value})
-                
-                now = datetime.utcnow()
-                today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-                first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                
-                if not usage:
-                    # Create new usage record
-                    new_usage = {
-                        "device_id": device_id_value,
-                        "user_id": None,  # Anonymous user
-                        "daily_count": 1,
-                        "monthly_count": 1,
-                        "total_count": 1,
-                        "last_reset_daily": today,
-                        "last_reset_monthly": first_of_month,
-                        "last_used": now
-                    }
-                    await usage_collection.insert_one(new_usage)
-                    logger.info(f"Created new usage record for device {device_id_value}")
-                else:
-                    # Update existing usage record
-                    update_fields = {"last_used": now}
-                    increment_fields = {}
-                    
-                    # Check if we need to reset counts
-                    last_reset_daily = usage.get("last_reset_daily", usage.get("last_reset", now))
-                    if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-                        update_fields["daily_count"] = 1
-                        update_fields["last_reset_daily"] = today
-                    else:
-                        # CRITICAL: Increment by exactly 1
-                        increment_fields["daily_count"] = 1
-                    
-                    last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-                    if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-                        update_fields["monthly_count"] = 1
-                        update_fields["last_reset_monthly"] = first_of_month
-                    else:
-                        # CRITICAL: Increment by exactly 1
-                        increment_fields["monthly_count"] = 1
-                    
-                    # Always increment total count by exactly 1
-                    increment_fields["total_count"] = 1
-                    
-                    # Update the record
-                    if update_fields and increment_fields:
-                        await usage_collection.update_one(
-                            {"device_id": device_id_value},
-                            {
-                                "$set": update_fields,
-                                "$inc": increment_fields
-                            }
-                        )
-                    elif update_fields:
-                        await usage_collection.update_one(
-                            {"device_id": device_id_value},
-                            {"$set": update_fields}
-                        )
-                    elif increment_fields:
-                        await usage_collection.update_one(
-                            {"device_id": device_id_value},
-                            {"$inc": increment_fields}
-                        )
-                    
-                    logger.info(f"Updated usage record for device {device_id_value}")
-                    
-                    # Get the updated counts to verify
-                    updated_usage = await usage_collection.find_one({"device_id": device_id_value})
-                    if updated_usage:
-                        logger.info(f"Updated counts: daily={updated_usage.get('daily_count', 0)}, monthly={updated_usage.get('monthly_count', 0)}")
-                        
-                        # CRITICAL: Double-check if we've reached the monthly limit AFTER incrementing
-                        if updated_usage.get('monthly_count', 0) >= 30:
-                            logger.error(f"CRITICAL: Device {device_id_value} has reached monthly limit: {updated_usage.get('monthly_count', 0)}/30")
-                            # Force update to exactly 30 to prevent further exceeding
-                            await usage_collection.update_one(
-                                {"device_id": device_id_value},
-                                {"$set": {"monthly_count": 30}}
-                            )
-            except Exception as e:
-                logger.error(f"Error tracking device usage: {str(e)}", exc_info=True)
+        # Usage was charged up front, before the request went to FASHN
+        refund_on_error = False
         
         # Store the prediction in the database
-        predictions_collection = db[settings.DB_NAME]["tryon_predictions"]
+        created_at = datetime.utcnow()
         await predictions_collection.insert_one({
             "id": prediction_id,
             "device_id": device_id_value,  # Store the device ID
+            "cache_key": cache_key,
             "status": "pending",
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow(),
+            "created_at": created_at,
+            "updated_at": created_at,
+            "eta": result.get("eta"),
+            "next_poll_at": initial_poll_time(created_at, result.get("eta")),
             "params": {
-                "model_image_name": model_image.filename,
-                "garment_image_name": garment_image.filename,
+                "model_image_name": model_image.filename if model_image else None,
+                "model_photo_id": model_photo_id,
+                "garment_image_name": garment_image.filename if garment_image else None,
+                "garment_url": garment_source_url,
                 "category": category,
                 "mode": mode
             }
         })
         
-        return {
+        return await idempotency.complete({
             "id": prediction_id,
             "status": "pending",
             "eta": result.get("eta", 15)  # Default ETA of 15 seconds if not provided
-        }
+        })
         
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
     except Exception as e:
+        await idempotency.abandon()
+        if refund_on_error:
+            # The try-on never started, so don't count it against the device
+            await quota_cache.release(db[settings.DB_NAME]["tryon_usage"], usage_owner)
+        if isinstance(e, HTTPException):
+            # Re-raise HTTP exceptions
+            raise
         logger.error(f"Error in test try-on: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
@@ -1458,82 +1247,28 @@ async def test_virtual_try_on(
         )
 
 @tryon_router.get("/test-status/{prediction_id}", response_model=TryOnResponse)
-async def test_try_on_status(prediction_id: str):
+async def test_try_on_status(
+    prediction_id: str,
+    response: Response,
+    wait: int = Query(0, ge=0, le=60, description="Seconds to hold the request until the try-on completes or fails"),
+    db = Depends(get_database)
+):
     """Test endpoint to check the status of a try-on prediction without authentication"""
     try:
-        # Check the status from the FASHN API
-        import requests
+        # The status poller keeps the stored document current, so no FASHN call is needed
+        predictions_collection = get_predictions_collection(db)
+        prediction = await predictions_collection.find_one({"id": prediction_id}, PREDICTION_STATUS_PROJECTION)
         
-        try:
-            logger.info(f"Checking test status from FASHN API for prediction: {prediction_id}")
-            
-            response = requests.get(
-                f"https://api.fashn.ai/v1/status/{prediction_id}",
-                headers={
-                    "Authorization": f"Bearer {settings.FASHN_API_KEY}"
-                },
-                timeout=15
-            )
-            
-            # Log the raw response for debugging
-            logger.info(f"FASHN API test status response: {response.status_code}, {response.text[:200]}...")
-                
-            if response.status_code != 200:
-                logger.error(f"FASHN API test status check error: {response.status_code}, {response.text}")
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to check try-on status: {response.text}"
-                )
-        except requests.RequestException as req_error:
-            logger.error(f"Request error checking status: {str(req_error)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error connecting to try-on service: {str(req_error)}"
-            )
-            
-        # Parse the response
-        try:
-            result = response.json()
-        except ValueError as json_error:
-            logger.error(f"Invalid JSON in FASHN API response: {response.text}")
+        if not prediction:
             raise HTTPException(
-                status_code=500,
-                detail=f"Invalid response from try-on service: {str(json_error)}"
+                status_code=404,
+                detail="Try-on prediction not found"
             )
             
-        status = result.get("status", "pending")
-        
-        # Handle error object - convert complex error objects to string
-        error = result.get("error")
-        if error:
-            if isinstance(error, dict):
-                error_msg = error.get("message", "Unknown error")
-                if "name" in error:
-                    error_msg = f"{error['name']}: {error_msg}"
-                error = error_msg
-            # Ensure error is a string
-            error = str(error)
-            
-        # Get result URL
-        result_url = None
-        if status == "completed":
-            result_url = result.get("output")
-            if not result_url:
-                logger.warning(f"Completed status but no output URL provided: {result}")
-            # Log the result URL
-            logger.info(f"Result URL from FASHN API: {result_url}")
-        
-        # Create response
-        response_data = {
-            "id": prediction_id,
-            "status": status,
-            "result_url": result_url,
-            "error": error,
-            "eta": result.get("eta")
-        }
-        
-        logger.info(f"Returning test status response: {response_data}")
-        return response_data
+        if wait:
+            prediction = await wait_for_terminal_status(predictions_collection, prediction_id, prediction, wait)
+        set_retry_after(response, [prediction])
+        return prediction_status_response(prediction_id, prediction)
         
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -1546,9 +1281,14 @@ async def test_try_on_status(prediction_id: str):
         )
 
 @tryon_router.get("/device-status/{prediction_id}", response_model=TryOnResponse)
-async def device_status(prediction_id: str):
+async def device_status(
+    prediction_id: str,
+    response: Response,
+    wait: int = Query(0, ge=0, le=60, description="Seconds to hold the request until the try-on completes or fails"),
+    db = Depends(get_database)
+):
     """Alias for device-based status polling."""
-    return await test_try_on_status(prediction_id)
+    return await test_try_on_status(prediction_id, response, wait, db)
 
 @tryon_router.post("/sync-stats")
 async def sync_device_stats(
@@ -1567,56 +1307,46 @@ async def sync_device_stats(
         monthly_count = current_counts.get('monthly_count', 0)
         total_count = current_counts.get('total_count', 0)
         
-        # Get usage collection
+        # Write the client's counts in one upsert
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
-        
         now = datetime.utcnow()
         today = now.replace(hour=0, minute=0, second=0, microsecond=0)
         first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        if not usage:
-            # No record yet - create one with the client's counts
-            new_usage = {
-                "device_id": device_id,
-                "user_id": None,  # Anonymous user
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": total_count,
-                "last_reset_daily": today,
-                "last_reset_monthly": first_of_month,
-                "last_used": now,
-                "app_version": device_data.app_version,
-                "device_model": device_data.device_model,
-                "os_version": device_data.os_version
-            }
-            await usage_collection.insert_one(new_usage)
+        update_fields = {
+            "daily_count": daily_count,
+            "monthly_count": monthly_count,
+            "total_count": total_count,
+            "last_used": now
+        }
+        
+        # Update device info if provided
+        if device_data.app_version:
+            update_fields["app_version"] = device_data.app_version
+        if device_data.device_model:
+            update_fields["device_model"] = device_data.device_model
+        if device_data.os_version:
+            update_fields["os_version"] = device_data.os_version
+            
+        result = await usage_collection.update_one(
+            {"device_id": device_id},
+            {
+                "$set": update_fields,
+                "$setOnInsert": {
+                    "user_id": None,  # Anonymous user
+                    "last_reset_daily": today,
+                    "last_reset_monthly": first_of_month
+                }
+            },
+            upsert=True
+        )
+        quota_cache.invalidate(usage_collection, {"device_id": device_id})
+        
+        if result.upserted_id is not None:
             logger.info(f"Created new stats record for device {device_id}")
             return {"status": "created", "counts": current_counts}
-        else:
-            # Update existing record with client counts
-            update_fields = {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": total_count,
-                "last_used": now
-            }
-            
-            # Update device info if provided
-            if device_data.app_version:
-                update_fields["app_version"] = device_data.app_version
-            if device_data.device_model:
-                update_fields["device_model"] = device_data.device_model
-            if device_data.os_version:
-                update_fields["os_version"] = device_data.os_version
-                
-            # Update the record
-            await usage_collection.update_one(
-                {"device_id": device_id},
-                {"$set": update_fields}
-            )
-            logger.info(f"Updated stats for device {device_id}: {update_fields}")
-            return {"status": "updated", "counts": current_counts}
+        logger.info(f"Updated stats for device {device_id}: {update_fields}")
+        return {"status": "updated", "counts": current_counts}
             
     except Exception as e:
         logger.error(f"Error syncing device stats: {str(e)}", exc_info=True)
@@ -1629,50 +1359,21 @@ async def check_device_only(device_id: str, is_subscribed: bool = False, read_on
     try:
         logger.info(f"Device check-only for: {device_id} (subscribed: {is_subscribed})")
         
-        # Get usage data directly from database
+        # Served from the per-worker usage cache; nothing is written
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
-        
-        now = datetime.utcnow()
-        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        first_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        quota = await quota_cache.read(usage_collection, {"device_id": device_id}, None, None)
         
         # If there's no usage record, this device doesn't exist yet
-        if not usage:
+        if not quota["exists"]:
             logger.info(f"Device {device_id} not found in database")
-            return {
-                "device_exists": False,
-                "counts": {
-                    "daily_count": 0,
-                    "monthly_count": 0,
-                    "total_count": 0
-                }
-            }
-            
-        # Device exists, check if counts need to be reset
-        # Check if we need to reset the daily count
-        last_reset_daily = usage.get("last_reset_daily", today)
-        daily_count = usage.get("daily_count", 0)
-        
-        if isinstance(last_reset_daily, datetime) and last_reset_daily.date() < today.date():
-            # It's a new day, update the count in memory but don't change database
-            daily_count = 0
-            
-        # Check if we need to reset the monthly count    
-        last_reset_monthly = usage.get("last_reset_monthly", first_of_month)
-        monthly_count = usage.get("monthly_count", 0)
-        
-        if isinstance(last_reset_monthly, datetime) and last_reset_monthly.date().month < now.date().month:
-            # It's a new month, update the count in memory but don't change database
-            monthly_count = 0
         
         # Return the current counts and status
         return {
-            "device_exists": True,
+            "device_exists": quota["exists"],
             "counts": {
-                "daily_count": daily_count,
-                "monthly_count": monthly_count,
-                "total_count": usage.get("total_count", 0)
+                "daily_count": quota["daily_count"],
+                "monthly_count": quota["monthly_count"],
+                "total_count": quota["total_count"]
             }
         }
         
@@ -1716,14 +1417,9 @@ async def verify_device_try_on_limit(
         if not math.isfinite(monthly_limit):
             monthly_limit = -1
         
-        # Build the response
-        total_count = 0
-        
-        # Get total count from database if available
+        # Total count comes from the usage cache entry the limit check just filled
         usage_collection = db[settings.DB_NAME]["tryon_usage"]
-        usage = await usage_collection.find_one({"device_id": device_id})
-        if usage:
-            total_count = usage.get("total_count", 0)
+        total_count = (await quota_cache.read(usage_collection, {"device_id": device_id}, None, None))["total_count"]
         
         response = {
             "daily_count": daily_count,
@@ -1791,14 +1487,9 @@ async def check_device_usage_json(
             if not math.isfinite(monthly_limit):
                 monthly_limit = -1
             
-            # Build the response
-            total_count = 0
-            
-            # Get total count from database if available
+            # Total count comes from the usage cache entry the limit check just filled
             usage_collection = db[settings.DB_NAME]["tryon_usage"]
-            usage = await usage_collection.find_one({"device_id": device_id})
-            if usage:
-                total_count = usage.get("total_count", 0)
+            total_count = (await quota_cache.read(usage_collection, {"device_id": device_id}, None, None))["total_count"]
             
             response = {
                 "daily_count": daily_count,
@@ -1846,8 +1537,11 @@ async def check_device_usage_json(
 @tryon_router.post("/try-device", response_model=TryOnResponse)
 async def try_device(
     request: Request,
-    model_image: UploadFile = File(...),
-    garment_image: UploadFile = File(...),
+    model_image: Optional[UploadFile] = File(None),
+    garment_image: Optional[UploadFile] = File(None),
+    model_photo_id: Optional[str] = Form(None),
+    garment_url: Optional[str] = Form(None),
+    product_id: Optional[str] = Form(None),
     category: str = Form("auto"),
     mode: str = Form("balanced"),
     moderation_level: str = Form("permissive"),
@@ -1863,6 +1557,9 @@ async def try_device(
         request=request,
         model_image=model_image,
         garment_image=garment_image,
+        model_photo_id=model_photo_id,
+        garment_url=garment_url,
+        product_id=product_id,
         category=category,
         mode=mode,
         moderation_level=moderation_level,
@@ -1872,4 +1569,13 @@ async def try_device(
         is_subscribed=is_subscribed,
         background_tasks=background_tasks,
         db=db
-    )
\ No newline at end of file
+    )
+@tryon_router.get("/queue-stats")
+async def get_fashn_queue_stats():
+    """FASHN submission queue depth, slot usage, wait times, circuit state and latency model for this worker"""
+    return {
+        **fashn_scheduler.stats(),
+        "circuit_breaker": fashn_client.fashn_breaker.stats(),
+        "status_circuit_breaker": fashn_client.fashn_status_breaker.stats(),
+        "latency_model": latency_model.stats()
+    }
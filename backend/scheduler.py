@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
 from exponent_server_sdk import PushClient, PushMessage
+from utils.prediction_archive import archive_old_predictions
 import httpx
 
 # Configure logging
@@ -179,6 +180,15 @@ async def update_inactive_days():
     except Exception as e:
         logger.error(f"Error updating inactive days: {e}")
 
+async def archive_predictions():
+    """Roll try-on predictions past their retention window into the monthly archive"""
+    try:
+        logger.info("Archiving old try-on predictions...")
+        archived = await archive_old_predictions(db)
+        logger.info(f"Archived {archived} try-on predictions")
+    except Exception as e:
+        logger.error(f"Error archiving try-on predictions: {e}")
+
 # Start scheduler
 def setup_scheduler():
     logger.info("Starting scheduler...")
@@ -207,6 +217,14 @@ def setup_scheduler():
         minute=0
     )
     
+    # Archive old try-on predictions daily at 2:00 AM
+    scheduler.add_job(
+        archive_predictions,
+        'cron',
+        hour=2,
+        minute=0
+    )
+    
     scheduler.start()
     logger.info("Scheduler started")
 
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Report missing and unused MongoDB indexes, and optionally create the missing ones
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import settings
+from utils.db_indexes import ensure_indexes, index_report
+
+async def run(args) -> int:
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[settings.DB_NAME]
+    try:
+        if args.create:
+            await ensure_indexes(db)
+
+        rows = await index_report(db)
+        for row in rows:
+            if args.problems_only and row["status"] == "ok":
+                continue
+            keys = ", ".join(f"{field}:{direction}" for field, direction in row["keys"])
+            ops = "-" if row["ops"] is None else row["ops"]
+            print(f"{row['status']:<11} {row['collection']:<32} {keys:<48} ops={ops}")
+
+        missing = sum(1 for row in rows if row["status"] == "missing")
+        unused = sum(1 for row in rows if row["status"] == "unused")
+        print(f"\n{len(rows)} indexes checked: {missing} missing, {unused} unused since the last server restart")
+        return 1 if missing else 0
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Check MongoDB indexes against the ones VELRA needs')
+    parser.add_argument('--mongodb-url', type=str, default=settings.MONGODB_URL, help='MongoDB connection string')
+    parser.add_argument('--create', action='store_true', help='Create missing indexes before reporting')
+    parser.add_argument('--problems-only', action='store_true', help='Only list missing, unused and undeclared indexes')
+
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Convert products_cache documents that embed a category's products into the
+normalized products / category_products collections
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+from config import settings
+from utils.catalog_store import PRODUCTS_CACHE_COLLECTION, PRODUCTS_COLLECTION, search_fields, store_category
+
+async def backfill_search_terms(db) -> int:
+    """Index products stored before search (or its name length) existed; refreshed products are indexed as they are written"""
+    products_collection = db[PRODUCTS_COLLECTION]
+    writes = []
+    updated = 0
+    async for product in products_collection.find({"search_name_length": {"$exists": False}}, {"name": 1, "brandName": 1}):
+        writes.append(UpdateOne({"_id": product["_id"]}, {"$set": search_fields(product)}))
+        if len(writes) == 1000:
+            updated += (await products_collection.bulk_write(writes, ordered=False)).modified_count
+            writes = []
+    if writes:
+        updated += (await products_collection.bulk_write(writes, ordered=False)).modified_count
+    return updated
+
+async def run(args) -> int:
+    client = AsyncIOMotorClient(args.mongodb_url)
+    db = client[settings.DB_NAME]
+    cache_collection = db[PRODUCTS_CACHE_COLLECTION]
+    try:
+        # List keys first: each legacy document can be several MB, so load them one at a time
+        keys = [row["_id"] async for row in cache_collection.find({"products": {"$exists": True}}, {"_id": 1})]
+        print(f"{len(keys)} products_cache documents to migrate")
+
+        migrated = 0
+        for cache_key in keys:
+            document = await cache_collection.find_one({"_id": cache_key})
+            products = document.get("products") or []
+            if args.dry_run:
+                print(f"would migrate {cache_key}: {len(products)} products")
+                continue
+
+            metadata = {
+                "categoryId": document.get("categoryId"),
+                "currency": document.get("currency", "USD"),
+                "countryISO": document.get("countryISO", "US"),
+                # Documents written before whole-category prefetch hold a single page
+                "complete": bool(document.get("complete")),
+                "last_updated": document.get("last_updated")
+            }
+            if await store_category(db, cache_key, products, metadata):
+                migrated += 1
+                print(f"migrated {cache_key}: {len(products)} products")
+            else:
+                print(f"skipped {cache_key}: no products with an id")
+
+        if not args.dry_run:
+            print(f"\n{migrated} of {len(keys)} documents migrated")
+            print(f"{await backfill_search_terms(db)} products added to the search index")
+        return 0
+    finally:
+        client.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate the embedded products_cache documents to the normalized catalog collections')
+    parser.add_argument('--mongodb-url', type=str, default=settings.MONGODB_URL, help='MongoDB connection string')
+    parser.add_argument('--dry-run', action='store_true', help='Only list the documents that would be migrated')
+
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# The backend modules import each other as top-level packages (config, utils, routes)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class ServerDatabase:
+    """
+    Stands in for get_database(): the routes reach predictions as
+    db[DB_NAME]["tryon_predictions"] and ensure_indexes as
+    db["<DB_NAME>.tryon_predictions"], which mongomock_motor cannot nest
+    """
+
+    def __init__(self):
+        self.client = AsyncMongoMockClient()
+
+    def __getitem__(self, name):
+        database, _, collection = name.partition(".")
+        return self.client[database][collection] if collection else self.client[name]
+
+@pytest.fixture
+def server_db():
+    return ServerDatabase()
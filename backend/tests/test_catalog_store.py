@@ -0,0 +1,67 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from utils.catalog_store import CATEGORY_PRODUCTS_COLLECTION, get_listing, read_category_slice, store_category
+
+CACHE_KEY = "4209_USD_US"
+METADATA = {"categoryId": 4209, "currency": "USD", "countryISO": "US", "complete": True}
+
+def products(*ids):
+    return [{"id": product_id, "name": f"Product {product_id}", "brandName": "ASOS DESIGN", "price": {"current": {"value": 10.0}}}
+            for product_id in ids]
+
+async def generations(db):
+    return sorted(set(await db[CATEGORY_PRODUCTS_COLLECTION].distinct("generation", {"category_key": CACHE_KEY})))
+
+async def listed_ids(db):
+    listing = await get_listing(db, CACHE_KEY)
+    return [product["id"] for product in await read_category_slice(db, listing, 0, 100)]
+
+def test_refresh_replaces_the_previous_generation():
+    db = AsyncMongoMockClient()["catalog"]
+
+    async def run():
+        await store_category(db, CACHE_KEY, products(1, 2, 3), METADATA)
+        await store_category(db, CACHE_KEY, products(3, 4), METADATA)
+        listing = await get_listing(db, CACHE_KEY)
+        return await generations(db), listing["generation"], await listed_ids(db)
+
+    live_generations, live, ids = asyncio.run(run())
+    assert live_generations == [live]
+    assert ids == [3, 4]
+
+def test_refresh_keeps_rows_of_a_concurrent_refresh():
+    db = AsyncMongoMockClient()["catalog"]
+
+    async def run():
+        await store_category(db, CACHE_KEY, products(1, 2), METADATA)
+        # Another worker has written its rows but not yet switched the listing
+        await db[CATEGORY_PRODUCTS_COLLECTION].insert_many([
+            {"category_key": CACHE_KEY, "generation": "other-worker", "rank": rank, "product_id": product_id}
+            for rank, product_id in enumerate([5, 6])
+        ])
+        await store_category(db, CACHE_KEY, products(3, 4), METADATA)
+        before_switch = await listed_ids(db)
+
+        # The other worker switches last; its rows must still be there
+        await db["products_cache"].update_one({"_id": CACHE_KEY}, {"$set": {"generation": "other-worker"}})
+        await store_category(db, "unrelated", products(5, 6), METADATA)
+        return before_switch, await listed_ids(db)
+
+    before_switch, after_switch = asyncio.run(run())
+    assert before_switch == [3, 4]
+    assert after_switch == [5, 6]
+
+def test_create_only_store_leaves_an_existing_listing():
+    db = AsyncMongoMockClient()["catalog"]
+
+    async def run():
+        await store_category(db, CACHE_KEY, products(1, 2), METADATA)
+        stored = await store_category(db, CACHE_KEY, products(3), {**METADATA, "complete": False}, replace=False)
+        return stored, await generations(db), await listed_ids(db)
+
+    stored, live_generations, ids = asyncio.run(run())
+    assert not stored
+    assert len(live_generations) == 1
+    assert ids == [1, 2]
@@ -0,0 +1,78 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from config import settings
+from routes import products as products_routes
+from routes.products import CategoryPrefetch, category_refresh_allowed, prefetch_category
+from utils.catalog_store import refresh_backed_off
+
+CACHE_KEY = "4209_USD_US"
+
+def page_of(count, start=0):
+    return [{"id": start + index, "name": f"Product {start + index}", "brandName": "ASOS DESIGN",
+             "imageUrl": "images.asos-media.com/x.jpg", "price": {"current": {"value": 10.0}}}
+            for index in range(count)]
+
+def run_prefetch(db, monkeypatch, pages):
+    calls = []
+
+    async def fake_fetch(categoryId, page, perPage, currency, countryISO):
+        calls.append(page)
+        result = pages[page - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(products_routes, "fetch_category_page", fake_fetch)
+    monkeypatch.setattr(settings, "CATALOG_PREFETCH_PAGE_DELAY_SECONDS", 0)
+    asyncio.run(prefetch_category(db, CategoryPrefetch(CACHE_KEY), "4209", "USD", "US"))
+    return calls
+
+def test_failed_refresh_backs_off(monkeypatch):
+    db = AsyncMongoMockClient()["catalog"]
+
+    calls = run_prefetch(db, monkeypatch, [Exception("429 Too Many Requests")])
+
+    assert calls == [1]
+    assert asyncio.run(refresh_backed_off(db, CACHE_KEY))
+    assert not asyncio.run(category_refresh_allowed(db, CACHE_KEY))
+    assert asyncio.run(category_refresh_allowed(db, "other_USD_US"))
+
+def test_interrupted_refresh_backs_off(monkeypatch):
+    db = AsyncMongoMockClient()["catalog"]
+    page_size = settings.CATALOG_PREFETCH_PAGE_SIZE
+
+    run_prefetch(db, monkeypatch, [page_of(page_size), Exception("403 Forbidden")])
+
+    assert asyncio.run(refresh_backed_off(db, CACHE_KEY))
+
+def test_backoff_expires_and_success_clears_it(monkeypatch):
+    db = AsyncMongoMockClient()["catalog"]
+    run_prefetch(db, monkeypatch, [Exception("429 Too Many Requests")])
+
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS", 0)
+    assert not asyncio.run(refresh_backed_off(db, CACHE_KEY))
+
+    monkeypatch.setattr(settings, "CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS", 900)
+    run_prefetch(db, monkeypatch, [page_of(3)])
+    assert not asyncio.run(refresh_backed_off(db, CACHE_KEY))
+
+def test_miss_during_backoff_does_not_call_asos(monkeypatch):
+    db = AsyncMongoMockClient()["catalog"]
+    run_prefetch(db, monkeypatch, [Exception("429 Too Many Requests")])
+
+    async def connection():
+        return db
+
+    def refuse_prefetch(*args):
+        raise AssertionError("refresh started during backoff")
+
+    monkeypatch.setattr(products_routes, "get_mongodb_connection", connection)
+    monkeypatch.setattr(products_routes, "start_category_prefetch", refuse_prefetch)
+    monkeypatch.setattr(products_routes, "ASOS_API_KEY", "key")
+
+    result = asyncio.run(products_routes.get_products_by_category(
+        categoryId="4209", perPage=24, page=1, currency="USD", countryISO="US"
+    ))
+    assert result == []
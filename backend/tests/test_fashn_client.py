@@ -0,0 +1,73 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils import fashn_client
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+def breaker(name):
+    return CircuitBreaker(name=name, window_seconds=60, min_calls=3, error_rate_threshold=0.5,
+                          latency_threshold=20, open_seconds=30, half_open_max_calls=1)
+
+@pytest.fixture
+def breakers(monkeypatch):
+    run_breaker, status_breaker = breaker("run"), breaker("status")
+    monkeypatch.setattr(fashn_client, "fashn_breaker", run_breaker)
+    monkeypatch.setattr(fashn_client, "fashn_status_breaker", status_breaker)
+    return run_breaker, status_breaker
+
+def use_transport(monkeypatch, handler):
+    client = httpx.AsyncClient(base_url=fashn_client.FASHN_API_BASE_URL, transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(fashn_client, "get_fashn_client", lambda: client)
+
+def test_status_errors_do_not_trip_submissions(breakers, monkeypatch):
+    run_breaker, status_breaker = breakers
+
+    def handler(request):
+        if request.url.path.endswith("/run"):
+            return httpx.Response(200, json={"id": "pred-1", "status": "starting"})
+        return httpx.Response(503)
+
+    use_transport(monkeypatch, handler)
+
+    async def run():
+        for _ in range(3):
+            await fashn_client.get_prediction_status("pred-1")
+        return await fashn_client.run_prediction(json={"model_image": "m", "garment_image": "g"})
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert status_breaker.state == "open"
+    assert run_breaker.state == "closed"
+    assert run_breaker.stats()["window_calls"] == 1
+
+def test_pool_timeouts_are_not_provider_failures(breakers, monkeypatch):
+    run_breaker, status_breaker = breakers
+
+    def handler(request):
+        raise httpx.PoolTimeout("no free connection")
+
+    use_transport(monkeypatch, handler)
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(httpx.PoolTimeout):
+                await fashn_client.get_prediction_status("pred-1")
+
+    asyncio.run(run())
+    assert status_breaker.state == "closed"
+    assert status_breaker.stats()["window_calls"] == 0
+
+def test_open_status_circuit_fails_status_checks_fast(breakers, monkeypatch):
+    _, status_breaker = breakers
+    use_transport(monkeypatch, lambda request: httpx.Response(500))
+
+    async def run():
+        for _ in range(3):
+            await fashn_client.get_prediction_status("pred-1")
+        with pytest.raises(CircuitOpenError):
+            await fashn_client.get_prediction_status("pred-1")
+
+    asyncio.run(run())
+    assert status_breaker.rejected == 1
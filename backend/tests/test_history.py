@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from routes.virtual_tryon import get_try_on_history
+from utils.db_indexes import backfill_prediction_ids
+from utils.prediction_poller import get_predictions_collection
+
+def history(db, cursor=None, limit=20, user_id="user-1"):
+    return asyncio.run(get_try_on_history(cursor=cursor, limit=limit, user_id=user_id, db=db))
+
+async def insert_predictions(db, documents):
+    await get_predictions_collection(db).insert_many(documents)
+
+def test_history_lists_legacy_predictions_without_id(server_db):
+    db = server_db
+    created_at = datetime(2025, 1, 10, 12, 0)
+    asyncio.run(insert_predictions(db, [
+        # Stored by /try-async before predictions carried an id field
+        {"prediction_id": "legacy-1", "user_id": "user-1", "status": "completed",
+         "result_url": "https://cdn.example/legacy.png", "created_at": created_at},
+        {"id": "new-1", "prediction_id": "new-1", "user_id": "user-1", "status": "processing",
+         "created_at": created_at + timedelta(minutes=5)},
+    ]))
+
+    page = history(db)
+
+    assert [item["id"] for item in page["items"]] == ["new-1", "legacy-1"]
+    assert page["items"][1]["result_url"] == "https://cdn.example/legacy.png"
+    assert page["items"][0]["result_url"] is None
+    assert page["next_cursor"] is None
+
+def test_history_pages_across_legacy_predictions(server_db):
+    db = server_db
+    start = datetime(2025, 1, 10, 12, 0)
+    asyncio.run(insert_predictions(db, [
+        {"prediction_id": f"legacy-{index}", "user_id": "user-1", "status": "completed",
+         "result_url": f"https://cdn.example/{index}.png", "created_at": start + timedelta(minutes=index)}
+        for index in range(5)
+    ] + [
+        {"id": "other-user", "user_id": "user-2", "status": "completed", "created_at": start}
+    ]))
+
+    first = history(db, limit=2)
+    second = history(db, cursor=first["next_cursor"], limit=2)
+    third = history(db, cursor=second["next_cursor"], limit=2)
+
+    ids = [item["id"] for page in (first, second, third) for item in page["items"]]
+    assert ids == ["legacy-4", "legacy-3", "legacy-2", "legacy-1", "legacy-0"]
+    assert third["next_cursor"] is None
+
+def test_backfill_gives_legacy_predictions_an_id(server_db):
+    db = server_db
+    asyncio.run(insert_predictions(db, [
+        {"prediction_id": "legacy-1", "user_id": "user-1", "status": "completed", "created_at": datetime(2025, 1, 1)},
+        {"id": "new-1", "prediction_id": "new-1", "user_id": "user-1", "status": "completed", "created_at": datetime(2025, 1, 2)},
+    ]))
+    fixed = asyncio.run(backfill_prediction_ids(db))
+    again = asyncio.run(backfill_prediction_ids(db))
+
+    async def ids():
+        return sorted([document["id"] async for document in get_predictions_collection(db).find({})])
+
+    assert (fixed, again) == (1, 0)
+    assert asyncio.run(ids()) == ["legacy-1", "new-1"]
@@ -0,0 +1,43 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from mongomock_motor import AsyncMongoMockClient
+
+from utils.latency_model import LatencyModel, prediction_inputs
+
+def completed(prediction_id, seconds, now, **inputs):
+    created_at = now - timedelta(minutes=5)
+    return {"id": prediction_id, "status": "completed", "created_at": created_at,
+            "completed_at": created_at + timedelta(seconds=seconds), **inputs}
+
+def fitted_model(documents):
+    model = LatencyModel(sample_size=100, min_samples=2, refresh_seconds=60)
+
+    async def run():
+        collection = AsyncMongoMockClient()["tryon"]["tryon_predictions"]
+        await collection.insert_many(documents)
+        await model.refresh(collection)
+
+    asyncio.run(run())
+    return model
+
+def test_prediction_inputs_reads_either_route_shape():
+    assert prediction_inputs({"request_data": {"mode": "quality", "category": "tops"}}) == ("quality", "tops")
+    assert prediction_inputs({"params": {"mode": "performance", "category": "bottoms"}}) == ("performance", "bottoms")
+    assert prediction_inputs({}) == (None, None)
+
+def test_device_predictions_are_modelled_under_their_own_mode():
+    now = datetime.utcnow()
+    model = fitted_model([
+        completed("async-1", 8, now, request_data={"mode": "balanced", "category": "tops"}),
+        completed("async-2", 10, now, request_data={"mode": "balanced", "category": "tops"}),
+        # /test stores its inputs under params
+        completed("device-1", 40, now, params={"mode": "quality", "category": "tops"}),
+        completed("device-2", 44, now, params={"mode": "quality", "category": "tops"}),
+    ])
+
+    assert model.estimate("balanced", "tops") == (10, 10)
+    assert model.estimate("quality", "tops") == (44, 44)
+
+    pending = {"status": "pending", "created_at": now - timedelta(seconds=4), "params": {"mode": "quality", "category": "tops"}}
+    assert model.remaining_seconds(pending, now=now) == 40
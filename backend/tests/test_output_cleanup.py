@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+from config import settings
+from utils import tryon_outputs
+from utils.tryon_outputs import delete_outputs
+
+def write_output(prediction_id, filename):
+    directory = os.path.join(settings.TRYON_OUTPUT_DIR, prediction_id)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, filename), "wb") as out_file:
+        out_file.write(b"image")
+    return directory
+
+def test_delete_outputs_removes_local_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TRYON_OUTPUT_DIR", str(tmp_path))
+    directory = write_output("pred-1", "full.png")
+    write_output("pred-1", "thumbnail.jpg")
+    kept = write_output("pred-2", "full.png")
+
+    output_urls = {"full": "https://api.example/virtual-tryon/outputs/pred-1/full.png",
+                   "thumbnail": "https://api.example/virtual-tryon/outputs/pred-1/thumbnail.jpg"}
+    assert asyncio.run(delete_outputs("pred-1", output_urls))
+    assert not os.path.exists(directory)
+    assert os.path.exists(kept)
+    # Already gone: deleting again still succeeds
+    assert asyncio.run(delete_outputs("pred-1", output_urls))
+
+def test_delete_outputs_refuses_unsafe_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TRYON_OUTPUT_DIR", str(tmp_path / "outputs"))
+    write_output("pred-1", "full.png")
+
+    assert not asyncio.run(delete_outputs("..", None))
+    assert not asyncio.run(delete_outputs("", None))
+    assert os.path.exists(tmp_path / "outputs" / "pred-1" / "full.png")
+
+def test_delete_outputs_deletes_cloudinary_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "TRYON_OUTPUT_DIR", str(tmp_path))
+    deleted = []
+
+    async def fake_delete(public_id, folder):
+        deleted.append(f"{folder}/{public_id}")
+        return True
+
+    monkeypatch.setattr(tryon_outputs, "delete_image_from_cloudinary", fake_delete)
+    output_urls = {
+        "full": ["https://res.cloudinary.com/demo/image/upload/v1/tryon_outputs/pred-1_full_0.png",
+                 "https://res.cloudinary.com/demo/image/upload/v1/tryon_outputs/pred-1_full_1.png"],
+        "thumbnail": ["https://res.cloudinary.com/demo/image/upload/v1/tryon_outputs/pred-1_thumbnail_0.jpg",
+                      "https://res.cloudinary.com/demo/image/upload/v1/tryon_outputs/pred-1_thumbnail_1.jpg"]
+    }
+
+    assert asyncio.run(delete_outputs("pred-1", output_urls))
+    assert sorted(deleted) == [
+        "tryon_outputs/pred-1_full_0", "tryon_outputs/pred-1_full_1",
+        "tryon_outputs/pred-1_thumbnail_0", "tryon_outputs/pred-1_thumbnail_1"
+    ]
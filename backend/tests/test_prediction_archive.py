@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime
+
+from mongomock_motor import AsyncMongoMockClient
+
+from utils.prediction_archive import ARCHIVE_PROJECTION, month_bounds
+
+def archived_rows(documents):
+    async def run():
+        collection = AsyncMongoMockClient()["tryon"]["tryon_predictions"]
+        await collection.insert_many(documents)
+        return await collection.aggregate([{"$project": ARCHIVE_PROJECTION}, {"$sort": {"_id": 1}}]).to_list(length=None)
+    return asyncio.run(run())
+
+def test_archive_projection_reads_both_input_shapes():
+    created_at = datetime(2025, 3, 1, 12, 0, 0)
+    rows = archived_rows([
+        {"id": "async-1", "user_id": "user-1", "status": "completed", "created_at": created_at,
+         "request_data": {"mode": "quality", "category": "tops", "garment_url": "https://cdn.example/g1.jpg"}},
+        # /test and /try-device predictions
+        {"id": "device-1", "device_id": "device-1", "status": "completed", "created_at": created_at,
+         "params": {"mode": "performance", "category": "bottoms", "garment_url": "https://cdn.example/g2.jpg"}},
+        # Stored by /try-async before predictions carried an id field
+        {"prediction_id": "legacy-1", "user_id": "user-1", "status": "failed", "created_at": created_at,
+         "request_data": {"mode": "balanced", "category": "auto"}},
+    ])
+
+    assert [(row["_id"], row["mode"], row["category"]) for row in rows] == [
+        ("async-1", "quality", "tops"),
+        ("device-1", "performance", "bottoms"),
+        ("legacy-1", "balanced", "auto"),
+    ]
+    assert rows[1]["garment_url"] == "https://cdn.example/g2.jpg"
+    assert "params" not in rows[1] and "request_data" not in rows[0]
+
+def test_month_bounds_wrap_the_year():
+    assert month_bounds(datetime(2025, 12, 31, 23, 59)) == (datetime(2025, 12, 1), datetime(2026, 1, 1))
+    assert month_bounds(datetime(2025, 3, 1)) == (datetime(2025, 3, 1), datetime(2025, 4, 1))
@@ -0,0 +1,49 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from utils import fashn_client
+from utils.db_indexes import backfill_next_poll_times
+from utils.prediction_poller import get_predictions_collection, refresh_pending_predictions
+
+def test_backfill_schedules_pending_predictions_without_a_poll_time(server_db):
+    created_at = datetime.utcnow() - timedelta(hours=1)
+    scheduled = datetime.utcnow() + timedelta(minutes=5)
+    collection = get_predictions_collection(server_db)
+
+    async def run():
+        await collection.insert_many([
+            # Pending when the poller started claiming by next_poll_at
+            {"id": "old-pending", "status": "pending", "created_at": created_at},
+            {"id": "old-processing", "status": "processing", "created_at": created_at},
+            {"id": "old-completed", "status": "completed", "created_at": created_at},
+            {"id": "new-pending", "status": "pending", "created_at": created_at, "next_poll_at": scheduled},
+        ])
+        fixed = await backfill_next_poll_times(server_db)
+        again = await backfill_next_poll_times(server_db)
+        due = await collection.find(
+            {"status": {"$nin": ["completed", "failed"]}, "next_poll_at": {"$lte": datetime.utcnow()}}, {"_id": 0, "id": 1}
+        ).to_list(length=None)
+        completed = await collection.find_one({"id": "old-completed"})
+        return fixed, again, sorted(p["id"] for p in due), completed
+
+    fixed, again, due, completed = asyncio.run(run())
+    assert (fixed, again) == (2, 0)
+    assert due == ["old-pending", "old-processing"]
+    assert "next_poll_at" not in completed
+
+def test_backfilled_predictions_time_out(server_db, monkeypatch):
+    async def no_status_calls(prediction_id):
+        raise AssertionError("timed-out predictions are not polled")
+
+    monkeypatch.setattr(fashn_client, "get_prediction_status", no_status_calls)
+    collection = get_predictions_collection(server_db)
+
+    async def run():
+        await collection.insert_one({"id": "old-pending", "status": "pending", "created_at": datetime.utcnow() - timedelta(hours=1)})
+        await backfill_next_poll_times(server_db)
+        await refresh_pending_predictions(server_db)
+        return await collection.find_one({"id": "old-pending"})
+
+    prediction = asyncio.run(run())
+    assert prediction["status"] == "failed"
+    assert prediction["error"] == "Timed out waiting for try-on result"
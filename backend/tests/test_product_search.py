@@ -0,0 +1,91 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from config import settings
+from utils.catalog_store import PRODUCTS_COLLECTION, search_products, search_terms, store_category
+
+METADATA = {"categoryId": 4209, "currency": "USD", "countryISO": "US"}
+
+def product(product_id, name, brand="ASOS DESIGN"):
+    return {"id": product_id, "name": name, "brandName": brand, "price": {"current": {"value": 20.0}}}
+
+def make_db(products, metadata=METADATA):
+    db = AsyncMongoMockClient()["catalog"]
+    asyncio.run(store_category(db, f"{metadata['categoryId']}_{metadata['currency']}_{metadata['countryISO']}", products, metadata))
+    return db
+
+def search(db, query, start_idx=0, count=24, currency="USD", countryISO="US"):
+    products = asyncio.run(search_products(db, query, currency, countryISO, start_idx, count))
+    return [p["id"] for p in products]
+
+def test_search_terms_index_every_word_prefix():
+    terms = search_terms(product(1, "Satin Midi-Dress", brand="Topshop"))
+
+    assert {"sa", "sat", "satin", "mi", "midi", "dr", "dress", "to", "topshop"} <= set(terms)
+    assert "s" not in terms
+    assert "satin midi" not in terms
+
+def test_search_matches_partly_typed_words():
+    db = make_db([
+        product(1, "Satin midi dress"),
+        product(2, "Denim shirt"),
+        product(3, "Satin shirt dress"),
+    ])
+
+    assert sorted(search(db, "sat dre")) == [1, 3]
+    assert search(db, "denim sh") == [2]
+    # Every word has to match; single letters are too short to search on
+    assert search(db, "satin jeans") == []
+    assert search(db, "s") == []
+
+def test_search_ranks_whole_words_then_brand_then_prefix():
+    db = make_db([
+        product(1, "Dresser bag", brand="Mango"),
+        product(2, "Floral top", brand="Dress Up"),
+        product(3, "Longline summer dress", brand="Mango"),
+        product(4, "Mini dress", brand="Mango"),
+    ])
+
+    # Whole word in the name first (shorter names break the tie),
+    # then the brand, then prefixes
+    assert search(db, "dress") == [4, 3, 2, 1]
+
+def test_search_ranks_phrases_first():
+    db = make_db([
+        product(1, "Dress with shirt collar"),
+        product(2, "Oversized shirt dress"),
+    ])
+
+    assert search(db, "shirt dress") == [2, 1]
+
+def test_search_pages_follow_one_ranking(monkeypatch):
+    # Inserted worst first, so ranking before the limit is what puts the best on page one
+    db = make_db([product(index, "Dresser " + "x" * index) for index in range(10)] + [product(100, "Dress")])
+    monkeypatch.setattr(settings, "CATALOG_SEARCH_MAX_CANDIDATES", 8)
+
+    assert search(db, "dress", count=3) == [100, 0, 1]
+    assert search(db, "dress", start_idx=3, count=3) == [2, 3, 4]
+    # Pages stop at the configured depth
+    assert search(db, "dress", start_idx=6, count=3) == [5, 6]
+    assert search(db, "dress", start_idx=8, count=3) == []
+
+def test_search_only_returns_products_priced_in_the_market():
+    db = make_db([product(1, "Satin dress")])
+    asyncio.run(store_category(db, "4209_GBP_GB", [product(2, "Satin skirt")], {**METADATA, "currency": "GBP", "countryISO": "GB"}))
+
+    assert search(db, "satin") == [1]
+    assert search(db, "satin", currency="GBP", countryISO="GB") == [2]
+
+    found = asyncio.run(search_products(db, "satin", "USD", "US", 0, 24))
+    assert found[0]["price"] == {"current": {"value": 20.0}}
+    assert "search_terms" not in found[0] and "search_name_length" not in found[0]
+
+def test_search_ranks_products_stored_without_a_name_length_last_among_equals():
+    db = make_db([product(1, "Long satin dress")])
+    asyncio.run(db[PRODUCTS_COLLECTION].insert_one({
+        "_id": 2, "id": 2, "name": "Satin dress", "brandName": "ASOS DESIGN",
+        "prices": {"USD_US": None}, "search_terms": search_terms({"name": "Satin dress", "brandName": "ASOS DESIGN"})
+    }))
+
+    assert search(db, "satin") == [1, 2]
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from config import settings
+from utils import tryon_cache
+from utils.tryon_cache import TryOnResultCache, compute_tryon_cache_key, lookup_cached_result
+
+CACHE_KEY = compute_tryon_cache_key("user:user-1", b"model", b"garment", "tops", "balanced", "true")
+
+@pytest.fixture
+def memory_tier(monkeypatch):
+    cache = TryOnResultCache(max_entries=10, ttl_seconds=3600)
+    monkeypatch.setattr(tryon_cache, "tryon_result_cache", cache)
+    monkeypatch.setattr(settings, "TRYON_OUTPUT_STORAGE", "local")
+    return cache
+
+def completed_prediction(**fields):
+    return {"id": "pred-1", "cache_key": CACHE_KEY, "status": "completed",
+            "result_url": "https://cdn.fashn.ai/pred-1/output.png", "completed_at": datetime.utcnow(), **fields}
+
+def test_cache_key_is_scoped_to_the_owner():
+    other = compute_tryon_cache_key("device:device-1", b"model", b"garment", "tops", "balanced", "true")
+    swapped = compute_tryon_cache_key("user:user-1", b"garment", b"model", "tops", "balanced", "true")
+
+    assert len({CACHE_KEY, other, swapped}) == 3
+
+def test_unmirrored_result_is_not_kept_in_memory(memory_tier):
+    collection = AsyncMongoMockClient()["tryon"]["tryon_predictions"]
+
+    async def run():
+        await collection.insert_one(completed_prediction())
+        before = await lookup_cached_result(collection, CACHE_KEY)
+        # The output mirror copies the output into our storage
+        await collection.update_one({"id": "pred-1"}, {"$set": {"output_urls": {
+            "full": "https://api.example/virtual-tryon/outputs/pred-1/full.png",
+            "thumbnail": "https://api.example/virtual-tryon/outputs/pred-1/thumbnail.jpg"
+        }}})
+        after = await lookup_cached_result(collection, CACHE_KEY)
+        return before, after
+
+    before, after = asyncio.run(run())
+    assert before == {"id": "pred-1", "result_url": "https://cdn.fashn.ai/pred-1/output.png", "thumbnail_url": None}
+    assert after == {
+        "id": "pred-1",
+        "result_url": "https://api.example/virtual-tryon/outputs/pred-1/full.png",
+        "thumbnail_url": "https://api.example/virtual-tryon/outputs/pred-1/thumbnail.jpg"
+    }
+    assert memory_tier.get(CACHE_KEY) == after
+
+def test_mirrored_result_is_served_from_memory(memory_tier):
+    collection = AsyncMongoMockClient()["tryon"]["tryon_predictions"]
+    output_urls = {"full": "https://res.cloudinary.com/demo/pred-1_full.png",
+                   "thumbnail": "https://res.cloudinary.com/demo/pred-1_thumbnail.jpg"}
+
+    async def run():
+        await collection.insert_one(completed_prediction(output_urls=output_urls))
+        first = await lookup_cached_result(collection, CACHE_KEY)
+        await collection.delete_many({})
+        return first, await lookup_cached_result(collection, CACHE_KEY)
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert second["thumbnail_url"] == output_urls["thumbnail"]
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import tempfile
+import tracemalloc
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from utils.uploads import UploadSizeLimitMiddleware, read_upload
+
+MB = 1024 * 1024
+CHUNK = b"\0" * (64 * 1024)
+
+def spooled_upload(size: int) -> UploadFile:
+    """An upload the way Starlette hands it over: spooled to a temporary file"""
+    spooled = tempfile.SpooledTemporaryFile(max_size=MB)
+    for _ in range(size // len(CHUNK)):
+        spooled.write(CHUNK)
+    spooled.seek(0)
+    return UploadFile(spooled, filename="photo.jpg")
+
+class UnseekableFile:
+    """A body stream whose size cannot be looked up, forcing chunked reads"""
+
+    def __init__(self, size: int):
+        self.remaining = size
+        self.reads = 0
+
+    def seek(self, *args):
+        raise OSError("not seekable")
+
+    def read(self, size: int = -1) -> bytes:
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        self.remaining -= size
+        self.reads += 1
+        return b"\0" * size
+
+def peak_allocation(coroutine):
+    """Run a coroutine and return (its result, peak bytes allocated while it ran)"""
+    async def measure():
+        # Start the thread pool first; its one-off setup is not the code under test
+        await run_in_threadpool(lambda: None)
+        tracemalloc.start()
+        try:
+            return await coroutine, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return asyncio.run(measure())
+
+def test_read_upload_within_cap_reads_once():
+    upload = spooled_upload(4 * MB)
+    contents, peak = peak_allocation(read_upload(upload, max_bytes=10 * MB))
+    assert len(contents) == 4 * MB
+    # The returned bytes and nothing more: no chunk list or joined copy
+    assert peak < 5 * MB
+
+def test_read_upload_rejects_oversize_without_reading_it():
+    upload = spooled_upload(20 * MB)
+
+    async def read():
+        with pytest.raises(HTTPException) as error:
+            await read_upload(upload, max_bytes=10 * MB)
+        return error.value
+
+    error, peak = peak_allocation(read())
+    assert error.status_code == 400
+    assert peak < MB
+
+def test_read_upload_stops_unsized_stream_at_cap(monkeypatch):
+    from config import settings
+    monkeypatch.setattr(settings, "TRYON_UPLOAD_CHUNK_BYTES", MB)
+    stream = UnseekableFile(50 * MB)
+    upload = UploadFile(stream, filename="photo.jpg")
+
+    async def read():
+        with pytest.raises(HTTPException) as error:
+            await read_upload(upload, max_bytes=10 * MB)
+        return error.value
+
+    error, peak = peak_allocation(read())
+    assert error.status_code == 400
+    assert stream.reads == 11
+    assert peak < 12 * MB
+
+async def call_middleware(headers, chunks, max_body_bytes=MB):
+    """Run a request through the middleware; returns (sent messages, app calls, chunks consumed)"""
+    sent = []
+    app_calls = []
+    consumed = 0
+
+    async def app(scope, receive, send):
+        app_calls.append(scope["path"])
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect" or not message.get("more_body"):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def receive():
+        nonlocal consumed
+        consumed += 1
+        if consumed > len(chunks):
+            return {"type": "http.disconnect"}
+        return {"type": "http.request", "body": chunks[consumed - 1], "more_body": consumed < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/virtual-tryon/try-async", "headers": headers}
+    await UploadSizeLimitMiddleware(app, max_body_bytes, path_prefix="/virtual-tryon")(scope, receive, send)
+    return sent, app_calls, consumed
+
+def response_status(sent):
+    return next(message["status"] for message in sent if message["type"] == "http.response.start")
+
+def test_middleware_rejects_large_content_length_before_reading():
+    sent, app_calls, consumed = asyncio.run(
+        call_middleware([(b"content-length", str(20 * MB).encode())], [CHUNK] * 320)
+    )
+    assert response_status(sent) == 413
+    assert json.loads(sent[1]["body"])["detail"] == "Request body exceeds 1MB limit"
+    assert app_calls == []
+    assert consumed == 0
+
+def test_middleware_cuts_off_chunked_body_at_limit():
+    chunks = [CHUNK] * 320  # 20MB streamed without a Content-Length
+    (sent, app_calls, consumed), peak = peak_allocation(
+        call_middleware([(b"transfer-encoding", b"chunked")], chunks)
+    )
+    assert [message["status"] for message in sent if message["type"] == "http.response.start"] == [413]
+    # Stops one chunk past 1MB instead of draining the stream
+    assert consumed == MB // len(CHUNK) + 1
+    assert peak < MB
+
+def test_middleware_passes_bodies_within_limit():
+    sent, app_calls, consumed = asyncio.run(
+        call_middleware([(b"content-length", str(8 * len(CHUNK)).encode())], [CHUNK] * 8)
+    )
+    assert response_status(sent) == 200
+    assert app_calls == ["/virtual-tryon/try-async"]
+    assert consumed == 8
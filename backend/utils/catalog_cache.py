@@ -0,0 +1,79 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class CatalogPageCache:
+    """
+    Bounded in-process LRU of serialized catalog pages.
+
+    Sits in front of the stored catalog so hot category pages are answered
+    without touching MongoDB or re-validating products. Entries are keyed
+    by (cache key, page, perPage) and hold the JSON body exactly as it is
+    sent to the client.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, body = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key: Tuple, body: bytes, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, cache_key: str):
+        """Drop every page of one category entry after it was refreshed"""
+        for key in [key for key in self._entries if key[0] == cache_key]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": sum(len(body) for _, body in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+catalog_page_cache = CatalogPageCache(
+    max_entries=settings.CATALOG_MEMORY_CACHE_MAX_PAGES,
+    ttl_seconds=settings.CATALOG_MEMORY_CACHE_TTL_SECONDS
+)
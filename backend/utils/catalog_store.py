@@ -0,0 +1,219 @@
+import logging
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# One document per category listing (category, currency, country): when it
+# was fetched, whether it is complete and which membership generation is live
+PRODUCTS_CACHE_COLLECTION = "products_cache"
+# One document per ASOS product, keyed by its ASOS id
+PRODUCTS_COLLECTION = "products"
+# (category listing, generation, rank) -> product id
+CATEGORY_PRODUCTS_COLLECTION = "category_products"
+# One document per category listing whose last ASOS refresh failed
+CATEGORY_REFRESH_FAILURES_COLLECTION = "category_refresh_failures"
+
+def market_key(currency: str, countryISO: str) -> str:
+    """Prices differ per market, so products keep one price per currency/country"""
+    return f"{currency}_{countryISO}"
+
+# Shortest word prefix indexed for type-ahead search
+MIN_SEARCH_PREFIX = 2
+
+def search_words(text: Optional[str]) -> List[str]:
+    """Lowercase words of a name, brand or query"""
+    return re.findall(r"[^\W_]+", (text or "").lower())
+
+def search_terms(product: Dict[str, Any]) -> List[str]:
+    """
+    Index terms of a product: every prefix (from MIN_SEARCH_PREFIX letters)
+    of every word in its name and brand, so a partly typed word matches
+    """
+    terms = set()
+    for word in search_words(product.get("name")) + search_words(product.get("brandName")):
+        terms.update(word[:length] for length in range(MIN_SEARCH_PREFIX, len(word) + 1))
+    return sorted(terms)
+
+def search_fields(product: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fields search reads from a stored product: its index terms and the name
+    length that breaks ties between equally scored matches
+    """
+    return {"search_terms": search_terms(product), "search_name_length": len(product.get("name") or "")}
+
+# Stored for search only, never part of the ASOS product
+SEARCH_ONLY_FIELDS = {"search_terms": 0, "search_name_length": 0}
+
+def product_from_document(document: Dict[str, Any], market: str) -> Dict[str, Any]:
+    """Turn a stored product back into the ASOS shape, with the price for one market"""
+    hidden = ("_id", "prices", "updated_at", *SEARCH_ONLY_FIELDS)
+    product = {key: value for key, value in document.items() if key not in hidden}
+    product["price"] = (document.get("prices") or {}).get(market)
+    return product
+
+async def store_category(
+    db,
+    cache_key: str,
+    products: List[Dict[str, Any]],
+    metadata: Dict[str, Any],
+    replace: bool = True
+) -> bool:
+    """
+    Store a category listing: its products, its ranked membership and its metadata.
+
+    Products are upserted once by ASOS id, so a product listed in several
+    categories is stored once, and their search terms are rebuilt with them.
+    Membership rows are written under a new generation and the listing is
+    switched to it in one update, so readers see either the old or the new
+    listing, never a mix; only the generation that update replaced is
+    deleted afterwards, so concurrent refreshes of one category never delete
+    the rows of the generation that ends up live. With replace=False the
+    listing is only created when none exists yet. Returns whether the
+    listing was stored.
+    """
+    market = market_key(metadata["currency"], metadata["countryISO"])
+    now = datetime.utcnow()
+    generation = uuid.uuid4().hex
+
+    product_writes = []
+    memberships = []
+    for product in products:
+        product_id = product.get("id")
+        if product_id is None:
+            continue
+        fields = {key: value for key, value in product.items() if key != "price"}
+        fields[f"prices.{market}"] = product.get("price")
+        # Keep the search index in step with every refresh of the product
+        fields.update(search_fields(product))
+        fields["updated_at"] = now
+        product_writes.append(UpdateOne({"_id": product_id}, {"$set": fields}, upsert=True))
+        memberships.append({"category_key": cache_key, "generation": generation, "rank": len(memberships), "product_id": product_id})
+
+    if len(memberships) < len(products):
+        logger.warning(f"Skipped {len(products) - len(memberships)} products without an id in {cache_key}")
+    if not memberships:
+        return False
+
+    await db[PRODUCTS_COLLECTION].bulk_write(product_writes, ordered=False)
+    membership_collection = db[CATEGORY_PRODUCTS_COLLECTION]
+    await membership_collection.insert_many(memberships, ordered=False)
+
+    listing = {**metadata, "generation": generation, "product_count": len(memberships)}
+    listing.setdefault("last_updated", now)
+    if replace:
+        replaced = await db[PRODUCTS_CACHE_COLLECTION].find_one_and_update(
+            {"_id": cache_key},
+            # Drop the embedded products array of listings stored before normalization
+            {"$set": listing, "$unset": {"products": ""}},
+            projection={"generation": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+        if replaced and replaced.get("generation"):
+            await membership_collection.delete_many({"category_key": cache_key, "generation": replaced["generation"]})
+        return True
+
+    result = await db[PRODUCTS_CACHE_COLLECTION].update_one({"_id": cache_key}, {"$setOnInsert": listing}, upsert=True)
+    if result.upserted_id is None:
+        await membership_collection.delete_many({"category_key": cache_key, "generation": generation})
+        return False
+    return True
+
+async def record_refresh_failure(db, cache_key: str, error: Exception):
+    """Remember that refreshing a listing from ASOS failed, so it is not retried at once"""
+    await db[CATEGORY_REFRESH_FAILURES_COLLECTION].update_one(
+        {"_id": cache_key},
+        {"$set": {"failed_at": datetime.utcnow(), "error": str(error)[:500]}, "$inc": {"failures": 1}},
+        upsert=True
+    )
+
+async def clear_refresh_failure(db, cache_key: str):
+    await db[CATEGORY_REFRESH_FAILURES_COLLECTION].delete_one({"_id": cache_key})
+
+async def refresh_backed_off(db, cache_key: str) -> bool:
+    """Whether a listing's last refresh failed less than CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS ago"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS)
+    return await db[CATEGORY_REFRESH_FAILURES_COLLECTION].find_one({"_id": cache_key, "failed_at": {"$gt": cutoff}}, {"_id": 1}) is not None
+
+async def get_listing(db, cache_key: str) -> Optional[Dict[str, Any]]:
+    """Metadata of a stored category listing, or None"""
+    return await db[PRODUCTS_CACHE_COLLECTION].find_one({"_id": cache_key}, {"products": 0})
+
+async def read_category_slice(db, listing: Dict[str, Any], start_idx: int, count: int) -> List[Dict[str, Any]]:
+    """
+    Products ranked [start_idx, start_idx + count) of a listing.
+
+    One indexed range read over the membership rows and one _id lookup for
+    the products they name, whatever the depth of the page.
+    """
+    cursor = db[CATEGORY_PRODUCTS_COLLECTION].find(
+        {"category_key": listing["_id"], "generation": listing["generation"], "rank": {"$gte": start_idx, "$lt": start_idx + count}},
+        {"_id": 0, "product_id": 1},
+        sort=[("rank", 1)]
+    )
+    product_ids = [row["product_id"] async for row in cursor]
+    if not product_ids:
+        return []
+
+    documents = {}
+    async for document in db[PRODUCTS_COLLECTION].find({"_id": {"$in": product_ids}}, dict(SEARCH_ONLY_FIELDS)):
+        documents[document["_id"]] = document
+
+    market = market_key(listing["currency"], listing["countryISO"])
+    return [product_from_document(documents[product_id], market) for product_id in product_ids if product_id in documents]
+
+def _matches(field: str, pattern: str) -> Dict[str, Any]:
+    return {"$regexMatch": {"input": {"$ifNull": [field, ""]}, "regex": pattern, "options": "i"}}
+
+def search_score_expression(query_words: List[str]) -> Dict[str, Any]:
+    """
+    Aggregation expression scoring a matching product: whole-word matches
+    in the name outrank brand matches, which outrank prefixes, and a
+    multi-word query found as a phrase in the name scores extra
+    """
+    scores = []
+    for word in query_words:
+        whole_word = rf"(?<![^\W_]){re.escape(word)}(?![^\W_])"
+        scores.append({"$cond": [_matches("$name", whole_word), 3, {"$cond": [_matches("$brandName", whole_word), 2, 1]}]})
+    if len(query_words) > 1:
+        scores.append({"$cond": [_matches("$name", re.escape(" ".join(query_words))), 2, 0]})
+    return {"$add": scores}
+
+async def search_products(db, query: str, currency: str, countryISO: str, start_idx: int, count: int) -> List[Dict[str, Any]]:
+    """
+    Products of one market matching every word of the query, best first.
+
+    Each query word must equal a word or word prefix of the product's name
+    or brand, which the multikey index on search_terms answers directly.
+    Matches are ranked inside the database by search_score_expression,
+    then by shorter (more specific) names, then by id, so every page comes
+    from one stable ranking of all matches. Pages end at rank
+    CATALOG_SEARCH_MAX_CANDIDATES, which bounds the sort to a top-k.
+    """
+    query_words = [word for word in search_words(query) if len(word) >= MIN_SEARCH_PREFIX]
+    end_idx = min(start_idx + count, settings.CATALOG_SEARCH_MAX_CANDIDATES)
+    if not query_words or start_idx >= end_idx:
+        return []
+
+    market = market_key(currency, countryISO)
+    cursor = db[PRODUCTS_COLLECTION].aggregate([
+        {"$match": {"search_terms": {"$all": query_words}, f"prices.{market}": {"$exists": True}}},
+        {"$addFields": {
+            "search_score": search_score_expression(query_words),
+            # Products stored before the length was recorded rank last among equals
+            "search_name_length": {"$ifNull": ["$search_name_length", 1 << 30]}
+        }},
+        {"$sort": {"search_score": -1, "search_name_length": 1, "_id": 1}},
+        {"$skip": start_idx},
+        {"$limit": end_idx - start_idx},
+        {"$project": {**SEARCH_ONLY_FIELDS, "search_score": 0}}
+    ])
+    return [product_from_document(document, market) async for document in cursor]
@@ -0,0 +1,153 @@
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+from fastapi import HTTPException
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(HTTPException):
+    """503 raised without calling the provider while its circuit is open"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"{name} is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker for an outbound dependency.
+
+    Closed: calls go through and their outcome and latency are recorded.
+    Once the window holds at least min_calls, the circuit opens if the
+    error rate reaches error_rate_threshold or the p95 latency exceeds
+    latency_threshold.
+
+    Open: calls fail immediately with CircuitOpenError for open_seconds.
+
+    Half-open: up to half_open_max_calls trial calls are let through.
+    That many successes close the circuit again; a failed or slow trial
+    reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float,
+        min_calls: int,
+        error_rate_threshold: float,
+        latency_threshold: float,
+        open_seconds: float,
+        half_open_max_calls: int
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.latency_threshold = latency_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self.state = "closed"
+        # (finished_at, succeeded, latency_seconds) of recent calls
+        self._calls: Deque[Tuple[float, bool, float]] = deque()
+        self._opened_at = 0.0
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+        self.rejected = 0
+
+    def _trim(self, now: float):
+        while self._calls and now - self._calls[0][0] > self.window_seconds:
+            self._calls.popleft()
+
+    def _window_stats(self) -> Tuple[float, float]:
+        if not self._calls:
+            return 0.0, 0.0
+        failures = sum(1 for _, succeeded, _ in self._calls if not succeeded)
+        latencies = sorted(latency for _, _, latency in self._calls)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        return failures / len(self._calls), p95
+
+    def _open(self, reason: str):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+        logger.error(f"{self.name} circuit opened: {reason}")
+
+    def _close(self):
+        self.state = "closed"
+        self._calls.clear()
+        logger.info(f"{self.name} circuit closed")
+
+    def raise_if_open(self):
+        """Raise CircuitOpenError while open, without admitting a call"""
+        if self.state == "open":
+            remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, max(1, math.ceil(remaining)))
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError"""
+        self.raise_if_open()
+        if self.state == "open":
+            self.state = "half_open"
+            logger.info(f"{self.name} circuit half-open, sending trial calls")
+
+        if self.state == "half_open":
+            if self._trials_in_flight >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, 1)
+            self._trials_in_flight += 1
+
+    def record(self, succeeded: bool, latency: float):
+        """Record the outcome of a call admitted by before_call"""
+        slow = latency > self.latency_threshold
+
+        if self.state == "half_open":
+            self._trials_in_flight = max(0, self._trials_in_flight - 1)
+            if not succeeded or slow:
+                self._open(f"trial call {'failed' if not succeeded else f'took {latency:.1f}s'}")
+                return
+            self._trial_successes += 1
+            if self._trial_successes >= self.half_open_max_calls:
+                self._close()
+            return
+
+        if self.state == "open":
+            # A call admitted before the circuit opened finished late
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, succeeded, latency))
+        self._trim(now)
+        if len(self._calls) < self.min_calls:
+            return
+
+        error_rate, p95 = self._window_stats()
+        if error_rate >= self.error_rate_threshold:
+            self._open(f"error rate {error_rate:.0%} over the last {len(self._calls)} calls")
+        elif p95 > self.latency_threshold:
+            self._open(f"p95 latency {p95:.1f}s over the last {len(self._calls)} calls")
+
+    def cancel(self):
+        """Forget an admitted call that was cancelled before it finished"""
+        if self.state == "half_open":
+            self._trials_in_flight = max(0, self._trials_in_flight - 1)
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        error_rate, p95 = self._window_stats()
+        return {
+            "state": self.state,
+            "window_calls": len(self._calls),
+            "error_rate": round(error_rate, 3),
+            "p95_latency_seconds": round(p95, 3),
+            "rejected": self.rejected
+        }
@@ -0,0 +1,238 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def _sub(name: str) -> str:
+    """
+    Name of a collection the try-on code reaches as db[settings.DB_NAME][name].
+
+    get_database() already returns the DB_NAME database, so those
+    collections really live at "<DB_NAME>.<name>" inside it, next to the
+    top-level users/device_tokens/... collections the other routes use.
+    """
+    return f"{settings.DB_NAME}.{name}"
+
+# Only index documents where the field is a real value, so records that
+# store it as None never collide on a unique index
+def _present(field: str) -> Dict[str, Any]:
+    return {"partialFilterExpression": {field: {"$type": "string"}}}
+
+def required_indexes() -> List[Dict[str, Any]]:
+    """
+    Every index the application relies on.
+
+    Each entry names the collection, the key pattern and any create_index
+    options (unique, TTL, partial filter). Index names are left to MongoDB's
+    defaults so indexes created by hand with the same keys are recognised.
+    """
+    return [
+        # Auth, profile and webhook lookups
+        {"collection": "users", "keys": [("email", ASCENDING)], "options": {"unique": True}},
+        {"collection": "users", "keys": [("revenuecat_id", ASCENDING)], "options": _present("revenuecat_id")},
+
+        # Push notifications and the scheduler
+        {"collection": "device_tokens", "keys": [("token", ASCENDING)], "options": {"unique": True}},
+        {"collection": "device_tokens", "keys": [("user_id", ASCENDING), ("active", ASCENDING)], "options": {}},
+        {"collection": "device_tokens", "keys": [("updated_at", ASCENDING)], "options": {}},
+        {"collection": "notification_preferences", "keys": [("user_id", ASCENDING)], "options": {"unique": True}},
+        {
+            "collection": "notification_preferences",
+            "keys": [("preferences.enabled", ASCENDING), ("preferences.frequency", ASCENDING)],
+            "options": {}
+        },
+        {"collection": "user_engagement", "keys": [("user_id", ASCENDING)], "options": {"unique": True}},
+        {"collection": "tryon_usage", "keys": [("user_id", ASCENDING)], "options": _present("user_id")},
+
+        # Catalog: ranked page reads of a category listing, and the image lookup
+        # behind find_catalog_image_url (product ids are the _id)
+        {
+            "collection": "category_products",
+            "keys": [("category_key", ASCENDING), ("generation", ASCENDING), ("rank", ASCENDING)],
+            "options": {"unique": True}
+        },
+        {"collection": "products", "keys": [("imageUrl", ASCENDING)], "options": {}},
+        # Word and prefix matching behind /products/search
+        {"collection": "products", "keys": [("search_terms", ASCENDING)], "options": {}},
+        # Failed refreshes only matter for their backoff period
+        {
+            "collection": "category_refresh_failures",
+            "keys": [("failed_at", ASCENDING)],
+            "options": {"expireAfterSeconds": settings.CATALOG_REFRESH_FAILURE_BACKOFF_SECONDS}
+        },
+
+        # Try-on usage: one record per device and one per user
+        {"collection": _sub("tryon_usage"), "keys": [("device_id", ASCENDING)], "options": {"unique": True, **_present("device_id")}},
+        {"collection": _sub("tryon_usage"), "keys": [("user_id", ASCENDING)], "options": {"unique": True, **_present("user_id")}},
+        {"collection": _sub("user_engagement"), "keys": [("user_id", ASCENDING)], "options": {"unique": True}},
+
+        # Try-on predictions: status lookups, the result cache, the poller and the output mirror
+        # Records missing both id fields must not collide on the unique index; equality
+        # lookups on id still use a partial index filtered on $exists
+        {
+            "collection": _sub("tryon_predictions"),
+            "keys": [("id", ASCENDING)],
+            "options": {"unique": True, "partialFilterExpression": {"id": {"$exists": True}}}
+        },
+        {"collection": _sub("tryon_predictions"), "keys": [("prediction_id", ASCENDING)], "options": {}},
+        {
+            "collection": _sub("tryon_predictions"),
+            "keys": [("cache_key", ASCENDING), ("completed_at", DESCENDING)],
+            "options": _present("cache_key")
+        },
+        {"collection": _sub("tryon_predictions"), "keys": [("status", ASCENDING), ("next_poll_at", ASCENDING)], "options": {}},
+        {"collection": _sub("tryon_predictions"), "keys": [("poll_owner", ASCENDING)], "options": _present("poll_owner")},
+        {"collection": _sub("tryon_predictions"), "keys": [("status", ASCENDING), ("completed_at", DESCENDING)], "options": {}},
+        # Keyset pagination of /virtual-tryon/history
+        {
+            "collection": _sub("tryon_predictions"),
+            "keys": [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            "options": _present("user_id")
+        },
+
+        # Prediction retention: the archive job scans by age, the TTL drops what it archived
+        {"collection": _sub("tryon_predictions"), "keys": [("created_at", ASCENDING)], "options": {}},
+        {
+            "collection": _sub("tryon_predictions"),
+            "keys": [("archived_at", ASCENDING)],
+            "options": {"expireAfterSeconds": settings.TRYON_ARCHIVE_GRACE_HOURS * 60 * 60}
+        },
+
+        # Stored model photos, deduplicated per owner and dropped once unused for a while
+        {"collection": _sub("model_photos"), "keys": [("user_id", ASCENDING), ("digest", ASCENDING)], "options": _present("user_id")},
+        {"collection": _sub("model_photos"), "keys": [("device_id", ASCENDING), ("digest", ASCENDING)], "options": _present("device_id")},
+        {
+            "collection": _sub("model_photos"),
+            "keys": [("last_used", ASCENDING)],
+            "options": {"expireAfterSeconds": settings.MODEL_PHOTO_TTL_DAYS * 24 * 60 * 60}
+        },
+
+        # Idempotency-Key records replay for IDEMPOTENCY_KEY_TTL_SECONDS
+        {
+            "collection": _sub("idempotency_keys"),
+            "keys": [("created_at", ASCENDING)],
+            "options": {"expireAfterSeconds": settings.IDEMPOTENCY_KEY_TTL_SECONDS}
+        },
+    ]
+
+async def backfill_prediction_ids(db) -> int:
+    """
+    Copy prediction_id into id on predictions that only have the former.
+
+    /try-async used to store its predictions under prediction_id alone,
+    while status, history, the poller and the output mirror all look
+    predictions up by id. Runs as one server-side update and matches
+    nothing once every record has been backfilled. Returns the number fixed.
+    """
+    predictions_collection = db[_sub("tryon_predictions")]
+    result = await predictions_collection.update_many(
+        {"id": {"$exists": False}, "prediction_id": {"$type": "string"}},
+        [{"$set": {"id": "$prediction_id"}}]
+    )
+    if result.modified_count:
+        logger.info(f"Backfilled id on {result.modified_count} predictions stored with prediction_id only")
+    return result.modified_count
+
+async def backfill_next_poll_times(db) -> int:
+    """
+    Make pending predictions stored without next_poll_at due now.
+
+    The poller only claims predictions with a next_poll_at, so ones that
+    were pending when it started tracking that field would otherwise never
+    be polled again, nor time out. Like backfill_prediction_ids this is a
+    single server-side update that matches nothing once done. Returns the
+    number fixed.
+    """
+    predictions_collection = db[_sub("tryon_predictions")]
+    result = await predictions_collection.update_many(
+        # Terminal statuses as in utils.prediction_poller
+        {"status": {"$nin": ["completed", "failed"]}, "next_poll_at": {"$exists": False}},
+        {"$set": {"next_poll_at": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        logger.info(f"Scheduled {result.modified_count} pending predictions stored without next_poll_at for polling")
+    return result.modified_count
+
+async def ensure_indexes(db) -> int:
+    """
+    Create every required index that does not exist yet.
+
+    create_index is a no-op for an index that already exists, so this is
+    safe to run on every startup. A failing index (duplicate values under a
+    new unique index, changed options) is logged and skipped so the others
+    are still created. Predictions are backfilled with their id and poll
+    time first so the indexes on them cover old records too. Returns the
+    number of indexes that failed.
+    """
+    try:
+        await backfill_prediction_ids(db)
+    except OperationFailure as e:
+        logger.error(f"Could not backfill prediction ids: {str(e)}")
+    try:
+        await backfill_next_poll_times(db)
+    except OperationFailure as e:
+        logger.error(f"Could not backfill prediction poll times: {str(e)}")
+
+    failures = 0
+    for spec in required_indexes():
+        try:
+            await db[spec["collection"]].create_index(spec["keys"], **spec["options"])
+        except OperationFailure as e:
+            failures += 1
+            logger.error(f"Could not create index {spec['keys']} on {spec['collection']}: {str(e)}")
+    if failures:
+        logger.error(f"{failures} required index(es) could not be created; run scripts/check_indexes.py")
+    else:
+        logger.info("Database indexes are in place")
+    return failures
+
+def _key_pattern(keys) -> tuple:
+    return tuple((field, int(direction)) for field, direction in keys)
+
+async def index_report(db) -> List[Dict[str, Any]]:
+    """
+    Compare the required indexes with what the database has.
+
+    Returns one row per index with its collection, key pattern and a status:
+    "ok", "missing" (required but absent), "unused" (required or not, but
+    never used since the server last restarted) or "undeclared" (present
+    but not required by the application).
+    """
+    required: Dict[str, set] = {}
+    for spec in required_indexes():
+        required.setdefault(spec["collection"], set()).add(_key_pattern(spec["keys"]))
+
+    existing_names = set(await db.list_collection_names())
+    rows = []
+    for collection_name in sorted(existing_names | set(required)):
+        present: Dict[tuple, str] = {}
+        usage: Dict[str, int] = {}
+        if collection_name in existing_names:
+            collection = db[collection_name]
+            async for index in collection.list_indexes():
+                present[_key_pattern(index["key"].items())] = index["name"]
+            try:
+                async for stats in collection.aggregate([{"$indexStats": {}}]):
+                    usage[stats["name"]] = stats["accesses"]["ops"]
+            except OperationFailure:
+                # $indexStats needs the clusterMonitor role; report without usage then
+                pass
+
+        for key_pattern in sorted(required.get(collection_name, set())):
+            name = present.get(key_pattern)
+            status = "missing" if name is None else "unused" if usage.get(name) == 0 else "ok"
+            rows.append({"collection": collection_name, "keys": key_pattern, "name": name, "status": status, "ops": usage.get(name)})
+
+        for key_pattern, name in present.items():
+            if key_pattern in required.get(collection_name, set()) or name == "_id_":
+                continue
+            status = "unused" if usage.get(name) == 0 else "undeclared"
+            rows.append({"collection": collection_name, "keys": key_pattern, "name": name, "status": status, "ops": usage.get(name)})
+    return rows
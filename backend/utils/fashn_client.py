@@ -0,0 +1,159 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from config import settings
+from utils.circuit_breaker import CircuitBreaker
+from utils.fashn_scheduler import fashn_scheduler
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+FASHN_API_BASE_URL = "https://api.fashn.ai/v1"
+
+# Shared client, created lazily on first use and closed on app shutdown
+_client: Optional[httpx.AsyncClient] = None
+
+# Trips on FASHN /run errors or slowness so submissions fail fast during incidents
+fashn_breaker = CircuitBreaker(
+    name="Try-on service",
+    window_seconds=settings.FASHN_BREAKER_WINDOW_SECONDS,
+    min_calls=settings.FASHN_BREAKER_MIN_CALLS,
+    error_rate_threshold=settings.FASHN_BREAKER_ERROR_RATE,
+    latency_threshold=settings.FASHN_BREAKER_P95_LATENCY_SECONDS,
+    open_seconds=settings.FASHN_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.FASHN_BREAKER_HALF_OPEN_CALLS
+)
+
+# Status checks are many, fast and made by the poller; kept in their own
+# window so they neither hide slow submissions nor fail them fast
+fashn_status_breaker = CircuitBreaker(
+    name="Try-on status service",
+    window_seconds=settings.FASHN_BREAKER_WINDOW_SECONDS,
+    min_calls=settings.FASHN_BREAKER_MIN_CALLS,
+    error_rate_threshold=settings.FASHN_BREAKER_ERROR_RATE,
+    latency_threshold=settings.FASHN_STATUS_BREAKER_P95_LATENCY_SECONDS,
+    open_seconds=settings.FASHN_BREAKER_OPEN_SECONDS,
+    half_open_max_calls=settings.FASHN_BREAKER_HALF_OPEN_CALLS
+)
+
+def get_fashn_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide async FASHN client.
+
+    The client keeps connections to api.fashn.ai alive between calls, so
+    concurrent try-ons share one pool instead of opening a socket each.
+    """
+    global _client
+
+    if _client is None or _client.is_closed:
+        limits = httpx.Limits(
+            max_connections=settings.FASHN_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.FASHN_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.FASHN_KEEPALIVE_EXPIRY
+        )
+        timeout = httpx.Timeout(
+            settings.FASHN_RUN_TIMEOUT,
+            connect=settings.FASHN_CONNECT_TIMEOUT,
+            pool=settings.FASHN_POOL_TIMEOUT
+        )
+        _client = httpx.AsyncClient(
+            base_url=FASHN_API_BASE_URL,
+            limits=limits,
+            timeout=timeout
+        )
+        logger.info(
+            f"Created FASHN client (max_connections={settings.FASHN_MAX_CONNECTIONS}, "
+            f"keepalive={settings.FASHN_MAX_KEEPALIVE_CONNECTIONS})"
+        )
+
+    return _client
+
+async def close_fashn_client():
+    """Close the shared FASHN client and release its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("FASHN client closed")
+
+async def _guarded(breaker: CircuitBreaker, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    """
+    Run a FASHN request through a circuit breaker.
+
+    Transport errors, 429s and 5xx responses count as failures; other
+    statuses (such as a 400 for a rejected payload) count as successes
+    because the provider itself is healthy. A PoolTimeout means our own
+    connection pool was exhausted and the request never reached FASHN,
+    so it is not recorded at all.
+    """
+    breaker.before_call()
+    start_time = time.monotonic()
+    try:
+        response = await send()
+    except httpx.PoolTimeout:
+        breaker.cancel()
+        raise
+    except httpx.HTTPError:
+        breaker.record(False, time.monotonic() - start_time)
+        raise
+    except BaseException:
+        breaker.cancel()
+        raise
+    succeeded = response.status_code < 500 and response.status_code != 429
+    breaker.record(succeeded, time.monotonic() - start_time)
+    return response
+
+def _auth_headers(extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    headers = {"Authorization": f"Bearer {settings.FASHN_API_KEY}"}
+    if extra:
+        headers.update(extra)
+    return headers
+
+async def run_prediction(
+    json: Optional[Dict[str, Any]] = None,
+    files: Optional[Dict[str, Any]] = None,
+    data: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: Optional[float] = None,
+    premium: bool = False
+) -> httpx.Response:
+    """
+    Submit a try-on run to FASHN.
+
+    Accepts the same payload shapes the routes already use (JSON body,
+    multipart files/data or query params). Each call first takes a slot
+    from fashn_scheduler, with premium callers served first, and raises
+    FashnQueueFullError (a 503) when the queue is full. Raises
+    CircuitOpenError (a 503) without calling FASHN while fashn_breaker is
+    open, and httpx.HTTPError on transport failures; HTTP error statuses
+    are returned to the caller.
+    """
+    client = get_fashn_client()
+    # Fail fast before queueing if the provider is known to be down
+    fashn_breaker.raise_if_open()
+    await fashn_scheduler.acquire(premium=premium)
+    start_time = time.monotonic()
+    try:
+        return await _guarded(fashn_breaker, lambda: client.post(
+            "/run",
+            json=json,
+            files=files,
+            data=data,
+            params=params,
+            headers=_auth_headers(),
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+        ))
+    finally:
+        fashn_scheduler.release(time.monotonic() - start_time)
+
+async def get_prediction_status(prediction_id: str, timeout: Optional[float] = None) -> httpx.Response:
+    """Fetch the current status of a FASHN prediction (guarded by fashn_status_breaker)"""
+    client = get_fashn_client()
+    return await _guarded(fashn_status_breaker, lambda: client.get(
+        f"/status/{prediction_id}",
+        headers=_auth_headers(),
+        timeout=timeout if timeout is not None else settings.FASHN_STATUS_TIMEOUT
+    ))
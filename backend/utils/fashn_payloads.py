@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
+
+from utils import fashn_client
+from utils.image_utils import convert_to_data_uri
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# An image sent to FASHN: a public URL, or normalized (bytes, mime type)
+TryOnImage = Union[str, Tuple[bytes, str]]
+
+# Request shapes FASHN has accepted for /run, in the order they are tried
+# before one is known to work:
+#   json_bool         - JSON body, data URIs, real booleans (documented format)
+#   json_string_bool  - JSON body, data URIs, "true"/"false" strings
+#   multipart         - image files with the options as form fields
+#   multipart_params  - image files with the options as query parameters
+PAYLOAD_FORMATS = ("json_bool", "json_string_bool", "multipart", "multipart_params")
+JSON_FORMATS = ("json_bool", "json_string_bool")
+
+# Format accepted last, per FASHN endpoint version
+_accepted_formats: Dict[str, str] = {}
+
+def _endpoint_version() -> str:
+    return f"{fashn_client.FASHN_API_BASE_URL}/run"
+
+def accepted_format() -> Optional[str]:
+    """The format FASHN accepted most recently for the current endpoint version"""
+    return _accepted_formats.get(_endpoint_version())
+
+class _EncodedImages:
+    """Encodes each image at most once, however many formats are tried"""
+
+    def __init__(self, model_image: TryOnImage, garment_image: TryOnImage):
+        self.images = {"model_image": model_image, "garment_image": garment_image}
+        self._data_uris: Dict[str, str] = {}
+
+    async def data_uri(self, field: str) -> str:
+        image = self.images[field]
+        if isinstance(image, str):
+            return image
+        if field not in self._data_uris:
+            self._data_uris[field] = await asyncio.to_thread(convert_to_data_uri, image[0], image[1])
+        return self._data_uris[field]
+
+    def file(self, field: str) -> tuple:
+        contents, mime_type = self.images[field]
+        extension = "png" if mime_type == "image/png" else "webp" if mime_type == "image/webp" else "jpg"
+        return f"{field.split('_')[0]}.{extension}", contents, mime_type
+
+async def _build_request(fmt: str, images: _EncodedImages, options: Dict[str, Any]) -> Dict[str, Any]:
+    segmentation_free = str(options.get("segmentation_free", "false")).lower() == "true"
+    fields = {
+        "category": options.get("category", "auto"),
+        "mode": options.get("mode", "balanced"),
+        "moderation_level": options.get("moderation_level", "permissive")
+    }
+
+    if fmt in JSON_FORMATS:
+        return {"json": {
+            "model_image": await images.data_uri("model_image"),
+            "garment_image": await images.data_uri("garment_image"),
+            **fields,
+            "segmentation_free": segmentation_free if fmt == "json_bool" else str(segmentation_free).lower()
+        }}
+
+    files = {field: images.file(field) for field in ("model_image", "garment_image")}
+    form = {**fields, "segmentation_free": str(segmentation_free).lower()}
+    if fmt == "multipart":
+        return {"files": files, "data": form}
+    return {"files": files, "params": form}
+
+async def submit_prediction(
+    model_image: TryOnImage,
+    garment_image: TryOnImage,
+    options: Dict[str, Any],
+    premium: bool = False,
+    timeout: Optional[float] = None
+) -> httpx.Response:
+    """
+    Submit a try-on run in the request shape FASHN is known to accept.
+
+    The accepted format is sent first. Other formats are only tried when
+    FASHN rejects it with a 400, and whichever one then succeeds becomes
+    the new accepted format. Multipart formats need uploaded bytes, so a
+    garment given by URL is only ever sent as JSON.
+
+    Returns the last FASHN response; raises like fashn_client.run_prediction.
+    """
+    endpoint = _endpoint_version()
+    candidates = JSON_FORMATS if isinstance(model_image, str) or isinstance(garment_image, str) else PAYLOAD_FORMATS
+    known = _accepted_formats.get(endpoint)
+    order = [known] + [fmt for fmt in candidates if fmt != known] if known in candidates else list(candidates)
+
+    images = _EncodedImages(model_image, garment_image)
+    response = None
+    for fmt in order:
+        request = await _build_request(fmt, images, options)
+        response = await fashn_client.run_prediction(**request, timeout=timeout, premium=premium)
+        if response.status_code != 400:
+            if response.status_code == 200 and known != fmt:
+                _accepted_formats[endpoint] = fmt
+                logger.info(f"FASHN accepted the {fmt} payload format; using it for later runs")
+            return response
+        logger.info(f"FASHN rejected the {fmt} payload format: {response.text[:200]}")
+
+    return response
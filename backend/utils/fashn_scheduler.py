@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# How many recent queue waits the wait-time percentiles are computed over
+WAIT_SAMPLE_SIZE = 500
+
+class FashnQueueFullError(HTTPException):
+    """503 raised instead of queueing a FASHN run without bound"""
+
+    def __init__(self, retry_after: int, detail: str = "Try-on service is busy, please retry shortly"):
+        super().__init__(status_code=503, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+class FashnSubmissionScheduler:
+    """
+    Caps how many FASHN runs this worker has in flight at once.
+
+    Callers beyond the cap wait in one of two FIFO lanes. Freed slots go to
+    the premium lane first. When both lanes together hold max_queue callers,
+    or a caller has waited max_wait seconds, FashnQueueFullError is raised
+    so the client backs off instead of piling up behind FASHN.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._lanes: Dict[str, Deque[asyncio.Future]] = {"premium": deque(), "standard": deque()}
+        self._waits: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._avg_run_seconds = 5.0
+        self.admitted = 0
+        self.rejected = 0
+
+    def queue_depth(self) -> int:
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def _retry_after(self) -> int:
+        # Roughly how long until the current queue drains
+        drain = (self.queue_depth() + 1) * self._avg_run_seconds / max(1, self.max_concurrency)
+        return max(1, math.ceil(drain))
+
+    async def acquire(self, premium: bool = False):
+        """Wait for a run slot, or raise FashnQueueFullError"""
+        if self.active < self.max_concurrency and not self.queue_depth():
+            self.active += 1
+            self.admitted += 1
+            self._waits.append(0.0)
+            return
+
+        if self.queue_depth() >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"FASHN queue full ({self.queue_depth()} waiting, {self.active} running)")
+            raise FashnQueueFullError(self._retry_after())
+
+        lane = self._lanes["premium" if premium else "standard"]
+        future = asyncio.get_running_loop().create_future()
+        lane.append(future)
+        start_time = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if not future.done():
+                lane.remove(future)
+                future.cancel()
+                self.rejected += 1
+                raise FashnQueueFullError(self._retry_after())
+            # Otherwise the slot was handed over just as the wait expired
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was already ours; pass it on
+                self.release()
+            elif future in lane:
+                lane.remove(future)
+            raise
+
+        self.admitted += 1
+        self._waits.append(time.monotonic() - start_time)
+
+    def release(self, run_seconds: Optional[float] = None):
+        """Return a slot and hand it to the next waiter, premium lane first"""
+        if run_seconds is not None:
+            self._avg_run_seconds = 0.9 * self._avg_run_seconds + 0.1 * run_seconds
+        for lane in (self._lanes["premium"], self._lanes["standard"]):
+            while lane:
+                future = lane.popleft()
+                if not future.done():
+                    # The slot moves to the waiter without freeing it
+                    future.set_result(None)
+                    return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(fraction: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))], 3)
+
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_premium": len(self._lanes["premium"]),
+            "queue_depth_standard": len(self._lanes["standard"]),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds_p50": percentile(0.5),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_max": round(waits[-1], 3) if waits else 0.0,
+            "avg_run_seconds": round(self._avg_run_seconds, 3)
+        }
+
+fashn_scheduler = FashnSubmissionScheduler(
+    max_concurrency=settings.FASHN_MAX_CONCURRENT_RUNS,
+    max_queue=settings.FASHN_QUEUE_MAX_SIZE,
+    max_wait=settings.FASHN_QUEUE_MAX_WAIT_SECONDS
+)
@@ -0,0 +1,165 @@
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Longest Idempotency-Key header accepted
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Events set when an in-flight request on this worker finishes, keyed by record id
+_release_events: Dict[str, asyncio.Event] = {}
+
+def get_idempotency_collection(db):
+    """Return the collection recording Idempotency-Key submissions"""
+    return db[settings.DB_NAME]["idempotency_keys"]
+
+def request_fingerprint(*parts: Any) -> str:
+    """
+    Digest of a submission's inputs (uploaded bytes and form values).
+
+    Stored with the key so a retry can be told apart from a different
+    request that reuses the same key.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode("utf-8")
+        digest.update(hashlib.sha256(data).digest())
+    return digest.hexdigest()
+
+def _notify_released(record_id: str):
+    event = _release_events.pop(record_id, None)
+    if event is not None:
+        event.set()
+
+class IdempotentRequest:
+    """
+    Handle on one Idempotency-Key claim.
+
+    `response` is set when an earlier request with the same key already
+    finished; the caller should return it as-is. Otherwise the caller owns
+    the key and must call complete() with its response or abandon() when
+    it fails, so that retries can run again.
+    """
+
+    def __init__(self, collection=None, record_id: Optional[str] = None, response: Optional[Dict[str, Any]] = None):
+        self.collection = collection
+        self.record_id = record_id
+        self.response = response
+
+    async def complete(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        """Store the response for replay and return it"""
+        if self.record_id is not None:
+            await self.collection.update_one(
+                {"_id": self.record_id},
+                {"$set": {"status": "completed", "response": response, "completed_at": datetime.utcnow()}}
+            )
+            _notify_released(self.record_id)
+            self.record_id = None
+        return response
+
+    async def abandon(self):
+        """Release the key after a failure so a retry starts from scratch"""
+        if self.record_id is not None:
+            await self.collection.delete_one({"_id": self.record_id, "status": "in_progress"})
+            _notify_released(self.record_id)
+            self.record_id = None
+
+async def _wait_for_release(record_id: str, timeout: float):
+    event = _release_events.setdefault(record_id, asyncio.Event())
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        # The key may be held by another worker, which never notifies this
+        # one; don't leave the event behind. Other local waiters still hold
+        # it and simply recheck the record after their own timeout.
+        if _release_events.get(record_id) is event:
+            del _release_events[record_id]
+
+async def begin_idempotent_request(
+    db,
+    scope: str,
+    key: Optional[str],
+    fingerprint: Optional[str] = None
+) -> IdempotentRequest:
+    """
+    Claim an Idempotency-Key for a submission.
+
+    The record _id is "<scope>:<key>", so the unique _id index makes the
+    first insert win. Duplicates wait for the winner to finish and then
+    replay its response. A claim whose lock has lapsed (the worker died
+    mid-request) is taken over. Requests without a key are not tracked.
+    The scope names the owner, and `fingerprint` (see request_fingerprint)
+    is stored with the claim so a key reused for different inputs is
+    refused rather than answered with the first request's response.
+
+    Raises:
+        HTTPException 400 for an oversized key, 409 if the first request is
+        still running after IDEMPOTENCY_WAIT_SECONDS, 422 if the key was
+        used with a different request
+    """
+    if not key:
+        return IdempotentRequest()
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+
+    collection = get_idempotency_collection(db)
+    record_id = f"{scope}:{key}"
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    lock_duration = timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+
+    while True:
+        now = datetime.utcnow()
+        try:
+            await collection.insert_one({
+                "_id": record_id,
+                "status": "in_progress",
+                "fingerprint": fingerprint,
+                "created_at": now,
+                "locked_until": now + lock_duration
+            })
+            return IdempotentRequest(collection, record_id)
+        except DuplicateKeyError:
+            pass
+
+        record = await collection.find_one({"_id": record_id})
+        if record is None:
+            # The first request failed and released the key; claim it again
+            continue
+        if fingerprint and record.get("fingerprint") not in (None, fingerprint):
+            raise HTTPException(
+                status_code=422,
+                detail="This Idempotency-Key was already used for a different request"
+            )
+        if record.get("status") == "completed":
+            logger.info(f"Replaying response for idempotency key {record_id}")
+            return IdempotentRequest(response=record.get("response"))
+
+        locked_until = record.get("locked_until")
+        if locked_until is not None and locked_until < now:
+            taken_over = await collection.find_one_and_update(
+                {"_id": record_id, "status": "in_progress", "locked_until": locked_until},
+                {"$set": {"locked_until": now + lock_duration}}
+            )
+            if taken_over:
+                logger.warning(f"Took over stale idempotency key {record_id}")
+                return IdempotentRequest(collection, record_id)
+            continue
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still being processed",
+                headers={"Retry-After": "1"}
+            )
+        await _wait_for_release(record_id, min(remaining, settings.IDEMPOTENCY_RECHECK_SECONDS))
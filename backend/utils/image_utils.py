@@ -1,7 +1,94 @@
+import asyncio
 import base64
+import io
+import logging
+import math
 import time
+from typing import Tuple
 from fastapi import UploadFile
-from log import logger
+from PIL import Image, ImageOps
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# EXIF tag holding the camera orientation
+EXIF_ORIENTATION_TAG = 0x0112
+
+def normalize_image(contents: bytes) -> Tuple[bytes, str]:
+    """
+    Prepare an uploaded photo for FASHN.
+
+    Decodes the image, applies the EXIF rotation, downsizes it to the
+    provider's working resolution (TRYON_IMAGE_MAX_PIXELS) and re-encodes
+    it as TRYON_IMAGE_FORMAT. Images that are already small, upright
+    JPEGs are returned untouched. Bytes Pillow cannot decode are passed
+    through so FASHN can report the error as before.
+
+    Returns:
+        Tuple of (image bytes, mime type)
+    """
+    start_time = time.monotonic()
+
+    try:
+        image = Image.open(io.BytesIO(contents))
+        image.load()
+    except Exception as e:
+        logger.warning(f"Could not decode image for normalization, sending as received: {str(e)}")
+        return contents, "image/jpeg"
+
+    width, height = image.size
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    output_format = settings.TRYON_IMAGE_FORMAT.upper()
+    if (
+        width * height <= settings.TRYON_IMAGE_MAX_PIXELS
+        and orientation == 1
+        and image.format == output_format
+    ):
+        return contents, Image.MIME.get(output_format, "image/jpeg")
+
+    image = ImageOps.exif_transpose(image)
+
+    # Flatten transparency onto white so garments on clear backgrounds stay visible
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+
+    pixels = image.width * image.height
+    if pixels > settings.TRYON_IMAGE_MAX_PIXELS:
+        scale = math.sqrt(settings.TRYON_IMAGE_MAX_PIXELS / pixels)
+        image = image.resize(
+            (max(1, int(image.width * scale)), max(1, int(image.height * scale))),
+            Image.LANCZOS
+        )
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=output_format, quality=settings.TRYON_IMAGE_QUALITY, optimize=True)
+    normalized = buffer.getvalue()
+
+    logger.info(
+        f"Normalized image {width}x{height} ({len(contents) / 1024:.0f} KB) -> "
+        f"{image.width}x{image.height} ({len(normalized) / 1024:.0f} KB) "
+        f"in {time.monotonic() - start_time:.3f}s"
+    )
+    return normalized, Image.MIME.get(output_format, "image/jpeg")
+
+def convert_to_data_uri(contents: bytes, mime_type: str = "image/jpeg") -> str:
+    """Build the base64 data URI FASHN accepts for inline images"""
+    encoded = base64.b64encode(contents).decode("utf-8")
+    return f"data:{mime_type};base64,{encoded}"
+
+async def prepare_image_data_uri(contents: bytes) -> str:
+    """Normalize and encode an image in a worker thread to keep the event loop free"""
+    def _prepare():
+        normalized, mime_type = normalize_image(contents)
+        return convert_to_data_uri(normalized, mime_type)
+
+    return await asyncio.to_thread(_prepare)
 
 async def encode_image_to_base64(file: UploadFile) -> str:
     """
@@ -40,15 +127,11 @@ async def encode_image_to_base64(file: UploadFile) -> str:
         read_time = time.monotonic() - start_time
         logger.info(f"File read time: {read_time:.4f}s, size: {len(contents) / 1024:.2f} KB")
     
-        # Encode to base64
+        # Normalize and encode off the event loop - FASHN API requires the full data URI format
         encode_start = time.monotonic()
-        encoded = base64.b64encode(contents).decode("utf-8")
+        data_uri = await prepare_image_data_uri(contents)
         encode_time = time.monotonic() - encode_start
-        logger.info(f"Base64 encode time: {encode_time:.4f}s, encoded size: {len(encoded)} bytes")
-    
-        # Form data URI with mime type - FASHN API requires the full data URI format
-        mime_type = file.content_type or "image/jpeg"
-        data_uri = f"data:{mime_type};base64,{encoded}"
+        logger.info(f"Normalize and encode time: {encode_time:.4f}s, encoded size: {len(data_uri)} bytes")
     
         total_time = time.monotonic() - start_time
         logger.info(f"Total encode_image_to_base64 time: {total_time:.4f}s")
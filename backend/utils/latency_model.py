@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# ETA used before any history exists for a prediction's mode/category
+DEFAULT_ETA_SECONDS = 10
+
+# Where each route stores a prediction's inputs: /try-async and /try-batch
+# under request_data, /test under params
+INPUT_FIELDS = ("request_data", "params")
+INPUT_PROJECTION = {f"{field}.{name}": 1 for field in INPUT_FIELDS for name in ("mode", "category")}
+
+def prediction_inputs(prediction: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """(mode, category) a prediction was requested with, whichever route stored it"""
+    for field in INPUT_FIELDS:
+        inputs = prediction.get(field)
+        if inputs:
+            return inputs.get("mode"), inputs.get("category")
+    return None, None
+
+def _percentile(durations: List[float], fraction: float) -> float:
+    return durations[min(len(durations) - 1, int(fraction * len(durations)))]
+
+class LatencyModel:
+    """
+    Rolling model of how long FASHN takes to finish a try-on.
+
+    Built from the created_at -> completed_at durations of recently completed
+    predictions, keyed by (mode, category) with fallbacks to mode alone and
+    to all predictions while a key has too few samples. Each key keeps its
+    median and p90 duration.
+    """
+
+    def __init__(self, sample_size: int, min_samples: int, refresh_seconds: float):
+        self.sample_size = sample_size
+        self.min_samples = min_samples
+        self.refresh_seconds = refresh_seconds
+        # key -> (p50 seconds, p90 seconds, samples)
+        self._estimates: Dict[Tuple, Tuple[float, float, int]] = {}
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fit(self, samples: List[Tuple[str, str, float]]):
+        grouped: Dict[Tuple, List[float]] = defaultdict(list)
+        for mode, category, seconds in samples:
+            grouped[(mode, category)].append(seconds)
+            grouped[(mode, None)].append(seconds)
+            grouped[(None, None)].append(seconds)
+
+        estimates = {}
+        for key, durations in grouped.items():
+            if len(durations) < self.min_samples:
+                continue
+            durations.sort()
+            estimates[key] = (_percentile(durations, 0.5), _percentile(durations, 0.9), len(durations))
+        self._estimates = estimates
+
+    async def refresh(self, predictions_collection):
+        """Rebuild the estimates from the most recent completed predictions"""
+        cutoff = datetime.utcnow() - timedelta(hours=settings.TRYON_LATENCY_WINDOW_HOURS)
+        cursor = predictions_collection.find(
+            {"status": "completed", "completed_at": {"$gte": cutoff}, "created_at": {"$ne": None}},
+            {"_id": 0, "created_at": 1, "completed_at": 1, **INPUT_PROJECTION},
+            sort=[("completed_at", -1)],
+            limit=self.sample_size
+        )
+        samples = []
+        async for prediction in cursor:
+            seconds = (prediction["completed_at"] - prediction["created_at"]).total_seconds()
+            if seconds <= 0:
+                continue
+            mode, category = prediction_inputs(prediction)
+            samples.append((mode or "balanced", category or "auto", seconds))
+        self._fit(samples)
+        self._refreshed_at = time.monotonic()
+        logger.debug(f"Latency model refreshed from {len(samples)} completed predictions")
+
+    async def refresh_if_stale(self, predictions_collection):
+        """Refresh when older than refresh_seconds; concurrent callers share one refresh"""
+        if time.monotonic() - self._refreshed_at < self.refresh_seconds or self._lock.locked():
+            return
+        async with self._lock:
+            await self.refresh(predictions_collection)
+
+    def estimate(self, mode: Optional[str], category: Optional[str]) -> Optional[Tuple[float, float]]:
+        """(p50, p90) total duration in seconds, or None without enough history"""
+        for key in ((mode, category), (mode, None), (None, None)):
+            if key in self._estimates:
+                p50, p90, _ = self._estimates[key]
+                return p50, p90
+        return None
+
+    def remaining_seconds(self, prediction: Dict[str, Any], now: Optional[datetime] = None) -> int:
+        """
+        Expected seconds until a pending prediction finishes.
+
+        Uses the median duration while the prediction is younger than it,
+        then the p90, and after that the shortest poll delay. Falls back to
+        the provider's ETA when there is no history yet.
+        """
+        estimate = self.estimate(*prediction_inputs(prediction))
+        created_at = prediction.get("created_at")
+        if estimate is None or created_at is None:
+            return prediction.get("eta") or DEFAULT_ETA_SECONDS
+
+        elapsed = ((now or datetime.utcnow()) - created_at).total_seconds()
+        p50, p90 = estimate
+        target = p50 if elapsed < p50 else p90
+        return max(math.ceil(target - elapsed), math.ceil(settings.PREDICTION_POLL_MIN_DELAY))
+
+    def retry_after(self, prediction: Dict[str, Any], now: Optional[datetime] = None) -> int:
+        """
+        Seconds a client should wait before polling a pending prediction again.
+
+        Never earlier than the poller's next refresh of the stored status,
+        since polling before that can only return the same answer.
+        """
+        now = now or datetime.utcnow()
+        seconds = self.remaining_seconds(prediction, now)
+        next_poll_at = prediction.get("next_poll_at")
+        if next_poll_at is not None:
+            seconds = max(seconds, math.ceil((next_poll_at - now).total_seconds()))
+        return min(max(1, seconds), math.ceil(settings.PREDICTION_POLL_MAX_DELAY))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            f"{mode or '*'}/{category or '*'}": {"p50_seconds": round(p50, 1), "p90_seconds": round(p90, 1), "samples": samples}
+            for (mode, category), (p50, p90, samples) in self._estimates.items()
+        }
+
+latency_model = LatencyModel(
+    sample_size=settings.TRYON_LATENCY_SAMPLE_SIZE,
+    min_samples=settings.TRYON_LATENCY_MIN_SAMPLES,
+    refresh_seconds=settings.TRYON_LATENCY_REFRESH_SECONDS
+)
@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from bson import Binary
+
+from config import settings
+from utils.image_utils import normalize_image
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def get_model_photos_collection(db):
+    """Return the collection holding stored, normalized model photos"""
+    return db[settings.DB_NAME]["model_photos"]
+
+async def store_model_photo(
+    db,
+    contents: bytes,
+    user_id: Optional[str] = None,
+    device_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Normalize a model photo once and store it for reuse across try-ons.
+
+    Uploading the same photo again for the same owner returns the existing
+    handle instead of storing a duplicate.
+
+    Returns:
+        Dict with the handle id, mime type and stored size
+    """
+    if not user_id and not device_id:
+        raise ValueError("A model photo needs a user_id or device_id owner")
+
+    owner = {"user_id": user_id} if user_id else {"device_id": device_id}
+    digest = hashlib.sha256(contents).hexdigest()
+    photos_collection = get_model_photos_collection(db)
+    now = datetime.utcnow()
+
+    existing = await photos_collection.find_one_and_update(
+        {**owner, "digest": digest},
+        {"$set": {"last_used": now}},
+        projection={"_id": 1, "mime_type": 1, "size": 1}
+    )
+    if existing:
+        logger.info(f"Reusing stored model photo {existing['_id']}")
+        return {"id": existing["_id"], "mime_type": existing["mime_type"], "size": existing["size"]}
+
+    normalized, mime_type = await asyncio.to_thread(normalize_image, contents)
+    handle = uuid.uuid4().hex
+    await photos_collection.insert_one({
+        "_id": handle,
+        **owner,
+        "digest": digest,
+        "image": Binary(normalized),
+        "mime_type": mime_type,
+        "size": len(normalized),
+        "created_at": now,
+        "last_used": now
+    })
+    logger.info(f"Stored model photo {handle} ({len(contents)} -> {len(normalized)} bytes)")
+    return {"id": handle, "mime_type": mime_type, "size": len(normalized)}
+
+async def load_model_photo(
+    db,
+    handle: str,
+    user_id: Optional[str] = None,
+    device_id: Optional[str] = None
+) -> Optional[Tuple[bytes, str]]:
+    """
+    Fetch a stored model photo if it belongs to the given user or device.
+
+    Returns:
+        Tuple of (normalized image bytes, mime type), or None if the handle
+        does not exist or belongs to someone else
+    """
+    if not user_id and not device_id:
+        return None
+
+    owner = {"user_id": user_id} if user_id else {"device_id": device_id}
+    photo = await get_model_photos_collection(db).find_one_and_update(
+        {"_id": handle, **owner},
+        {"$set": {"last_used": datetime.utcnow()}},
+        projection={"image": 1, "mime_type": 1}
+    )
+    if not photo:
+        return None
+    return bytes(photo["image"]), photo.get("mime_type", "image/jpeg")
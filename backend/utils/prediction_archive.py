@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Tuple
+
+from config import settings
+from utils.prediction_poller import get_predictions_collection
+from utils.tryon_outputs import delete_outputs
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# The fields analytics needs from an archived prediction; request payloads,
+# poller bookkeeping and provider URLs are left behind
+ARCHIVE_PROJECTION = {
+    "_id": {"$ifNull": ["$id", "$prediction_id"]},
+    "user_id": 1,
+    "device_id": 1,
+    "batch_id": 1,
+    "status": 1,
+    # /test and /try-device predictions keep their inputs under params
+    "mode": {"$ifNull": ["$request_data.mode", "$params.mode"]},
+    "category": {"$ifNull": ["$request_data.category", "$params.category"]},
+    "garment_url": {"$ifNull": ["$request_data.garment_url", "$params.garment_url"]},
+    "created_at": 1,
+    "completed_at": 1,
+    "duration_seconds": {
+        "$cond": [
+            {"$and": ["$completed_at", "$created_at"]},
+            {"$divide": [{"$subtract": ["$completed_at", "$created_at"]}, 1000]},
+            None
+        ]
+    }
+}
+
+def month_bounds(moment: datetime) -> Tuple[datetime, datetime]:
+    """First instant of the month containing `moment` and of the month after"""
+    start = datetime(moment.year, moment.month, 1)
+    end = datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+    return start, end
+
+async def delete_archived_outputs(predictions_collection, month_filter: Dict[str, Any]) -> int:
+    """
+    Delete the mirrored outputs of predictions about to be archived; the
+    archive keeps no URLs, so nothing could serve them afterwards. Returns
+    the number of predictions whose outputs could not all be deleted.
+    """
+    cursor = predictions_collection.find(
+        {**month_filter, "$or": [{"output_urls": {"$exists": True}}, {"mirror_attempts": {"$exists": True}}]},
+        {"_id": 0, "id": 1, "prediction_id": 1, "output_urls": 1}
+    )
+    semaphore = asyncio.Semaphore(settings.PREDICTION_POLL_CONCURRENCY)
+
+    async def delete_one(prediction: Dict[str, Any]) -> bool:
+        async with semaphore:
+            return await delete_outputs(prediction.get("id") or prediction.get("prediction_id"), prediction.get("output_urls"))
+
+    failed = 0
+    batch = []
+    async for prediction in cursor:
+        batch.append(prediction)
+        if len(batch) == settings.TRYON_OUTPUT_MIRROR_BATCH_SIZE:
+            failed += (await asyncio.gather(*[delete_one(p) for p in batch])).count(False)
+            batch = []
+    if batch:
+        failed += (await asyncio.gather(*[delete_one(p) for p in batch])).count(False)
+    return failed
+
+def get_archive_collection(db, month_start: datetime):
+    """Return the archive collection for one month, e.g. tryon_predictions_archive_2025_03"""
+    return db[settings.DB_NAME][f"tryon_predictions_archive_{month_start:%Y_%m}"]
+
+async def archive_old_predictions(db, now: datetime = None) -> int:
+    """
+    Move predictions older than TRYON_PREDICTION_RETENTION_DAYS into the
+    monthly archive collections.
+
+    Each month is copied server-side with one aggregation ending in $merge,
+    so documents never pass through this process, and only then marked with
+    archived_at. Their mirrored outputs (local files and Cloudinary copies)
+    are deleted in between, and their URLs dropped with the marking. The TTL
+    index on archived_at deletes marked predictions
+    TRYON_ARCHIVE_GRACE_HOURS later, which keeps tryon_predictions down to
+    the recent working set. Re-running after a failure is safe: $merge keeps
+    rows that were already archived and deleting outputs twice is a no-op.
+    Outputs that fail to delete are logged and left behind. Returns the
+    number archived.
+    """
+    predictions_collection = get_predictions_collection(db)
+    cutoff = (now or datetime.utcnow()) - timedelta(days=settings.TRYON_PREDICTION_RETENTION_DAYS)
+    due = {"created_at": {"$lt": cutoff}, "archived_at": {"$exists": False}}
+
+    archived = 0
+    while True:
+        oldest = await predictions_collection.find_one(due, {"_id": 0, "created_at": 1}, sort=[("created_at", 1)])
+        if not oldest:
+            break
+
+        month_start, month_end = month_bounds(oldest["created_at"])
+        month_filter = {
+            "created_at": {"$gte": month_start, "$lt": min(month_end, cutoff)},
+            "archived_at": {"$exists": False}
+        }
+        archive_collection = get_archive_collection(db, month_start)
+        await predictions_collection.aggregate([
+            {"$match": month_filter},
+            {"$project": ARCHIVE_PROJECTION},
+            {"$merge": {"into": archive_collection.name, "on": "_id", "whenMatched": "keepExisting", "whenNotMatched": "insert"}}
+        ]).to_list(length=None)
+
+        failed = await delete_archived_outputs(predictions_collection, month_filter)
+        if failed:
+            logger.error(f"Could not delete the outputs of {failed} predictions archived into {archive_collection.name}")
+
+        # Drop the URLs of the deleted outputs so history and status stop serving them
+        result = await predictions_collection.update_many(
+            month_filter,
+            {"$set": {"archived_at": datetime.utcnow()}, "$unset": {"output_urls": ""}}
+        )
+        archived += result.modified_count
+        logger.info(f"Archived {result.modified_count} predictions into {archive_collection.name}")
+
+    return archived
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Set
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Futures of requests waiting on each prediction, keyed by prediction id
+_waiters: Dict[str, Set[asyncio.Future]] = {}
+
+def waiting_count() -> int:
+    """Number of requests currently held open waiting for a prediction"""
+    return sum(len(futures) for futures in _waiters.values())
+
+async def wait_for_prediction(prediction_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Wait until the prediction reaches a terminal status in this process.
+
+    Returns the published status document, or None if nothing was
+    published before the timeout.
+    """
+    future = asyncio.get_running_loop().create_future()
+    _waiters.setdefault(prediction_id, set()).add(future)
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        futures = _waiters.get(prediction_id)
+        if futures is not None:
+            futures.discard(future)
+            if not futures:
+                _waiters.pop(prediction_id, None)
+
+def publish_prediction(prediction_id: str, prediction: Dict[str, Any]):
+    """Wake every request waiting on this prediction"""
+    futures = _waiters.pop(prediction_id, None)
+    if not futures:
+        return
+
+    for future in futures:
+        if not future.done():
+            future.set_result(prediction)
+    logger.info(f"Notified {len(futures)} waiting request(s) for prediction {prediction_id}")
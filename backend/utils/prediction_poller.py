@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from pymongo import UpdateMany, UpdateOne
+
+from config import settings
+from database import get_database
+from utils import fashn_client
+from utils.circuit_breaker import CircuitOpenError
+from utils.latency_model import latency_model
+from utils.prediction_events import publish_prediction
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+# Unique per process so several workers can share the collection safely
+POLLER_ID = uuid.uuid4().hex
+
+_poller_task: Optional[asyncio.Task] = None
+
+def get_predictions_collection(db):
+    """Return the collection the try-on router stores predictions in"""
+    return db[settings.DB_NAME]["tryon_predictions"]
+
+def initial_poll_time(created_at: datetime, eta: Optional[int] = None) -> datetime:
+    """When the poller should first look at a freshly submitted prediction"""
+    delay = eta if eta else settings.PREDICTION_POLL_MIN_DELAY
+    delay = min(max(delay, settings.PREDICTION_POLL_MIN_DELAY), settings.PREDICTION_POLL_MAX_DELAY)
+    return created_at + timedelta(seconds=delay)
+
+def next_poll_delay(created_at: Optional[datetime], now: datetime, eta: Optional[int] = None) -> float:
+    """
+    Adaptive delay before the next status check.
+
+    Young predictions are checked often, long-running ones back off
+    towards PREDICTION_POLL_MAX_DELAY. A provider ETA pushes the next
+    check out to when the result is expected.
+    """
+    age = (now - created_at).total_seconds() if created_at else 0
+    delay = age * 0.25
+    if eta:
+        delay = max(delay, eta)
+    return min(max(delay, settings.PREDICTION_POLL_MIN_DELAY), settings.PREDICTION_POLL_MAX_DELAY)
+
+def parse_status_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a FASHN status payload into the fields we store"""
+    status = result.get("status", "pending")
+
+    # Handle error object - convert to string if it's an object
+    error = result.get("error")
+    if error:
+        if isinstance(error, dict):
+            error_msg = error.get("message", "Unknown error")
+            if "name" in error:
+                error_msg = f"{error['name']}: {error_msg}"
+            error = error_msg
+        error = str(error)
+
+    result_url = None
+    if status == "completed":
+        result_url = result.get("output")
+        if not result_url:
+            logger.warning(f"Completed status but no output URL provided: {result}")
+
+    return {
+        "status": status,
+        "result_url": result_url,
+        "error": error if status == "failed" else None,
+        "eta": result.get("eta")
+    }
+
+async def _fetch_status(
+    prediction: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    now: datetime
+) -> Tuple[UpdateOne, Optional[Dict[str, Any]]]:
+    """
+    Refresh a single prediction.
+
+    Returns the write to apply and, when the prediction reached a terminal
+    status, the fields to publish to waiting requests.
+    """
+    prediction_id = prediction.get("id") or prediction.get("prediction_id")
+    created_at = prediction.get("created_at")
+
+    # Give up on predictions the provider never finished
+    if created_at and now - created_at > timedelta(minutes=settings.PREDICTION_POLL_TIMEOUT_MINUTES):
+        logger.warning(f"Prediction {prediction_id} timed out after {settings.PREDICTION_POLL_TIMEOUT_MINUTES} minutes")
+        update_data = {
+            "status": "failed",
+            "error": "Timed out waiting for try-on result",
+            "updated_at": now
+        }
+        return UpdateOne({"_id": prediction["_id"]}, {"$set": update_data}), update_data
+
+    async with semaphore:
+        try:
+            response = await fashn_client.get_prediction_status(prediction_id)
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.error(f"Error polling FASHN status for {prediction_id}: {str(e)}")
+            response = None
+
+    parsed = None
+    if response is not None and response.status_code == 200:
+        try:
+            parsed = parse_status_result(response.json())
+        except ValueError:
+            logger.error(f"Invalid JSON in FASHN status response for {prediction_id}: {response.text[:200]}")
+    elif response is not None:
+        logger.error(f"FASHN API status check error for {prediction_id}: {response.status_code}, {response.text[:200]}")
+
+    if parsed is None:
+        # Keep the stored status and try again later
+        return UpdateOne(
+            {"_id": prediction["_id"]},
+            {"$set": {"next_poll_at": now + timedelta(seconds=next_poll_delay(created_at, now))}}
+        ), None
+
+    update_data = {
+        "status": parsed["status"],
+        "updated_at": now,
+        "next_poll_at": now + timedelta(seconds=next_poll_delay(created_at, now, parsed["eta"]))
+    }
+    if parsed["eta"] is not None:
+        update_data["eta"] = parsed["eta"]
+    if parsed["status"] == "completed" and parsed["result_url"]:
+        update_data["result_url"] = parsed["result_url"]
+        update_data["completed_at"] = now
+    elif parsed["status"] == "failed":
+        update_data["error"] = parsed["error"] or "Unknown error"
+        update_data["completed_at"] = now
+
+    terminal = update_data if parsed["status"] in TERMINAL_STATUSES else None
+    return UpdateOne({"_id": prediction["_id"]}, {"$set": update_data}), terminal
+
+async def refresh_pending_predictions(db) -> int:
+    """
+    Refresh every due, non-terminal prediction in one pass.
+
+    Only predictions scheduled with next_poll_at are considered; records
+    written before the poller existed are left untouched. Up to
+    PREDICTION_POLL_BATCH_SIZE due predictions, most overdue first, are
+    leased to this process with a single update_many so concurrent workers
+    never poll the same prediction twice. Results are written back with one
+    bulk_write. Returns the number refreshed.
+    """
+    predictions_collection = get_predictions_collection(db)
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=settings.PREDICTION_POLL_LEASE_SECONDS)
+
+    due_filter = {
+        "status": {"$nin": list(TERMINAL_STATUSES)},
+        "next_poll_at": {"$lte": now},
+        "$or": [{"poll_lease_until": {"$lte": now}}, {"poll_lease_until": {"$exists": False}}]
+    }
+    due_ids = [
+        prediction["_id"]
+        async for prediction in predictions_collection.find(
+            due_filter,
+            {"_id": 1},
+            sort=[("next_poll_at", 1)],
+            limit=settings.PREDICTION_POLL_BATCH_SIZE
+        )
+    ]
+    if not due_ids:
+        return 0
+
+    # Re-check the due filter so a prediction another worker leased meanwhile is skipped
+    claimed = await predictions_collection.update_many(
+        {"_id": {"$in": due_ids}, **due_filter},
+        {"$set": {"poll_owner": POLLER_ID, "poll_lease_until": lease_until}}
+    )
+    if not claimed.modified_count:
+        return 0
+
+    pending = await predictions_collection.find(
+        {"poll_owner": POLLER_ID, "poll_lease_until": lease_until},
+        {"request_data": 0, "params": 0}
+    ).to_list(length=None)
+
+    semaphore = asyncio.Semaphore(settings.PREDICTION_POLL_CONCURRENCY)
+    updates = await asyncio.gather(*[_fetch_status(p, semaphore, now) for p in pending])
+    operations = [operation for operation, _ in updates]
+
+    # Release the lease on everything claimed in this pass
+    operations.append(UpdateMany(
+        {"poll_owner": POLLER_ID, "poll_lease_until": lease_until},
+        {"$unset": {"poll_owner": "", "poll_lease_until": ""}}
+    ))
+    await predictions_collection.bulk_write(operations, ordered=True)
+
+    # Wake long-polling requests only once the result is durable
+    for prediction, (_, terminal) in zip(pending, updates):
+        if terminal is not None:
+            publish_prediction(prediction.get("id") or prediction.get("prediction_id"), terminal)
+
+    logger.debug(f"Refreshed {len(pending)} pending predictions")
+    return len(pending)
+
+async def run_prediction_poller():
+    """Poll FASHN for pending predictions until cancelled"""
+    logger.info("Prediction status poller started")
+    while True:
+        try:
+            db = get_database()
+            if db is not None:
+                await refresh_pending_predictions(db)
+                # Keep the ETA model in step with recently completed try-ons
+                await latency_model.refresh_if_stale(get_predictions_collection(db))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in prediction status poller: {str(e)}", exc_info=True)
+        await asyncio.sleep(settings.PREDICTION_POLL_INTERVAL)
+
+def start_prediction_poller():
+    """Start the background poller on the running event loop"""
+    global _poller_task
+    if _poller_task is None or _poller_task.done():
+        _poller_task = asyncio.get_running_loop().create_task(run_prediction_poller())
+
+async def stop_prediction_poller():
+    """Cancel the background poller and wait for it to exit"""
+    global _poller_task
+    if _poller_task is not None:
+        _poller_task.cancel()
+        try:
+            await _poller_task
+        except asyncio.CancelledError:
+            pass
+        _poller_task = None
+        logger.info("Prediction status poller stopped")
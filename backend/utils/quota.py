@@ -0,0 +1,253 @@
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Try-on limits. None means the period is not capped.
+FREE_DAILY_LIMIT = 1
+PREMIUM_MONTHLY_LIMIT = 30   # signed-in subscribers
+DEVICE_MONTHLY_LIMIT = 40    # subscribed devices
+
+# Stand-in reset date for records that predate the reset fields
+NEVER_RESET = datetime(1970, 1, 1)
+
+def user_limits(is_premium: bool) -> Tuple[Optional[int], Optional[int]]:
+    """(daily_limit, monthly_limit) enforced for a signed-in user"""
+    if is_premium:
+        return None, PREMIUM_MONTHLY_LIMIT
+    return FREE_DAILY_LIMIT, None
+
+def device_limits(is_subscribed: bool) -> Tuple[Optional[int], Optional[int]]:
+    """(daily_limit, monthly_limit) enforced for an anonymous device"""
+    if is_subscribed:
+        return None, DEVICE_MONTHLY_LIMIT
+    return FREE_DAILY_LIMIT, None
+
+def period_starts(now: datetime) -> Tuple[datetime, datetime]:
+    """Start of the current day and month the counters reset at"""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return today, today.replace(day=1)
+
+def limit_reason(
+    daily_count: int,
+    monthly_count: int,
+    daily_limit: Optional[int],
+    monthly_limit: Optional[int],
+    count: int = 1
+) -> Optional[str]:
+    """Which limit, if any, blocks `count` more try-ons at these counts"""
+    if monthly_limit is not None and monthly_count + count > monthly_limit:
+        return "MONTHLY_LIMIT_REACHED"
+    if daily_limit is not None and daily_count + count > daily_limit:
+        return "DAILY_LIMIT_REACHED"
+    return None
+
+def _quota_result(
+    daily_count: int,
+    monthly_count: int,
+    total_count: int,
+    daily_limit: Optional[int],
+    monthly_limit: Optional[int],
+    consumed: bool = False,
+    reason: Optional[str] = None
+) -> Dict[str, Any]:
+    return {
+        "allowed": reason is None,
+        "consumed": consumed,
+        "reason": reason,
+        "daily_count": daily_count,
+        "monthly_count": monthly_count,
+        "total_count": total_count,
+        "daily_limit": daily_limit,
+        "monthly_limit": monthly_limit
+    }
+
+def evaluate_quota(
+    usage: Optional[Dict[str, Any]],
+    daily_limit: Optional[int],
+    monthly_limit: Optional[int],
+    now: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Apply the daily/monthly reset rules to a stored usage record in memory.
+
+    Used by check-only paths, which report what the next try-on would see
+    without writing anything.
+    """
+    usage = usage or {}
+    today, first_of_month = period_starts(now or datetime.utcnow())
+
+    last_reset_daily = usage.get("last_reset_daily") or usage.get("last_reset")
+    if not isinstance(last_reset_daily, datetime):
+        last_reset_daily = NEVER_RESET
+    last_reset_monthly = usage.get("last_reset_monthly")
+    if not isinstance(last_reset_monthly, datetime):
+        last_reset_monthly = NEVER_RESET
+
+    daily_count = 0 if last_reset_daily < today else usage.get("daily_count", 0)
+    monthly_count = 0 if last_reset_monthly < first_of_month else usage.get("monthly_count", 0)
+    reason = limit_reason(daily_count, monthly_count, daily_limit, monthly_limit)
+    return _quota_result(
+        daily_count, monthly_count, usage.get("total_count", 0),
+        daily_limit, monthly_limit, reason=reason
+    )
+
+async def read_quota(
+    usage_collection,
+    owner: Dict[str, Any],
+    daily_limit: Optional[int],
+    monthly_limit: Optional[int]
+) -> Dict[str, Any]:
+    """Current counts for an owner after resets, without touching the record"""
+    usage = await usage_collection.find_one(
+        owner,
+        {
+            "_id": 0,
+            "daily_count": 1,
+            "monthly_count": 1,
+            "total_count": 1,
+            "last_reset_daily": 1,
+            "last_reset": 1,
+            "last_reset_monthly": 1
+        }
+    )
+    return evaluate_quota(usage, daily_limit, monthly_limit)
+
+def _literal_fields(fields: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    # Literal so caller-supplied strings are never read as field paths
+    return {key: {"$literal": value} for key, value in (fields or {}).items()}
+
+def _reset_stage(now: datetime) -> Dict[str, Any]:
+    """Pipeline stage zeroing counters whose day or month has rolled over"""
+    today, first_of_month = period_starts(now)
+    last_reset_daily = {"$ifNull": ["$last_reset_daily", {"$ifNull": ["$last_reset", NEVER_RESET]}]}
+    last_reset_monthly = {"$ifNull": ["$last_reset_monthly", NEVER_RESET]}
+    new_day = {"$lt": [last_reset_daily, today]}
+    new_month = {"$lt": [last_reset_monthly, first_of_month]}
+    return {"$set": {
+        "daily_count": {"$cond": [new_day, 0, {"$ifNull": ["$daily_count", 0]}]},
+        "last_reset_daily": {"$cond": [new_day, today, last_reset_daily]},
+        "monthly_count": {"$cond": [new_month, 0, {"$ifNull": ["$monthly_count", 0]}]},
+        "last_reset_monthly": {"$cond": [new_month, first_of_month, last_reset_monthly]},
+        "total_count": {"$ifNull": ["$total_count", 0]}
+    }}
+
+def build_quota_pipeline(
+    now: datetime,
+    daily_limit: Optional[int],
+    monthly_limit: Optional[int],
+    fields: Optional[Dict[str, Any]] = None,
+    count: int = 1
+) -> list:
+    """
+    Aggregation-pipeline update that resets, checks and increments in one go.
+
+    Stage 1 zeroes counters whose period has rolled over and stage 2
+    increments by `count` only when the limits allow that many more
+    try-ons. Every field in stage 2 is computed from the stage 1 values, so
+    the check sees the counts from before the increment.
+    """
+    checks = []
+    if daily_limit is not None:
+        checks.append({"$lte": [{"$add": ["$daily_count", count]}, daily_limit]})
+    if monthly_limit is not None:
+        checks.append({"$lte": [{"$add": ["$monthly_count", count]}, monthly_limit]})
+    allowed = {"$and": checks}
+
+    def increment(field: str) -> Dict[str, Any]:
+        return {"$cond": [allowed, {"$add": [f"${field}", count]}, f"${field}"]}
+
+    return [
+        _reset_stage(now),
+        {"$set": {
+            "daily_count": increment("daily_count"),
+            "monthly_count": increment("monthly_count"),
+            "total_count": increment("total_count"),
+            "last_used": {"$cond": [allowed, now, "$last_used"]},
+            **_literal_fields(fields)
+        }},
+        # Earlier versions kept the decision on the record; drop it from old records
+        {"$project": {"quota_allowed": 0}}
+    ]
+
+def build_increment_pipeline(now: datetime, count: int, fields: Optional[Dict[str, Any]] = None) -> list:
+    """Pipeline update applying `count` already-approved try-ons after any reset"""
+    return [
+        _reset_stage(now),
+        {"$set": {
+            "daily_count": {"$add": ["$daily_count", count]},
+            "monthly_count": {"$add": ["$monthly_count", count]},
+            "total_count": {"$add": ["$total_count", count]},
+            "last_used": now,
+            **_literal_fields(fields)
+        }}
+    ]
+
+async def consume_quota(
+    usage_collection,
+    owner: Dict[str, Any],
+    daily_limit: Optional[int],
+    monthly_limit: Optional[int],
+    fields: Optional[Dict[str, Any]] = None,
+    count: int = 1
+) -> Dict[str, Any]:
+    """
+    Reset, check and charge `count` try-ons in a single round trip.
+
+    The whole decision runs inside one find_one_and_update, so concurrent
+    requests for the same owner cannot both slip under a limit, and a batch
+    is charged all-or-nothing. The record is created on first use. `fields`
+    are stored on the record either way.
+
+    The record is returned as it was before the update, and the same reset
+    and limit rules are applied to it here for the same `now`, which
+    reproduces the decision the database made without storing it.
+
+    Returns:
+        Dict with allowed/consumed, the limit reason, the counts read before
+        charging, and the limits that were applied
+    """
+    now = datetime.utcnow()
+    before = await usage_collection.find_one_and_update(
+        owner,
+        build_quota_pipeline(now, daily_limit, monthly_limit, fields, count),
+        projection={
+            "_id": 0,
+            "daily_count": 1,
+            "monthly_count": 1,
+            "total_count": 1,
+            "last_reset_daily": 1,
+            "last_reset": 1,
+            "last_reset_monthly": 1
+        },
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+
+    # Counts after any reset, before charging; a new record starts at zero
+    counts = evaluate_quota(before, daily_limit, monthly_limit, now=now)
+    daily_count = counts["daily_count"]
+    monthly_count = counts["monthly_count"]
+    total_count = counts["total_count"]
+    reason = limit_reason(daily_count, monthly_count, daily_limit, monthly_limit, count)
+    consumed = reason is None
+
+    logger.info(
+        f"Quota for {owner}: read daily={daily_count}/{daily_limit}, "
+        f"monthly={monthly_count}/{monthly_limit}, consumed={consumed}"
+    )
+    return _quota_result(
+        daily_count, monthly_count, total_count,
+        daily_limit, monthly_limit, consumed=consumed, reason=reason
+    )
+
+async def release_quota(usage_collection, owner: Dict[str, Any], count: int = 1):
+    """Give back try-ons that were charged but never reached FASHN"""
+    await usage_collection.update_one(
+        {**owner, "daily_count": {"$gte": count}, "monthly_count": {"$gte": count}},
+        {"$inc": {"daily_count": -count, "monthly_count": -count, "total_count": -count}}
+    )
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from config import settings
+from utils.quota import (
+    build_increment_pipeline, consume_quota, evaluate_quota, limit_reason, period_starts, release_quota
+)
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Fields read from tryon_usage to build a cached snapshot
+USAGE_SNAPSHOT_PROJECTION = {
+    "_id": 0,
+    "daily_count": 1,
+    "monthly_count": 1,
+    "total_count": 1,
+    "last_reset_daily": 1,
+    "last_reset": 1,
+    "last_reset_monthly": 1
+}
+
+_flusher_task: Optional[asyncio.Task] = None
+
+def _cache_key(usage_collection, owner: Dict[str, Any]) -> Tuple:
+    return (usage_collection.full_name, tuple(sorted(owner.items())))
+
+def _snapshot(usage: Optional[Dict[str, Any]], now: datetime) -> Dict[str, Any]:
+    """Usage counts with the daily/monthly resets already applied"""
+    quota = evaluate_quota(usage, None, None, now=now)
+    today, first_of_month = period_starts(now)
+    return {
+        "daily_count": quota["daily_count"],
+        "monthly_count": quota["monthly_count"],
+        "total_count": quota["total_count"],
+        "last_reset_daily": today,
+        "last_reset_monthly": first_of_month,
+        "exists": usage is not None
+    }
+
+class QuotaCache:
+    """
+    Per-worker cache of try-on usage with write-behind increments.
+
+    Check-only endpoints read counts from here, so repeated checks from the
+    app stop reaching MongoDB until the entry expires. In "eventual" mode
+    try-ons are also charged here and the increments are flushed to
+    tryon_usage in batched bulk_write calls; in "strong" mode they are
+    charged atomically in MongoDB and the cache is written through.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, tuple]" = OrderedDict()
+        # Increments not yet written to MongoDB, keyed like _entries
+        self._pending: Dict[Tuple, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, snapshot = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return snapshot
+
+    def _put(self, key: Tuple, snapshot: Dict[str, Any]):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, snapshot)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, usage_collection, owner: Dict[str, Any]) -> Dict[str, Any]:
+        key = _cache_key(usage_collection, owner)
+        now = datetime.utcnow()
+        snapshot = self._get(key)
+        if snapshot is not None and snapshot["last_reset_daily"] == period_starts(now)[0]:
+            self.hits += 1
+            return snapshot
+
+        self.misses += 1
+        usage = await usage_collection.find_one(owner, USAGE_SNAPSHOT_PROJECTION)
+        snapshot = _snapshot(usage, now)
+        # Increments still waiting to be flushed are not in MongoDB yet
+        pending = self._pending.get(key)
+        if pending:
+            for field in ("daily_count", "monthly_count", "total_count"):
+                snapshot[field] += pending["count"]
+            snapshot["exists"] = True
+        self._put(key, snapshot)
+        return snapshot
+
+    async def read(
+        self,
+        usage_collection,
+        owner: Dict[str, Any],
+        daily_limit: Optional[int],
+        monthly_limit: Optional[int]
+    ) -> Dict[str, Any]:
+        """Same result as quota.read_quota, plus whether a record exists"""
+        snapshot = await self._load(usage_collection, owner)
+        quota = evaluate_quota(snapshot, daily_limit, monthly_limit)
+        quota["exists"] = snapshot["exists"]
+        return quota
+
+    async def charge(
+        self,
+        usage_collection,
+        owner: Dict[str, Any],
+        daily_limit: Optional[int],
+        monthly_limit: Optional[int],
+        fields: Optional[Dict[str, Any]] = None,
+        count: int = 1
+    ) -> Dict[str, Any]:
+        """Same contract as quota.consume_quota, honouring QUOTA_CONSISTENCY"""
+        key = _cache_key(usage_collection, owner)
+
+        if settings.QUOTA_CONSISTENCY != "eventual":
+            quota = await consume_quota(usage_collection, owner, daily_limit, monthly_limit, fields=fields, count=count)
+            # Write through: the post-image is exactly what the next read would see
+            charged = count if quota["consumed"] else 0
+            today, first_of_month = period_starts(datetime.utcnow())
+            self._put(key, {
+                "daily_count": quota["daily_count"] + charged,
+                "monthly_count": quota["monthly_count"] + charged,
+                "total_count": quota["total_count"] + charged,
+                "last_reset_daily": today,
+                "last_reset_monthly": first_of_month,
+                "exists": True
+            })
+            return quota
+
+        snapshot = await self._load(usage_collection, owner)
+        quota = evaluate_quota(snapshot, daily_limit, monthly_limit)
+        quota["reason"] = limit_reason(
+            quota["daily_count"], quota["monthly_count"], daily_limit, monthly_limit, count
+        )
+        quota["allowed"] = quota["reason"] is None
+        if not quota["allowed"]:
+            return quota
+
+        for field in ("daily_count", "monthly_count", "total_count"):
+            snapshot[field] += count
+        snapshot["exists"] = True
+        pending = self._pending.setdefault(
+            key, {"collection": usage_collection, "owner": owner, "count": 0, "fields": {}}
+        )
+        pending["count"] += count
+        pending["fields"].update(fields or {})
+        quota["consumed"] = True
+        return quota
+
+    async def release(self, usage_collection, owner: Dict[str, Any], count: int = 1):
+        """Give back charged try-ons, wherever they are currently recorded"""
+        key = _cache_key(usage_collection, owner)
+        snapshot = self._get(key)
+        if snapshot is not None:
+            for field in ("daily_count", "monthly_count", "total_count"):
+                snapshot[field] = max(0, snapshot[field] - count)
+
+        pending = self._pending.get(key)
+        if pending and pending["count"] > 0:
+            buffered = min(count, pending["count"])
+            pending["count"] -= buffered
+            count -= buffered
+        if count > 0:
+            await release_quota(usage_collection, owner, count)
+
+    def invalidate(self, usage_collection, owner: Dict[str, Any]):
+        """Drop an entry after its record was rewritten outside the cache"""
+        self._entries.pop(_cache_key(usage_collection, owner), None)
+
+    async def flush(self):
+        """Write buffered increments to MongoDB, one bulk_write per collection"""
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        now = datetime.utcnow()
+        batches: Dict[str, tuple] = {}
+        for key, entry in pending.items():
+            if entry["count"] <= 0 and not entry["fields"]:
+                continue
+            collection, operations, keys = batches.setdefault(
+                entry["collection"].full_name, (entry["collection"], [], [])
+            )
+            operations.append(UpdateOne(
+                entry["owner"],
+                build_increment_pipeline(now, entry["count"], entry["fields"]),
+                upsert=True
+            ))
+            keys.append(key)
+
+        for collection, operations, keys in batches.values():
+            try:
+                await collection.bulk_write(operations, ordered=False)
+                logger.info(f"Flushed {len(operations)} buffered usage update(s) to {collection.full_name}")
+            except Exception as e:
+                logger.error(f"Error flushing usage updates: {str(e)}", exc_info=True)
+                # Keep the increments so the next flush retries them
+                for key in keys:
+                    entry = pending[key]
+                    retry = self._pending.setdefault(
+                        key, {"collection": entry["collection"], "owner": entry["owner"], "count": 0, "fields": {}}
+                    )
+                    retry["count"] += entry["count"]
+                    retry["fields"] = {**entry["fields"], **retry["fields"]}
+
+    def pending_count(self) -> int:
+        return sum(entry["count"] for entry in self._pending.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+quota_cache = QuotaCache(
+    max_entries=settings.QUOTA_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUOTA_CACHE_TTL_SECONDS
+)
+
+async def run_quota_flusher():
+    """Flush buffered usage increments until cancelled"""
+    while True:
+        await asyncio.sleep(settings.QUOTA_FLUSH_INTERVAL_SECONDS)
+        try:
+            await quota_cache.flush()
+        except Exception as e:
+            logger.error(f"Error in quota flusher: {str(e)}", exc_info=True)
+
+def start_quota_flusher():
+    """Start the write-behind flusher on the running event loop"""
+    global _flusher_task
+    if _flusher_task is None or _flusher_task.done():
+        _flusher_task = asyncio.get_running_loop().create_task(run_quota_flusher())
+
+async def stop_quota_flusher():
+    """Stop the flusher and write out whatever is still buffered"""
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+    await quota_cache.flush()
+    logger.info("Quota flusher stopped")
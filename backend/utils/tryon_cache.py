@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+def compute_tryon_cache_key(
+    owner: str,
+    model_data: bytes,
+    garment_data: bytes,
+    category: str,
+    mode: str,
+    segmentation_free: str
+) -> str:
+    """
+    Digest of everything that determines a try-on result, scoped to its owner.
+
+    The owner ("user:<id>" or "device:<id>") is part of the key so a result
+    is only ever reused for whoever created it; another account sending the
+    same photo (e.g. a stock model) gets its own prediction, which its
+    status checks and history can see. The image digests are hashed
+    separately first so swapping model and garment bytes can never produce
+    the same key.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{owner}|".encode("utf-8"))
+    digest.update(hashlib.sha256(model_data).digest())
+    digest.update(hashlib.sha256(garment_data).digest())
+    digest.update(f"{category}|{mode}|{str(segmentation_free).lower()}".encode("utf-8"))
+    return digest.hexdigest()
+
+class TryOnResultCache:
+    """
+    Bounded in-process LRU of completed try-on results with a TTL.
+
+    Sits in front of the tryon_predictions lookup so repeated submissions
+    of the same inputs on one worker skip the database as well as FASHN.
+    Only results whose output has been mirrored are kept, so an entry never
+    outlives the provider URL it would otherwise point at.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any], ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+tryon_result_cache = TryOnResultCache(
+    max_entries=settings.TRYON_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TRYON_CACHE_TTL_SECONDS
+)
+
+async def lookup_cached_result(predictions_collection, cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Return {"id", "result_url", "thumbnail_url"} of a completed prediction
+    for these inputs, preferring our mirrored copies of the output over the
+    provider's URL.
+
+    Checks the in-process tier first, then the most recent completed
+    prediction with the same cache_key that is still inside the TTL.
+    """
+    cached = tryon_result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Try-on result cache hit (memory) for key {cache_key[:12]}")
+        return cached
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=settings.TRYON_CACHE_TTL_SECONDS)
+    prediction = await predictions_collection.find_one(
+        {
+            "cache_key": cache_key,
+            "status": "completed",
+            "result_url": {"$ne": None},
+            "completed_at": {"$gte": cutoff}
+        },
+        {"_id": 0, "id": 1, "prediction_id": 1, "result_url": 1, "output_urls": 1, "completed_at": 1},
+        sort=[("completed_at", -1)]
+    )
+    if not prediction:
+        return None
+
+    output_urls = prediction.get("output_urls") or {}
+    cached = {
+        "id": prediction.get("id") or prediction.get("prediction_id"),
+        "result_url": output_urls.get("full") or prediction["result_url"],
+        "thumbnail_url": output_urls.get("thumbnail")
+    }
+    # Until the mirror has copied the output, the next lookup should see its URLs
+    if output_urls or settings.TRYON_OUTPUT_STORAGE == "none":
+        # Never keep an entry in memory longer than it would stay valid in the database
+        remaining = settings.TRYON_CACHE_TTL_SECONDS - (now - prediction["completed_at"]).total_seconds()
+        tryon_result_cache.put(cache_key, cached, ttl_seconds=remaining)
+    logger.info(f"Try-on result cache hit (database) for key {cache_key[:12]}")
+    return cached
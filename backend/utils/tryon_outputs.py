@@ -0,0 +1,273 @@
+import asyncio
+import io
+import logging
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import aiofiles
+import httpx
+from PIL import Image
+from pymongo import UpdateMany, UpdateOne
+
+from config import settings
+from database import get_database
+from utils.cloudinary_utils import delete_image_from_cloudinary, initialize_cloudinary, upload_image_to_cloudinary
+from utils.prediction_poller import get_predictions_collection
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Unique per process so several workers can share the collection safely
+MIRROR_ID = uuid.uuid4().hex
+
+# Cloudinary folder mirrored outputs are uploaded to
+CLOUDINARY_OUTPUT_FOLDER = "tryon_outputs"
+
+# Names the local backend writes and serves: full.png, thumbnail_1.jpg, ...
+OUTPUT_FILENAME_PATTERN = re.compile(r"^(full|thumbnail)(_\d+)?\.(jpg|png|webp)$")
+PREDICTION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+_mirror_task: Optional[asyncio.Task] = None
+
+def output_cache_control() -> str:
+    """Cache-Control for mirrored outputs; they never change once written"""
+    return f"public, max-age={settings.TRYON_OUTPUT_CACHE_SECONDS}, immutable"
+
+def local_output_path(prediction_id: str, filename: str) -> Optional[str]:
+    """Path of a locally mirrored output, or None for names we never write"""
+    if not PREDICTION_ID_PATTERN.match(prediction_id) or not OUTPUT_FILENAME_PATTERN.match(filename):
+        return None
+    return os.path.join(settings.TRYON_OUTPUT_DIR, prediction_id, filename)
+
+def make_variants(contents: bytes) -> Tuple[Tuple[bytes, str], Tuple[bytes, str]]:
+    """
+    Build the full-size and thumbnail variants of a try-on output.
+
+    The full-size variant is the provider's file as-is. The thumbnail is
+    a JPEG no larger than TRYON_OUTPUT_THUMBNAIL_SIZE on its longest edge.
+
+    Returns:
+        ((full bytes, extension), (thumbnail bytes, extension))
+    """
+    image = Image.open(io.BytesIO(contents))
+    image.load()
+    full_extension = FORMAT_EXTENSIONS.get(image.format, "jpg")
+
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    size = settings.TRYON_OUTPUT_THUMBNAIL_SIZE
+    image.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=80, optimize=True)
+    return (contents, full_extension), (buffer.getvalue(), "jpg")
+
+async def _store_variant(prediction_id: str, name: str, contents: bytes, extension: str) -> str:
+    """Store one variant with the configured backend and return its URL"""
+    if settings.TRYON_OUTPUT_STORAGE == "cloudinary":
+        # Cloudinary serves uploads from its CDN with long-lived cache headers
+        success, result = await upload_image_to_cloudinary(
+            contents,
+            folder=CLOUDINARY_OUTPUT_FOLDER,
+            public_id=f"{prediction_id}_{name}"
+        )
+        if not success:
+            raise RuntimeError(result.get("error", "Cloudinary upload failed"))
+        return result["secure_url"]
+
+    filename = f"{name}.{extension}"
+    path = local_output_path(prediction_id, filename)
+    if path is None:
+        raise ValueError(f"Unexpected prediction id {prediction_id!r}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    async with aiofiles.open(path, "wb") as out_file:
+        await out_file.write(contents)
+    return f"{settings.TRYON_OUTPUT_PUBLIC_URL.rstrip('/')}/virtual-tryon/outputs/{prediction_id}/{filename}"
+
+async def mirror_output(
+    client: httpx.AsyncClient,
+    prediction_id: str,
+    result_url: Union[str, List[str]]
+) -> Dict[str, Union[str, List[str]]]:
+    """
+    Download a completed try-on output once and store it in our own storage.
+
+    A list of provider URLs is mirrored item by item and keeps its shape.
+
+    Returns:
+        {"full": url(s), "thumbnail": url(s)}
+    """
+    source_urls = result_url if isinstance(result_url, list) else [result_url]
+    full_urls, thumbnail_urls = [], []
+    for index, source_url in enumerate(source_urls):
+        response = await client.get(source_url)
+        response.raise_for_status()
+        (full, full_extension), (thumbnail, thumbnail_extension) = await asyncio.to_thread(
+            make_variants, response.content
+        )
+        suffix = f"_{index}" if isinstance(result_url, list) else ""
+        full_urls.append(await _store_variant(prediction_id, f"full{suffix}", full, full_extension))
+        thumbnail_urls.append(await _store_variant(prediction_id, f"thumbnail{suffix}", thumbnail, thumbnail_extension))
+
+    if isinstance(result_url, list):
+        return {"full": full_urls, "thumbnail": thumbnail_urls}
+    return {"full": full_urls[0], "thumbnail": thumbnail_urls[0]}
+
+async def delete_outputs(prediction_id: str, output_urls: Optional[Dict[str, Union[str, List[str]]]]) -> bool:
+    """
+    Delete the mirrored outputs of a prediction from both backends.
+
+    The local directory is removed whatever the current storage setting,
+    since it may have changed since the prediction was mirrored. Cloudinary
+    copies are found from the output URLs, named as _store_variant names
+    them. Returns whether everything was deleted.
+    """
+    if not prediction_id or not PREDICTION_ID_PATTERN.match(prediction_id):
+        return False
+
+    deleted = True
+    directory = os.path.join(settings.TRYON_OUTPUT_DIR, prediction_id)
+    try:
+        if os.path.isdir(directory):
+            await asyncio.to_thread(shutil.rmtree, directory)
+    except OSError as e:
+        logger.error(f"Error deleting local outputs of prediction {prediction_id}: {str(e)}")
+        deleted = False
+
+    for name, urls in (output_urls or {}).items():
+        suffixes = [f"_{index}" for index in range(len(urls))] if isinstance(urls, list) else [""]
+        for suffix, url in zip(suffixes, urls if isinstance(urls, list) else [urls]):
+            if "res.cloudinary.com" not in (url or ""):
+                continue
+            if not await delete_image_from_cloudinary(f"{prediction_id}_{name}{suffix}", folder=CLOUDINARY_OUTPUT_FOLDER):
+                deleted = False
+    return deleted
+
+async def _mirror_one(
+    client: httpx.AsyncClient,
+    prediction: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    now: datetime
+) -> UpdateOne:
+    # Predictions from /try-async before the id field existed only have prediction_id
+    prediction_id = prediction.get("id") or prediction.get("prediction_id")
+    async with semaphore:
+        try:
+            if not prediction_id:
+                raise ValueError("Prediction has no id")
+            output_urls = await mirror_output(client, prediction_id, prediction["result_url"])
+        except Exception as e:
+            attempts = prediction.get("mirror_attempts", 0) + 1
+            logger.error(f"Error mirroring output of prediction {prediction_id} (attempt {attempts}): {str(e)}")
+            # Back off between attempts; after the last one the provider URL stays in use
+            return UpdateOne(
+                {"_id": prediction["_id"]},
+                {"$set": {
+                    "mirror_attempts": attempts,
+                    "next_mirror_at": now + timedelta(seconds=settings.TRYON_OUTPUT_MIRROR_INTERVAL * 2 ** attempts)
+                }}
+            )
+
+    logger.info(f"Mirrored output of prediction {prediction_id} to {settings.TRYON_OUTPUT_STORAGE} storage")
+    return UpdateOne(
+        {"_id": prediction["_id"]},
+        {"$set": {"output_urls": output_urls, "mirrored_at": now}}
+    )
+
+async def mirror_completed_outputs(db) -> int:
+    """
+    Mirror the outputs of completed predictions not yet in our storage.
+
+    Like the status poller, due predictions are leased to this process with
+    one update_many and the results written back with one bulk_write, so
+    several workers never download the same output. Returns the number of
+    predictions processed.
+    """
+    predictions_collection = get_predictions_collection(db)
+    now = datetime.utcnow()
+    lease_until = now + timedelta(seconds=settings.PREDICTION_POLL_LEASE_SECONDS)
+
+    due_filter = {
+        "status": "completed",
+        "result_url": {"$ne": None},
+        "output_urls": {"$exists": False},
+        # Archiving drops output_urls after deleting the outputs; don't mirror them again
+        "archived_at": {"$exists": False},
+        "mirror_attempts": {"$not": {"$gte": settings.TRYON_OUTPUT_MIRROR_MAX_ATTEMPTS}},
+        "$and": [
+            {"$or": [{"next_mirror_at": {"$lte": now}}, {"next_mirror_at": {"$exists": False}}]},
+            {"$or": [{"mirror_lease_until": {"$lte": now}}, {"mirror_lease_until": {"$exists": False}}]}
+        ]
+    }
+    due = await predictions_collection.find(due_filter, {"_id": 1}).limit(
+        settings.TRYON_OUTPUT_MIRROR_BATCH_SIZE
+    ).to_list(length=None)
+    if not due:
+        return 0
+
+    await predictions_collection.update_many(
+        {**due_filter, "_id": {"$in": [prediction["_id"] for prediction in due]}},
+        {"$set": {"mirror_owner": MIRROR_ID, "mirror_lease_until": lease_until}}
+    )
+    claimed = await predictions_collection.find(
+        {"mirror_owner": MIRROR_ID, "mirror_lease_until": lease_until},
+        {"_id": 1, "id": 1, "prediction_id": 1, "result_url": 1, "mirror_attempts": 1}
+    ).to_list(length=None)
+    if not claimed:
+        return 0
+
+    semaphore = asyncio.Semaphore(settings.PREDICTION_POLL_CONCURRENCY)
+    async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
+        operations = await asyncio.gather(*[_mirror_one(client, p, semaphore, now) for p in claimed])
+
+    operations.append(UpdateMany(
+        {"mirror_owner": MIRROR_ID, "mirror_lease_until": lease_until},
+        {"$unset": {"mirror_owner": "", "mirror_lease_until": ""}}
+    ))
+    await predictions_collection.bulk_write(operations, ordered=True)
+    return len(claimed)
+
+async def run_output_mirror():
+    """Mirror completed try-on outputs until cancelled"""
+    logger.info(f"Try-on output mirror started ({settings.TRYON_OUTPUT_STORAGE} storage)")
+    while True:
+        try:
+            db = get_database()
+            if db is not None:
+                await mirror_completed_outputs(db)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in try-on output mirror: {str(e)}", exc_info=True)
+        await asyncio.sleep(settings.TRYON_OUTPUT_MIRROR_INTERVAL)
+
+def start_output_mirror():
+    """Start mirroring on the running event loop, unless storage is disabled"""
+    global _mirror_task
+    if settings.TRYON_OUTPUT_STORAGE == "none":
+        return
+    if settings.TRYON_OUTPUT_STORAGE == "cloudinary" and not initialize_cloudinary():
+        logger.error("TRYON_OUTPUT_STORAGE is cloudinary but Cloudinary is not configured; outputs will not be mirrored")
+        return
+    if settings.TRYON_OUTPUT_STORAGE == "local" and not settings.TRYON_OUTPUT_PUBLIC_URL:
+        logger.error("TRYON_OUTPUT_STORAGE is local but TRYON_OUTPUT_PUBLIC_URL is not set; outputs will not be mirrored")
+        return
+    if _mirror_task is None or _mirror_task.done():
+        _mirror_task = asyncio.get_running_loop().create_task(run_output_mirror())
+
+async def stop_output_mirror():
+    """Cancel the output mirror and wait for it to exit"""
+    global _mirror_task
+    if _mirror_task is not None:
+        _mirror_task.cancel()
+        try:
+            await _mirror_task
+        except asyncio.CancelledError:
+            pass
+        _mirror_task = None
+        logger.info("Try-on output mirror stopped")
@@ -0,0 +1,121 @@
+import json
+import logging
+
+from fastapi import HTTPException, UploadFile
+
+from config import settings
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Room for multipart boundaries and form fields on top of the images themselves
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+def upload_too_large_detail(max_bytes: int) -> str:
+    return f"Image size exceeds {max_bytes // (1024 * 1024)}MB limit"
+
+async def read_upload(upload: UploadFile, max_bytes: int = None) -> bytes:
+    """
+    Read an uploaded image with a hard size cap.
+
+    The spooled file's size is checked before anything is read, so an
+    oversize upload is never pulled into memory, and an upload within the
+    cap is read in one call with no intermediate copies. When the size
+    cannot be determined the body is read in TRYON_UPLOAD_CHUNK_BYTES
+    chunks that stop as soon as the cap is passed.
+
+    Raises:
+        HTTPException 400 when the upload is larger than max_bytes
+    """
+    max_bytes = max_bytes or settings.TRYON_UPLOAD_MAX_BYTES
+
+    # Starlette spools the part to a file while parsing, so its size is known up front
+    try:
+        upload.file.seek(0, 2)
+        size = upload.file.tell()
+        upload.file.seek(0)
+    except (AttributeError, OSError):
+        size = None
+    if size is not None and size > max_bytes:
+        raise HTTPException(status_code=400, detail=upload_too_large_detail(max_bytes))
+    if size is not None:
+        return await upload.read(size)
+
+    chunks = []
+    received = 0
+    while chunk := await upload.read(settings.TRYON_UPLOAD_CHUNK_BYTES):
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=400, detail=upload_too_large_detail(max_bytes))
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversize request bodies under a path prefix before they are parsed.
+
+    Requests whose Content-Length is over the limit get a 413 without any of
+    the body being read. Bodies without a Content-Length (chunked uploads)
+    are counted as they stream in and cut off with a 413 once they pass the
+    limit, instead of being spooled in full first.
+    """
+
+    def __init__(self, app, max_body_bytes: int, path_prefix: str = "/"):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+        self.path_prefix = path_prefix
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": f"Request body exceeds {self.max_body_bytes // (1024 * 1024)}MB limit"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"connection", b"close")
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("POST", "PUT", "PATCH")
+            or not scope["path"].startswith(self.path_prefix)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            logger.warning(f"Rejected {scope['path']} upload of {int(content_length)} bytes from its Content-Length")
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    rejected = True
+                    logger.warning(f"Cut off {scope['path']} upload after {received} bytes")
+                    await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # The 413 has already been sent; drop whatever the app answers
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise